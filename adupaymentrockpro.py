@@ -9,13 +9,16 @@ from typing import Dict, List, Optional, Any, Tuple
 import uuid
 import logging
 import asyncio
+import functools
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import sys
 import subprocess
 import shutil
+import tempfile
 import datetime as dt  # Renamed for clarity
 import base64  # Needed for embedding charts in PDF
+from types import SimpleNamespace
 
 # ----------------------- Config & Logging -----------------------
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -32,7 +35,19 @@ print(f"Persistence File Path: {PERSISTENCE_FILE_PATH}")
 
 # --- NEW: DatabaseManager ---
 # database_manager.py file ကို ခေါ်တဲ့ နေရာတွေမှာ DB_PATH ကို သုံးရပါမယ်။
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, AsyncDatabaseManager
+from models import DB_POOL_SIZE
+DB_LONG_CALL_TIMEOUT = float(os.getenv('DB_LONG_CALL_TIMEOUT', '300')) # Backup / Restore / Rebuild လို ကြာတဲ့ Query များ
+OUTBOUND_RATE_PER_SEC = float(os.getenv('OUTBOUND_RATE_PER_SEC', '25')) # Telegram bulk limit (~30 msg/s) အောက်မှာ ထားပါ
+OUTBOUND_CONCURRENCY = int(os.getenv('OUTBOUND_CONCURRENCY', '20')) # တပြိုင်နက် in-flight ဖြစ်နိုင်တဲ့ send_message အရေအတွက်
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3')) # RetryAfter / Connect error တွေအတွက် ပြန်ကြိုးစားမည့် အကြိမ်
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '50')) # Cursor ကို ဒီ recipient အရေအတွက် တစ်ခါ သိမ်းပါ
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5')) # Admin progress message ကို ဒီစက္ကန့်တိုင်း edit လုပ်ပါ
+RECURRING_CHECK_INTERVAL_MINUTES = int(os.getenv('RECURRING_CHECK_INTERVAL_MINUTES', '15'))
+PREMIUM_EXPIRY_SWEEP_MINUTES = int(os.getenv('PREMIUM_EXPIRY_SWEEP_MINUTES', '60')) # သက်တမ်းကုန် Premium flag တွေကို ပိတ်မည့် ကြားကာလ
+BACKUP_SPOOL_MAX_BYTES = int(os.getenv('BACKUP_SPOOL_MAX_BYTES', str(5 * 1024 * 1024))) # ဒီထက်ကြီးတဲ့ Backup ကို Disk ပေါ် ရေးပါ
+# တပြိုင်နက် လုပ်ဆောင်မည့် Update အရေအတွက် - Update တစ်ခုစီ DB connection တစ်ခု ကိုင်လို့ Pool size ထက် မကျော်ပါ
+UPDATE_CONCURRENCY = min(int(os.getenv('UPDATE_CONCURRENCY', str(DB_POOL_SIZE))), DB_POOL_SIZE)
 
 # --- NEW FONT INSTALLER (Python Method) ---
 
@@ -103,7 +118,11 @@ logger = logging.getLogger(__name__)
 try:
     from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
     from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes, PicklePersistence
+    from telegram.ext import BaseUpdateProcessor
+    from telegram.request import HTTPXRequest
     from telegram.constants import ParseMode
+    from telegram.error import RetryAfter, NetworkError, BadRequest, Forbidden
+    import httpx  # python-telegram-bot ရဲ့ Dependency (Network error အမျိုးအစား ခွဲရန်)
     TELEGRAM_AVAILABLE = True
 except ImportError:
     TELEGRAM_AVAILABLE = False
@@ -278,6 +297,19 @@ TEXTS = {
     "tx_edit_prompt": "✏️ **မှတ်တမ်း ပြင်ဆင်ခြင်း**\n\n `{date} - {type} ({category}) : {amount:,.0f} Ks` မှတ်တမ်းကို ဘယ်လို ပြင်ချင်ပါသလဲ?\n\nအောက်ပါ ပုံစံဖြင့် အသစ်ပြန်ရိုက်ပေးပါ။\n\n`[ဝင်ငွေ/ထွက်ငွေ] [ပမာဏ] [ဖော်ပြချက်]`\nဥပမာ။ ။ `ထွက်ငွေ 12000 နေ့လယ်စာ`",
     "tx_edit_success": "✅ မှတ်တမ်းအဟောင်းကို `{new_type} ({new_category}) : {new_amount:,.0f} Ks` ဖြင့် အောင်မြင်စွာ ပြင်ဆင်လိုက်ပါပြီ။",
     "tx_not_found": "❌ မှတ်တမ်းကို ရှာမတွေ့ပါ။",
+    # --- (!!!) NEW: Transaction History (Keyset Pagination) (!!!) ---
+    "tx_history_button": "📜 မှတ်တမ်း အားလုံး ကြည့်ရန်",
+    "tx_history_header": "📜 **ငွေကြေးမှတ်တမ်း အားလုံး**",
+    "tx_history_empty": "ℹ️ ရွေးချယ်ထားသော Filter နှင့် ကိုက်ညီသော မှတ်တမ်း မရှိပါ။",
+    "tx_history_newer": "⬅️ အသစ်များ",
+    "tx_history_older": "အဟောင်းများ ➡️",
+    "tx_history_filter_button": "🔎 Filter",
+    "tx_history_filter_header": "🔎 **မှတ်တမ်း Filter**\n\nအမျိုးအစား၊ Category သို့မဟုတ် Account ဖြင့် စစ်ထုတ်နိုင်ပါသည်။",
+    "tx_history_filter_all": "အားလုံး",
+    "tx_history_filter_clear": "❌ Filter ဖယ်ရှားရန်",
+    "tx_history_filter_show": "📜 မှတ်တမ်းများ ပြပါ",
+    "tx_history_filter_active": "🔎 Filter: {filters}",
+    # --- (!!!) End of New (!!!) ---
 
     "goal_menu_header": "🎯 **ငွေကြေး ပန်းတိုင်များ စီမံခန့်ခွဲခြင်း**\n\nသင်၏ ငွေကြေး ပန်းတိုင်များကို ထားရှိပြီး စုဆောင်းမှု အခြေအနေ (Progress) ကို ခြေရာခံနိုင်ပါသည်။",
     "goal_add_prompt": "🎯 ပန်းတိုင်အသစ် ထည့်သွင်းရန်၊ အောက်ပါပုံစံဖြင့် ရိုက်ထည့်ပေးပါ။\n\n`[ပန်းတိုင်အမည်] [ပန်းတိုင်ပမာဏ] [ရက်စွဲ (MM/DD/YYYY)]`\nဥပမာ။ ။ `ဖုန်းအသစ် 500000 12/31/2025`",
@@ -307,14 +339,22 @@ TEXTS = {
     "delete_data_cancelled": "ℹ️ အချက်အလက် ဖျက်သိမ်းခြင်းကို ပယ်ဖျက်လိုက်ပါသည်။",
 
     "recurring_tx_menu_header": "🔁 **လစဉ် ထပ်တလဲလဲ ငွေစာရင်း (Recurring Transactions)**\n\nလစဉ် ပုံမှန် ဝင်/ထွက်မည့် ငွေစာရင်းများကို သတ်မှတ်ထားနိုင်ပါသည်။ Bot မှ သတ်မှတ်ရက်ရောက်တိုင်း အလိုအလျောက် စာရင်းသွင်းပေးပါမည်။",
-    "recurring_tx_add_prompt": "🔁 **Recurring Transaction အသစ်ထည့်ရန်**\n\nအောက်ပါပုံစံဖြင့် ရိုက်ထည့်ပေးပါ။\n`[ဝင်ငွေ/ထွက်ငွေ] [ပမာဏ] [ဖော်ပြချက်] [နေ့ (1-28)]`\n\nဥပမာ။ ။ `ဝင်ငွေ 500000 လစာ 25` (လစဉ် ၂၅ ရက်နေ့)\nဥပမာ။ ။ `ထွက်ငွေ 100000 အိမ်လခ 1` (လစဉ် ၁ ရက်နေ့)\n\n(မှတ်ချက်: လအဆုံးရက်များ ရှုပ်ထွေးမှုမရှိစေရန် ၁ ရက်မှ ၂၈ ရက်နေ့အထိသာ သတ်မှတ်နိုင်ပါသည်။)",
-    "recurring_tx_invalid_format": "❌ ပုံစံမမှန်ကန်ပါ။ `[ဝင်ငွေ/ထွက်ငွေ] [ပမာဏ] [ဖော်ပြချက်] [နေ့ (1-28)]` ပုံစံဖြင့် ထည့်သွင်းပါ။ နေ့ရက်သည် ၁ မှ ၂၈ အတွင်း ဂဏန်းဖြစ်ရပါမည်။",
-    "recurring_tx_add_success": "✅ '{desc}' ({amount:,.0f} Ks) ကို လစဉ် {day} ရက်နေ့တိုင်း အလိုအလျောက် စာရင်းသွင်းပါမည်။",
+    "recurring_tx_add_prompt": "🔁 **Recurring Transaction အသစ်ထည့်ရန်**\n\nအောက်ပါပုံစံဖြင့် ရိုက်ထည့်ပေးပါ။\n`[ဝင်ငွေ/ထွက်ငွေ] [ပမာဏ] [ဖော်ပြချက်] [နေ့ (1-28) / နေ့စဉ် / အပတ်စဉ် / နှစ်စဉ်]`\n\nဥပမာ။ ။ `ဝင်ငွေ 500000 လစာ 25` (လစဉ် ၂၅ ရက်နေ့)\nဥပမာ။ ။ `ထွက်ငွေ 100000 အိမ်လခ 1` (လစဉ် ၁ ရက်နေ့)\nဥပမာ။ ။ `ထွက်ငွေ 3000 ကားခ နေ့စဉ်` (နေ့တိုင်း)\nဥပမာ။ ။ `ထွက်ငွေ 20000 ဈေးဖိုး အပတ်စဉ်` (ယနေ့ စ၍ အပတ်တိုင်း)\nဥပမာ။ ။ `ထွက်ငွေ 50000 အာမခံ နှစ်စဉ်` (ယနေ့ စ၍ နှစ်တိုင်း)\n\n(မှတ်ချက်: လအဆုံးရက်များ ရှုပ်ထွေးမှုမရှိစေရန် ၁ ရက်မှ ၂၈ ရက်နေ့အထိသာ သတ်မှတ်နိုင်ပါသည်။)",
+    "recurring_tx_invalid_format": "❌ ပုံစံမမှန်ကန်ပါ။ `[ဝင်ငွေ/ထွက်ငွေ] [ပမာဏ] [ဖော်ပြချက်] [နေ့ (1-28) / နေ့စဉ် / အပတ်စဉ် / နှစ်စဉ်]` ပုံစံဖြင့် ထည့်သွင်းပါ။ နေ့ရက်သည် ၁ မှ ၂၈ အတွင်း ဂဏန်းဖြစ်ရပါမည်။",
+    "recurring_tx_add_success": "✅ '{desc}' ({amount:,.0f} Ks) ကို {schedule} အလိုအလျောက် စာရင်းသွင်းပါမည်။",
+    # --- (!!!) NEW: Recurring Frequencies (!!!) ---
+    "recurring_frequency_keywords": {"daily": ["နေ့စဉ်", "daily"], "weekly": ["အပတ်စဉ်", "weekly"], "yearly": ["နှစ်စဉ်", "yearly"]},
+    "recurring_schedule_daily": "နေ့စဉ်",
+    "recurring_schedule_weekly": "အပတ်စဉ် {weekday}နေ့",
+    "recurring_schedule_monthly": "လစဉ် {day} ရက်နေ့",
+    "recurring_schedule_yearly": "နှစ်စဉ် {month} လ {day} ရက်နေ့",
+    "weekday_names": ["တနင်္လာ", "အင်္ဂါ", "ဗုဒ္ဓဟူး", "ကြာသပတေး", "သောကြာ", "စနေ", "တနင်္ဂနွေ"],
+    # --- (!!!) End of New (!!!) ---
     "recurring_tx_no_set": "ℹ️ သတ်မှတ်ထားသော လစဉ် ထပ်တလဲလဲ ငွေစာရင်း မရှိသေးပါ။",
     "recurring_tx_delete_menu": "🗑️ ဖျက်ပစ်လိုသော လစဉ်ငွေစာရင်းကို ရွေးချယ်ပါ။",
     "recurring_tx_delete_success": "✅ '{name}' recurring transaction ကို ဖျက်လိုက်ပါပြီ။",
     "recurring_tx_not_found": "❌ Recurring transaction ကို ရှာမတွေ့ပါ။",
-    "recurring_tx_executed": "🔁 **Recurring Transaction**\n\nသင်၏ လစဉ်စာရင်း '{desc}' ({amount:,.0f} Ks) ကို ယနေ့အတွက် အလိုအလျောက် မှတ်တမ်းတင်လိုက်ပါပြီ။",
+    "recurring_tx_executed": "🔁 **Recurring Transaction**\n\nသင်၏ ထပ်တလဲလဲ စာရင်း '{desc}' ({amount:,.0f} Ks) ကို {date} အတွက် အလိုအလျောက် မှတ်တမ်းတင်လိုက်ပါပြီ။",
 
     # --- (STEP 4) NEW: Admin Dashboard Texts ---
     "not_admin": "🚫 ဤ command ကို Admin သာ အသုံးပြုနိုင်ပါသည်။",
@@ -322,13 +362,20 @@ TEXTS = {
     "admin_stats_button": "📊 Statistics ကြည့်ရန်",
     "admin_broadcast_button": "📣 User အားလုံးထံ ကြေငြာချက်ပို့ရန်",
     "admin_find_user_button": "👤 User တစ်ယောက်ချင်း ရှာဖွေရန်",
-    "admin_stats_message": "📊 **Bot Statistics**\n\n👥 **စုစုပေါင်း User:** {total} ယောက်\n⭐️ **Premium User:** {premium} ယောက်",
+    "admin_stats_message": "📊 **Bot Statistics**\n\n👥 **စုစုပေါင်း User:** {total} ယောက်\n⭐️ **Premium User:** {premium} ယောက်\n🚫 **Bot ကို Block ထားသူ:** {blocked} ယောက်",
+    "admin_stats_activity": "\n\n📈 **Activity:**\n  - DAU: {dau} / WAU: {wau}\n  - ယနေ့ User အသစ်: {new_today} ယောက်\n  - Transactions: ယနေ့ {tx_today} / ၇ ရက်ပျမ်းမျှ {tx_per_day:.1f} / စုစုပေါင်း {transactions}\n  - Premium Conversion: {conversion:.1f}% (၇ ရက်အတွင်း Premium ဝယ်ယူမှု {grants_7d})",
+    "admin_stats_dispatch": "\n\n📤 **Outbound Jobs (နောက်ဆုံး run):**",
+    "admin_stats_dispatch_line": "\n  - `{job}` ({started_at:%m-%d %H:%M}{running}): ✅ {sent} / ❌ {failed} (🚫 {blocked}) / 🔁 {retried} / ⏸ {throttled} · {rate:.1f} msg/s",
+    "admin_stats_cache": "\n\n⚡️ **Premium Cache:** Hit rate {hit_rate:.1f}%\n  - Hits: {hits} / Misses: {misses}\n  - Cached Users: {size}",
+    "admin_stats_replica": "\n\n🪞 **Read Replica:** Lag {lag}\n  - Replica reads: {replica_reads} ({replica_rate:.1f}%) / Primary reads: {primary_reads}",
     "admin_broadcast_prompt": "📣 **Broadcast Mode**\n\nUser အားလုံးထံ ပို့လိုသော message ကို ရိုက်ထည့်ပေးပါ။ (Markdown/HTML သုံးနိုင်ပါသည်)။\n\nပယ်ဖျက်လိုပါက `cancel` ဟု ရိုက်ထည့်ပါ။",
     "admin_broadcast_confirm": "⚠️ **Broadcast Confirmation**\n\nအောက်ပါ message ကို User **{count}** ယောက်ထံ ပို့ပါမည်။\n----------------------------------\n{message}\n----------------------------------\n\nပို့ရန် သေချာပါသလား?",
     "admin_broadcast_confirm_button": "✅ ဟုတ်ကဲ့၊ ပို့ပါ။",
     "admin_broadcast_cancel_button": "❌ မပို့တော့ပါ။",
     "admin_broadcast_start": "⏳ Broadcast စတင်နေပါပြီ... User {count} ယောက်ထံ ပို့ပါမည်။ ပြီးဆုံးပါက အကြောင်းပြန်ပါမည်။",
-    "admin_broadcast_complete": "✅ **Broadcast Complete!**\n\n- **အောင်မြင်:** {sent} ယောက်\n- **မအောင်မြင် (Bot ကို block သွားသူများ):** {failed} ယောက်",
+    "admin_broadcast_complete": "✅ **Broadcast Complete!**\n\n- **အောင်မြင်:** {sent} ယောက်\n- **မအောင်မြင် (Bot ကို block သွားသူများ):** {failed} ယောက်\n- **ကြာချိန်:** {seconds:.0f} စက္ကန့် ({rate:.1f} msg/s)",
+    "admin_broadcast_progress": "📣 **Broadcast ပို့နေဆဲ...**\n\n- **ပို့ပြီး:** {sent} ယောက်\n- **မအောင်မြင်:** {failed} ယောက်\n- **ကျန်:** {remaining} / {total} ယောက်\n- **ETA:** {eta} ({rate:.1f} msg/s)",
+    "admin_broadcast_resumed": "🔄 Bot ပြန်စတင်လို့ Broadcast ကို ကျန်တဲ့ User တွေထံ ဆက်ပို့နေပါပြီ...",
     "admin_broadcast_cancelled": "❌ Broadcast ကို ပယ်ဖျက်လိုက်ပါသည်။",
     "admin_find_user_prompt": "👤 **Find User**\n\nရှာဖွေလိုသော User ၏ **Telegram User ID** (ဂဏန်း) ကို ရိုက်ထည့်ပေးပါ။\n\nပယ်ဖျက်လိုပါက `cancel` ဟု ရိုက်ထည့်ပါ။",
     "admin_user_not_found": "❌ User ID `{user_id}` ကို database ထဲတွင် ရှာမတွေ့ပါ။",
@@ -338,6 +385,8 @@ TEXTS = {
 **Premium Status:** {status}
 **Premium End Date:** {end_date}
 **Total Transactions:** {tx_count}
+**Last Transaction:** {last_tx_at}
+**Last Active:** {last_active_at}
 **Used Trial:** {used_trial}
 ----------------------------------
 👇 အောက်ပါခလုတ်များဖြင့် ထိန်းချုပ်နိုင်ပါသည်။
@@ -346,6 +395,20 @@ TEXTS = {
     "admin_revoke_button": "➖ Premium ဖျက်သိမ်းရန်",
     "admin_user_granted": "✅ User {user_id} ကို Premium 30 ရက် ထပ်တိုးပေးလိုက်ပါပြီ။",
     "admin_user_revoked": "✅ User {user_id} ၏ Premium ကို ဖျက်သိမ်းလိုက်ပါပြီ။",
+    "admin_rebuild_usage": "အသုံးပြုပုံ:\n`/rebuild balances` - Ledger ကို စစ်ဆေးရန် (Drift Report)\n`/rebuild balances fix` - Drift ရှိသော Ledger ကို ပြန်တွက်ရန်\n`/rebuild rollups` - Monthly Rollup ကို Transaction များမှ ပြန်တွက်ရန်\n`/rebuild stats` - Admin Statistics Counter များကို ပြန်တွက်ရန်",
+    "admin_rebuild_stats_done": "✅ **Admin Stats Rebuilt**\n\n👥 Users: {users}\n🧾 Transactions: {transactions}\n⏱ {seconds:.1f}s",
+    "admin_rebuild_rollups_done": "✅ **Monthly Rollup Rebuilt**\n\n🧾 Transactions: {transactions}\n📦 Rollup Rows: {rows}\n⏱ {seconds:.1f}s",
+    "admin_rebuild_balances_report": """⚖️ **Account Balance Ledger**
+----------------------------------
+👥 **စစ်ဆေးခဲ့သော User:** {users}
+🧾 **Ledger Rows:** {rows}
+🆕 **Ledger မရှိသေးသော User:** {uninitialized}
+⚠️ **Drift:** {drift_count} rows
+{details}----------------------------------
+{status}""",
+    "admin_rebuild_drift_line": "• `{user_id}` / `{account_id}`: {stored} → {expected}\n",
+    "admin_rebuild_status_fixed": "✅ Ledger ကို ပြန်လည်တွက်ချက်ပြီးပါပြီ။",
+    "admin_rebuild_status_report_only": "ℹ️ ပြင်ဆင်ရန် `/rebuild balances fix` ကို သုံးပါ။",
 
     # --- (STEP 5) NEW: Quick Add Texts ---
     "quick_add_prompt_type": "💰 **{amount:,.0f} Ks** ကို ဘာအဖြစ် မှတ်သားမလဲ။",
@@ -375,10 +438,12 @@ TEXTS = {
     "restore_button": "📥 Restore ပြန်လုပ်ရန် (Data ပြန်ထည့်မည်)",
 
     "backup_prompt_sending": "⏳ သင်၏ Data များကို စုစည်း၍ Backup file ပြုလုပ်နေပါသည်။ ခဏစောင့်ပါ။",
-    "backup_prompt_success": "✅ သင်၏ Backup file (`backup_{date}.json`) ကို အောင်မြင်စွာ ထုတ်ယူပြီးပါပြီ။\n\nဤ file ကို လုံခြုံသော နေရာ (ဥပမာ- Email, Google Drive) တွင် သိမ်းဆည်းထားပါ။",
+    "backup_prompt_success": "✅ သင်၏ Backup file (`backup_{date}.json.gz`) ကို အောင်မြင်စွာ ထုတ်ယူပြီးပါပြီ။\n\nဤ file ကို လုံခြုံသော နေရာ (ဥပမာ- Email, Google Drive) တွင် သိမ်းဆည်းထားပါ။",
 
-    "restore_prompt": "📥 **Data Restore ပြန်လုပ်ရန်**\n\nကျေးဇူးပြု၍ သင် သိမ်းဆည်းထားသော `backup_....json` file ကို ဤ chat ထဲသို့ ပို့ပေးပါ။\n\n**(!!!) သတိပြုရန်:** Restore ပြုလုပ်သည်နှင့် သင်၏ လက်ရှိ Data အားလုံး **ဖျက်သိမ်းခံရမည်** ဖြစ်ပြီး၊ ဤ file ထဲမှ Data များဖြင့် **အစားထိုး** သွားမည် ဖြစ်သည်။\n\nပယ်ဖျက်လိုပါက `cancel` ဟု ရိုက်ထည့်ပါ။",
+    "restore_prompt": "📥 **Data Restore ပြန်လုပ်ရန်**\n\nကျေးဇူးပြု၍ သင် သိမ်းဆည်းထားသော `backup_....json.gz` (သို့မဟုတ် `.json`) file ကို ဤ chat ထဲသို့ ပို့ပေးပါ။\n\n**(!!!) သတိပြုရန်:** Restore ပြုလုပ်သည်နှင့် သင်၏ လက်ရှိ Data အားလုံး **ဖျက်သိမ်းခံရမည်** ဖြစ်ပြီး၊ ဤ file ထဲမှ Data များဖြင့် **အစားထိုး** သွားမည် ဖြစ်သည်။\n\nပယ်ဖျက်လိုပါက `cancel` ဟု ရိုက်ထည့်ပါ။",
     "restore_success": "✅ Data များကို Backup file မှ အောင်မြင်စွာ Restore ပြန်လုပ်ပြီးပါပြီ။",
+    "restore_report_line": "• `{table}`: {rows:,} ခု ({seconds:.2f}s)",
+    "restore_report_total": "⏱️ စုစုပေါင်း {rows:,} ခု၊ {seconds:.2f} စက္ကန့်",
     "restore_error_json": "❌ Error: ပို့လိုက်သော file သည် JSON file ပုံစံ မမှန်ကန်ပါ။",
     "restore_error_format": "❌ Error: ဤ file သည် ကျွန်ုပ်တို့၏ Backup file ပုံစံ မဟုတ်ပါ။ (Data များ မစုံလင်ပါ)",
     "restore_error_general": "❌ Restore ပြုလုပ်ရာတွင် အမှားအယွင်း ဖြစ်ပွားပါသည်။",
@@ -480,6 +545,255 @@ def format_myanmar_date(date_obj):
     month = MYANMAR_MONTHS.get(date_obj.month, date_obj.strftime("%B"))
     return f"{year} ခုနှစ် {month} လ"
 
+# ====================================================================
+# (!!!) NEW: Per-user Update Processor / Commit-before-send Request (!!!)
+# ====================================================================
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    User မတူတဲ့ Update တွေကို တပြိုင်နက် (max_concurrent_updates အထိ) run ပြီး
+    User တစ်ယောက်တည်းရဲ့ Update တွေကိုတော့ ရောက်တဲ့အစဉ်အတိုင်း တစ်ခုချင်း run ပါ
+    (context.user_data ထဲက Pending amount / category စတဲ့ Conversation state မရောယှက်စေရန်)။
+    PTB ရဲ့ process_update က Semaphore ကို do_process_update မတိုင်ခင် ယူလို့ Base class ကို Limit မပေးပါ -
+    ကိုယ်ပိုင် Semaphore ကို User lock ရပြီးမှ ယူပါတယ် (User တစ်ယောက်ရဲ့ စောင့်နေတဲ့ Update တွေက Slot မယူထားစေရန်)။
+    """
+    UNBOUNDED = 1_000_000
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(self.UNBOUNDED)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: Dict[int, list] = {}  # user_id -> [asyncio.Lock, Update အရေအတွက် (run / စောင့်နေဆဲ)]
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, 'effective_user', None)
+        if user is None:
+            async with self._slots:
+                await coroutine
+            return
+        entry = self._locks.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(user.id, None)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class OutboundCommitRequest(HTTPXRequest):
+    """
+    Telegram API ကို မခေါ်ခင် Handler ရဲ့ DB Unit of Work ကို Commit လုပ်ပါ
+    (account_balance / stats row lock တွေကို Network round trip အတွင်း မကိုင်ထားစေရန်)။
+    """
+
+    def __init__(self, data_manager, **kwargs):
+        super().__init__(**kwargs)
+        self.data_manager = data_manager
+
+    async def do_request(self, *args, **kwargs):
+        await self.data_manager.commit_unit_of_work()
+        return await super().do_request(*args, **kwargs)
+# --- (!!!) End of New (!!!) ---
+
+# ====================================================================
+# (!!!) NEW: OutboundDispatcher Class (!!!)
+# ====================================================================
+
+
+class OutboundDispatcher:
+    """
+    Broadcast / Reminder / Recurring စတဲ့ fan-out job တွေ မျှဝေသုံးတဲ့ Sender။
+    Global token bucket (OUTBOUND_RATE_PER_SEC) နဲ့ in-flight အရေအတွက်ကို ကန့်သတ်ပြီး
+    RetryAfter ဆိုရင် အားလုံးကို ခေတ္တရပ်၊ Connect error ဆိုရင် backoff နဲ့ ပြန်ပို့ပါတယ်
+    (TimedOut ဆိုရင် ပို့ပြီးသား ဖြစ်နိုင်လို့ ပြန်မပို့ပါ - User ဆီ နှစ်စောင် မရောက်စေရန်)။
+    """
+
+    def __init__(self, rate: float = OUTBOUND_RATE_PER_SEC, concurrency: int = OUTBOUND_CONCURRENCY,
+                 max_retries: int = OUTBOUND_MAX_RETRIES, on_blocked=None):
+        self.bot = None  # post_init မှာ application.bot ကို ချိတ်ပါမယ်
+        self.on_blocked = on_blocked  # async (Dict[chat_id, error]) - Block / Chat not found ဖြစ်တဲ့ User တွေ
+        self._blocked: Dict[int, str] = {}
+        self.rate = rate
+        self.capacity = max(1.0, rate)  # Burst = ၁ စက္ကန့်စာ
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._tokens = self.capacity
+        self._updated: Optional[float] = None
+        self._paused_until = 0.0
+        self._bucket_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.jobs: Dict[str, Dict[str, Any]] = {}  # job name -> နောက်ဆုံး run ရဲ့ metrics
+
+    async def _acquire(self):
+        """Token တစ်ခု ရတဲ့အထိ (RetryAfter pause အပါအဝင်) စောင့်ပါ"""
+        loop = asyncio.get_running_loop()
+        async with self._bucket_lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def _pause(self, seconds: float):
+        """Flood control - Bucket ကို ဗလာလုပ်ပြီး job အားလုံးကို seconds အထိ ရပ်ထားပါ"""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._tokens = 0
+
+    def start_job(self, job: str) -> Dict[str, Any]:
+        stats = {'sent': 0, 'failed': 0, 'blocked': 0, 'retried': 0, 'throttled': 0,
+                 'started_at': dt.datetime.now(), 'started': asyncio.get_running_loop().time(),
+                 'elapsed': 0.0, 'running': True}
+        self.jobs[job] = stats
+        return stats
+
+    def finish_job(self, job: str) -> Dict[str, Any]:
+        stats = self.jobs[job]
+        stats['elapsed'] = asyncio.get_running_loop().time() - stats['started']
+        stats['running'] = False
+        logger.info(
+            f"Outbound job '{job}': sent {stats['sent']}, failed {stats['failed']} ({stats['blocked']} blocked), retried {stats['retried']}, "
+            f"throttled {stats['throttled']} in {stats['elapsed']:.1f}s ({self._rate_of(stats):.1f} msg/s)")
+        return stats
+
+    def _rate_of(self, stats: Dict[str, Any]) -> float:
+        elapsed = stats['elapsed']
+        if stats['running']:
+            elapsed = asyncio.get_running_loop().time() - stats['started']
+        return (stats['sent'] + stats['failed']) / elapsed if elapsed > 0 else 0.0
+
+    def stats_for(self, job: str) -> Dict[str, Any]:
+        return {'job': job, **self.jobs[job], 'rate': self._rate_of(self.jobs[job])}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Admin Stats အတွက် job တစ်ခုချင်းစီရဲ့ throughput / failure metrics"""
+        return [self.stats_for(job) for job in self.jobs]
+
+    @staticmethod
+    def _never_sent(error: Exception) -> bool:
+        """Request က Telegram ဆီ မရောက်ခဲ့မှန်း သေချာတဲ့ Error (Connect မရ / Pool timeout) - ပြန်ပို့လို့ ရပါတယ်"""
+        return isinstance(error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+    async def send(self, job: str, chat_id: int, text: str, **kwargs) -> bool:
+        """Message တစ်စောင် ပို့ပါ - အောင်မြင်ရင် True၊ ပို့လို့မရတော့ရင် (Block / Bad request) False"""
+        stats = self.jobs.get(job) or self.start_job(job)
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                await self._acquire()
+                try:
+                    await self.bot.send_message(chat_id, text, **kwargs)
+                    stats['sent'] += 1
+                    return True
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    delay = retry_after.total_seconds() if isinstance(retry_after, dt.timedelta) else float(retry_after)
+                    stats['throttled'] += 1
+                    self._pause(delay)
+                    logger.warning(f"Outbound job '{job}' flood controlled, pausing {delay:.0f}s")
+                    error = e
+                except NetworkError as e:
+                    error = e
+                    if self._never_sent(e):
+                        await asyncio.sleep(min(30, 2 ** attempt))
+                    else:
+                        # BadRequest / TimedOut (Read / Write timeout) စသည် - Telegram က ပို့ပြီးသား ဖြစ်နိုင်လို့ ပြန်မပို့ပါ
+                        # (Broadcast cursor ရဲ့ at-most-once ကို မချိုးဖောက်စေရန်)
+                        attempt = self.max_retries
+                except Exception as e:  # Forbidden (Bot ကို block) စသည် - ပြန်ပို့လို့ မရပါ
+                    error = e
+                    attempt = self.max_retries
+
+                if attempt >= self.max_retries:
+                    stats['failed'] += 1
+                    if self._is_unreachable(error):
+                        stats['blocked'] += 1
+                        self._blocked[chat_id] = str(error)
+                    else:
+                        logger.warning(f"Outbound job '{job}' failed for {chat_id}: {error}")
+                    return False
+                attempt += 1
+                stats['retried'] += 1
+
+    @staticmethod
+    def _is_unreachable(error: Exception) -> bool:
+        """Bot ကို Block / Account ဖျက် (Forbidden) သို့မဟုတ် Chat not found - ထပ်ပို့လည်း မရောက်တော့ပါ"""
+        return isinstance(error, Forbidden) or (
+            isinstance(error, BadRequest) and 'chat not found' in str(error).lower())
+
+    async def flush_blocked(self):
+        """ပို့မရတော့တဲ့ User တွေကို on_blocked (DB) ဆီ တစ်ခါတည်း ပို့ပါ"""
+        if not self._blocked or not self.on_blocked:
+            return
+        blocked, self._blocked = self._blocked, {}
+        try:
+            await self.on_blocked(blocked)
+        except Exception as e:
+            logger.error(f"Failed to record {len(blocked)} blocked users: {e}")
+
+    async def send_many(self, job: str, messages, track: bool = True, **kwargs) -> Dict[str, Any]:
+        """
+        (chat_id, text) တွေကို worker pool နဲ့ ပို့ပြီး job metrics ကို ပြန်ပေးပါ (kwargs က message အားလုံးအတွက်)
+        track=False ဆိုရင် start_job / finish_job ကို caller က လုပ်ပါတယ် (Batch အများကြီးကို job တစ်ခုအဖြစ် ရေတွက်ရန်)
+        """
+        if track:
+            self.start_job(job)
+        iterator = iter(messages)
+
+        async def worker():
+            for chat_id, text in iterator:
+                await self.send(job, chat_id, text, **kwargs)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            await self.flush_blocked()
+            if track:
+                self.finish_job(job)
+        return self.jobs[job]
+
+    async def run_each(self, job: str, items, func) -> Dict[str, Any]:
+        """Message အများကြီး ပို့ရတဲ့ func(item) (ဥပမာ Weekly Summary) တွေကို ဒီ job အောက်မှာ တပြိုင်နက် run ပါ"""
+        self.start_job(job)
+        iterator = iter(items)
+
+        async def worker():
+            for item in iterator:
+                try:
+                    await func(item)
+                except Exception as e:
+                    logger.error(f"Outbound job '{job}' failed for {item}: {e}")
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            await self.flush_blocked()
+            self.finish_job(job)
+        return self.jobs[job]
+
+    def as_bot(self, job: str):
+        """Handler တွေကို context.bot အဖြစ် ပေးသုံးနိုင်တဲ့ Bot (send_message သာ dispatcher ကို ဖြတ်ပါတယ်)"""
+        async def send_message(chat_id, text, **kwargs):
+            return await self.send(job, chat_id, text, **kwargs)
+        return SimpleNamespace(send_message=send_message)
+
+# (!!!) End of New Class (!!!)
+
 # ====================================================================
 # ExportManager Class (NO CHANGES)
 # ====================================================================
@@ -491,29 +805,26 @@ class ExportManager:
         os.makedirs(self.export_dir, exist_ok=True)
         self.WEASYPRINT_AVAILABLE = WEASYPRINT_AVAILABLE
 
-    def _validate_transactions(self, transactions: List[Dict[str, Any]]) -> pd.DataFrame:
-        df = pd.DataFrame(transactions)
-        if df.empty:
+    def _validate_transactions(self, transactions: pd.DataFrame) -> pd.DataFrame:
+        """get_transactions_frame ရဲ့ DataFrame (datetime64 / int64) ကို Report column တွေအဖြစ် ပြောင်းပါ"""
+        if transactions.empty:
             return pd.DataFrame(columns=['Date', 'Type', 'description', 'Category', 'Income', 'Expense'])
 
-        # Handle potential NaT/None in date column before conversion
-        df = df.dropna(subset=['date'])
-        df['Date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-
-        df['Type'] = df['type'].apply(
-            lambda x: 'ဝင်ငွေ' if x == 'income' else 'ထွက်ငွေ')
-        df['Income'] = df.apply(lambda row: row['amount']
-                                if row['type'] == 'income' else 0, axis=1)
-        df['Expense'] = df.apply(
-            lambda row: row['amount'] if row['type'] == 'expense' else 0, axis=1)
-        df['Category'] = df['category']
-        df['description'] = df['description'].fillna('')
-        df['Income'] = df['Income'].astype(int)
-        df['Expense'] = df['Expense'].astype(int)
-
-        return df[['Date', 'Type', 'description', 'Category', 'Income', 'Expense']]
-
-    def _export_weasyprint(self, title: str, transactions: List[Dict[str, Any]], chart_data: Optional[str] = None) -> Optional[io.BytesIO]:
+        # Handle potential NaT in date column
+        df = transactions.dropna(subset=['date'])
+        is_income = df['type'] == 'income'
+        is_expense = df['type'] == 'expense'
+
+        return pd.DataFrame({
+            'Date': df['date'].dt.strftime('%Y-%m-%d'),
+            'Type': is_income.map({True: 'ဝင်ငွေ', False: 'ထွက်ငွေ'}),
+            'description': df['description'].fillna(''),
+            'Category': df['category'],
+            'Income': df['amount'].where(is_income, 0).astype('int64'),
+            'Expense': df['amount'].where(is_expense, 0).astype('int64'),
+        })
+
+    def _export_weasyprint(self, title: str, transactions: pd.DataFrame, chart_data: Optional[str] = None) -> Optional[io.BytesIO]:
         if not self.WEASYPRINT_AVAILABLE:
             return None
         df = self._validate_transactions(transactions)
@@ -690,7 +1001,7 @@ class ExportManager:
             logger.error(f"Error generating PDF with WeasyPrint: {e}")
             return None
 
-    def _export_to_excel(self, transactions: List[Dict[str, Any]]) -> Optional[io.BytesIO]:
+    def _export_to_excel(self, transactions: pd.DataFrame) -> Optional[io.BytesIO]:
         if not OPENPYXL_AVAILABLE:
             return None
         df = self._validate_transactions(transactions)
@@ -753,8 +1064,8 @@ class ExportManager:
             logger.error(f"Error generating Excel report: {e}")
             return None
 
-    def export_data(self, title: str, transactions: List[Dict[str, Any]], export_type: str, chart_data: Optional[str] = None) -> Optional[io.BytesIO]:
-        if not transactions:
+    def export_data(self, title: str, transactions: pd.DataFrame, export_type: str, chart_data: Optional[str] = None) -> Optional[io.BytesIO]:
+        if transactions.empty:
             return None
         if export_type == 'pdf' and self.WEASYPRINT_AVAILABLE:
             return self._export_weasyprint(title, transactions, chart_data)
@@ -877,10 +1188,13 @@ class PlotlyChartManager:
 class MyanmarFinanceBot:
 
     def __init__(self):
-        self.data_manager = DatabaseManager()
+        # (!!!) Handler တွေက await နဲ့ ခေါ်ရပါမယ် (Event loop ကို မပိတ်ဆို့စေရန်) (!!!)
+        self.data_manager = AsyncDatabaseManager(DatabaseManager())
         self.export_manager = ExportManager(EXPORT_DIR)
         self.chart_manager = PlotlyChartManager()
         self.scheduler = AsyncIOScheduler()
+        # Fan-out message အားလုံး ဒီကနေ ပို့ပါ (Block ထားတဲ့ User တွေကို DB မှာ မှတ်ပြီး နောက်တစ်ခါ ကျော်ပါ)
+        self.dispatcher = OutboundDispatcher(on_blocked=self.data_manager.mark_users_blocked)
 
         try:
             # Render Environment ကနေ ADMIN_ID ကို ဖတ်ပါ
@@ -893,7 +1207,7 @@ class MyanmarFinanceBot:
 
     # --- Utility: Premium Check ---
     async def check_premium(self, user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
-        status = self.data_manager.get_premium_status(user_id)
+        status = await self.data_manager.get_premium_status(user_id)
         if status['is_premium']:
             return True
 
@@ -935,14 +1249,14 @@ class MyanmarFinanceBot:
         Free User ဆိုလျှင် -> (၁) ခုအောက်ဆို True၊ (၁) ခု ပြည့်သွားလျှင် False
         """
         user_id = update.effective_user.id
-        status = self.data_manager.get_premium_status(user_id)
+        status = await self.data_manager.get_premium_status(user_id)
 
         if status['is_premium']:
             return True  # Premium users have no limit
 
         # Free user check
         FREE_LIMIT = 1
-        current_budgets = self.data_manager.get_budgets(user_id)
+        current_budgets = await self.data_manager.get_budgets(user_id)
         count = len(current_budgets)
 
         if count < FREE_LIMIT:
@@ -955,13 +1269,13 @@ class MyanmarFinanceBot:
     async def check_goal_limit(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """Goal ကန့်သတ်ချက်ကို စစ်ဆေးပါ။ (Free Limit = 1)"""
         user_id = update.effective_user.id
-        status = self.data_manager.get_premium_status(user_id)
+        status = await self.data_manager.get_premium_status(user_id)
 
         if status['is_premium']:
             return True
 
         FREE_LIMIT = 1
-        current_goals = self.data_manager.get_all_goals(user_id)
+        current_goals = await self.data_manager.get_all_goals(user_id)
         count = len(current_goals)
 
         if count < FREE_LIMIT:
@@ -973,13 +1287,13 @@ class MyanmarFinanceBot:
     async def check_category_limit(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category_type: str) -> bool:
         """Custom Category ကန့်သတ်ချက်ကို စစ်ဆေးပါ။ (Free Limit = 2)"""
         user_id = update.effective_user.id
-        status = self.data_manager.get_premium_status(user_id)
+        status = await self.data_manager.get_premium_status(user_id)
 
         if status['is_premium']:
             return True
 
         FREE_LIMIT = 2 # ဥပမာ- Free user ကို (၂) ခု ပေးမည်
-        current_categories = self.data_manager.get_custom_categories(user_id, category_type)
+        current_categories = await self.data_manager.get_custom_categories(user_id, category_type)
         count = len(current_categories)
 
         if count < FREE_LIMIT:
@@ -993,7 +1307,7 @@ class MyanmarFinanceBot:
     # --- Handler: Goal Tracking Menu ---
     async def goal_tracking_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        goals = self.data_manager.get_all_goals(user_id)
+        goals = await self.data_manager.get_all_goals(user_id)
 
         keyboard = [
             [InlineKeyboardButton("➕ ပန်းတိုင်အသစ် ထည့်ရန်", callback_data='goal_add_start')],
@@ -1017,7 +1331,7 @@ class MyanmarFinanceBot:
         user_id = update.effective_user.id
         await update.callback_query.answer("🎯 Goal Progress ကို စစ်ဆေးနေပါသည်...", show_alert=False)
 
-        progress_list = self.data_manager.calculate_goal_progress(user_id)
+        progress_list = await self.data_manager.calculate_goal_progress(user_id)
 
         if not progress_list:
             await update.callback_query.edit_message_text(TEXTS["goal_no_set"], reply_markup=None)
@@ -1052,7 +1366,7 @@ class MyanmarFinanceBot:
     # --- Handler: Goal Delete Menu ---
     async def delete_goal_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        goals = self.data_manager.get_all_goals(user_id)
+        goals = await self.data_manager.get_all_goals(user_id)
 
         if not goals:
             await update.callback_query.edit_message_text(TEXTS["goal_no_set"], reply_markup=None)
@@ -1110,7 +1424,7 @@ class MyanmarFinanceBot:
             await update.message.reply_text("❌ ရည်မှန်းချက်ထားသည့် ရက်စွဲပုံစံ မမှန်ကန်ပါ သို့မဟုတ် လက်ရှိရက်စွဲထက် နောက်မကျရပါ။ `MM/DD/YYYY` ပုံစံဖြင့်သာ ရိုက်ထည့်ပေးပါ။")
             return True
 
-        self.data_manager.add_goal(
+        await self.data_manager.add_goal(
             user_id, goal_name, goal_amount, target_date)
 
         await update.message.reply_text(
@@ -1174,7 +1488,7 @@ class MyanmarFinanceBot:
         # (!!!) အမှားပြင်ဆင်ချက်- User က /start နှိပ်တိုင်း state ကို အမြဲတမ်း clear လုပ်ပါ (!!!)
         context.user_data.clear()
 
-        self.data_manager.get_premium_status(user.id)
+        await self.data_manager.get_premium_status(user.id)
 
         keyboard = [[KeyboardButton(text) for text in row]
                     for row in TEXTS["main_reply_buttons"]]
@@ -1207,7 +1521,7 @@ class MyanmarFinanceBot:
 
     async def premium_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        status = self.data_manager.get_premium_status(user_id)
+        status = await self.data_manager.get_premium_status(user_id)
 
         # (!!!) --- NEW FREEMIUM LOGIC START --- (!!!)
         # Free User ဖြစ်စေ၊ Premium User ဖြစ်စေ၊ Menu အားလုံးကို အရင် ပြပါ
@@ -1281,29 +1595,24 @@ class MyanmarFinanceBot:
     async def summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         today = dt.datetime.now()
-        start_of_month = today.replace(day=1, hour=0, minute=0, second=0)
 
         # --- Part 1: Monthly Flow (ယခုလ ဝင်ငွေ/ထွက်ငွေ) ---
-        transactions = self.data_manager.get_transactions(
-            user_id, start_date=start_of_month)
-        
-        total_income = 0
-        total_expense = 0
-        
-        if transactions:
-            df = pd.DataFrame(transactions)
-            total_income = df[df['type'] == 'income']['amount'].sum()
-            total_expense = df[df['type'] == 'expense']['amount'].sum()
+        # (!!!) monthly_rollup ကနေ တိုက်ရိုက်ဖတ်ပါ (Transaction အားလုံးကို မဆွဲတော့ပါ) (!!!)
+        monthly_totals = await self.data_manager.get_monthly_totals(user_id, today.year, today.month)
+        total_income = monthly_totals['income']
+        total_expense = monthly_totals['expense']
 
         month_str = format_myanmar_date(today)
         response_text = f"{TEXTS['summary_current_month'].format(month=month_str)}\n{TEXTS['summary_details'].format(income=total_income, expense=total_expense, balance=(total_income - total_expense))}"
 
         # --- Part 2: Account Balances (လက်ရှိ လက်ကျန်ငွေ စုစုပေါင်း) ---
-        accounts_with_balance = self.data_manager.get_accounts_with_balance(user_id)
-        unassigned_balance = self.data_manager.get_unassigned_balance(user_id)
+        # (!!!) Account အားလုံးနဲ့ Unassigned ကို Query တစ်ခုတည်းနဲ့ တွက်ပါ (!!!)
+        balance_overview = await self.data_manager.get_balance_overview(user_id)
+        accounts_with_balance = balance_overview['accounts']
+        unassigned_balance = balance_overview['unassigned']
         
         # User က data လုံးဝ မရှိရင် (Account လည်း မရှိ၊ Unassigned လည်း မရှိ၊ ဒီလ tx လည်း မရှိ)
-        if not accounts_with_balance and unassigned_balance == 0 and not transactions:
+        if not accounts_with_balance and unassigned_balance == 0 and monthly_totals['tx_count'] == 0:
             await context.bot.send_message(user_id, TEXTS["no_data"])
             return
         
@@ -1331,7 +1640,7 @@ class MyanmarFinanceBot:
         if not await self.check_premium(user_id, context):
             return
 
-        settings = self.data_manager.get_reminder_settings(user_id)
+        settings = await self.data_manager.get_reminder_settings(user_id)
 
         weekly_status = "✅ ဖွင့်ထားသည်" if settings.get(
             'weekly_summary') else "❌ ပိတ်ထားသည်"
@@ -1360,24 +1669,17 @@ class MyanmarFinanceBot:
 
     # --- Budget Status Calculation Logic ---
 
-    def calculate_budget_status(self, user_id: int, current_tx: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Dict[str, Any]], bool]:
-        budgets = self.data_manager.get_budgets(user_id)
+    async def calculate_budget_status(self, user_id: int, current_tx: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Dict[str, Any]], bool]:
+        budgets = await self.data_manager.get_budgets(user_id)
         if not budgets:
             return TEXTS["budget_no_set"], [], False
 
         today = dt.datetime.now()
         month_str = format_myanmar_date(today)
-        start_of_month = today.replace(day=1, hour=0, minute=0, second=0)
-
-        transactions = self.data_manager.get_transactions(
-            user_id, start_date=start_of_month)
-
-        if not transactions:
-            df = pd.DataFrame(columns=['type', 'category', 'amount'])
-        else:
-            df = pd.DataFrame(transactions)
 
-        expense_df = df[df['type'] == 'expense']
+        # Category အလိုက် ယခုလ သုံးစွဲမှု (monthly_rollup)
+        monthly_totals = await self.data_manager.get_monthly_totals(user_id, today.year, today.month)
+        spent_by_category = monthly_totals['expense_by_category']
 
         if today.month == 12:
             end_of_month = dt.datetime(
@@ -1392,8 +1694,7 @@ class MyanmarFinanceBot:
         alert_needed = False
 
         for category, budgeted_amount in budgets.items():
-            spent = expense_df[expense_df['category']
-                               == category]['amount'].sum()
+            spent = spent_by_category.get(category, 0)
             remaining = budgeted_amount - spent
             percent_spent = (spent / budgeted_amount) * \
                 100 if budgeted_amount > 0 else 0
@@ -1436,7 +1737,7 @@ class MyanmarFinanceBot:
     # --- Budget Status Handler ---
     async def budget_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        response_text, _, _ = self.calculate_budget_status(user_id)
+        response_text, _, _ = await self.calculate_budget_status(user_id)
 
         if response_text == TEXTS["budget_no_set"]:
             await context.bot.send_message(user_id, response_text)
@@ -1444,26 +1745,17 @@ class MyanmarFinanceBot:
             await context.bot.send_message(user_id, response_text, parse_mode=ParseMode.MARKDOWN)
 
     async def monthly_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not self.data_manager.get_premium_status(update.effective_user.id)['is_premium']:
+        if not (await self.data_manager.get_premium_status(update.effective_user.id))['is_premium']:
             await self.check_premium(update.effective_user.id, context)
             return
 
         user_id = update.effective_user.id
-        all_txs = self.data_manager.get_transactions(
-            user_id, start_date=None, end_date=None)
-        if not all_txs:
+        # (!!!) Transaction အားလုံးကို မဆွဲတော့ဘဲ Data ရှိတဲ့ လ တွေကိုပဲ ယူပါ (!!!)
+        unique_months = await self.data_manager.get_active_months(user_id)
+        if not unique_months:
             await context.bot.send_message(user_id, TEXTS["no_data"])
             return
 
-        dates = []
-        for tx in all_txs:
-            try:
-                dates.append(dt.datetime.fromisoformat(tx['date']))
-            except (ValueError, TypeError):
-                pass
-
-        unique_months = sorted(list(set((d.year, d.month)
-                               for d in dates)), reverse=True)
         keyboard = [[InlineKeyboardButton(format_myanmar_date(dt.datetime(
             year, month, 1)), callback_data=f'select_month_{year}-{month}')] for year, month in unique_months]
         
@@ -1501,7 +1793,7 @@ class MyanmarFinanceBot:
             await update.message.reply_text("User ID နှင့် ရက်အရေအတွက်ကို ဂဏန်းဖြင့်သာ ထည့်ပါ။")
             return
 
-        end_date = self.data_manager.grant_premium(target_user_id, days)
+        end_date = await self.data_manager.grant_premium(target_user_id, days)
         await update.message.reply_text(f"✅ User ID: {target_user_id} ကို Premium {days} ရက် ( {end_date} ) အထိ ဖွင့်ပေးလိုက်ပါပြီ။")
 
         try:
@@ -1609,12 +1901,12 @@ class MyanmarFinanceBot:
         new_description = parts[2].strip()
         tx_id = state['tx_id']
 
-        all_categories = self.data_manager.get_all_categories(
+        all_categories = await self.data_manager.get_all_categories(
             user_id, new_type, TEXTS[f"{new_type}_categories"])
         new_category = next(
             (c for c in all_categories if c in new_description), all_categories[-1])
 
-        updated_tx = self.data_manager.update_transaction(
+        updated_tx = await self.data_manager.update_transaction(
             user_id, tx_id, new_type, new_amount, new_description, new_category)
 
         if updated_tx:
@@ -1632,6 +1924,18 @@ class MyanmarFinanceBot:
         return True
 
     # --- Handle Recurring Transaction Input ---
+    def _recurring_schedule_label(self, rtx: Dict[str, Any]) -> str:
+        """Recurring item ရဲ့ အချိန်ဇယား (နေ့စဉ် / အပတ်စဉ် / လစဉ် / နှစ်စဉ်) ကို စာသားအဖြစ်"""
+        frequency = rtx.get('frequency') or 'monthly'
+        if frequency == 'daily':
+            return TEXTS["recurring_schedule_daily"]
+        if frequency == 'weekly':
+            return TEXTS["recurring_schedule_weekly"].format(weekday=TEXTS["weekday_names"][rtx['day'] % 7])
+        if frequency == 'yearly':
+            run_date = self._parse_date(rtx.get('next_run_at') or '') or dt.datetime.now()
+            return TEXTS["recurring_schedule_yearly"].format(month=MYANMAR_MONTHS[run_date.month], day=rtx['day'])
+        return TEXTS["recurring_schedule_monthly"].format(day=rtx['day'])
+
     async def handle_recurring_tx_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str):
         state = context.user_data
 
@@ -1646,32 +1950,41 @@ class MyanmarFinanceBot:
         command = parts[0].lower()
         tx_type = 'income' if command in ["ဝင်ငွေ", "income"] else 'expense'
 
+        # နောက်ဆုံး စကားလုံး: ဂဏန်း = လစဉ် ရက်၊ နေ့စဉ် / အပတ်စဉ် / နှစ်စဉ် = ယနေ့ကနေ စပါ
+        schedule_word = parts[3].strip().lower()
+        frequency = next((freq for freq, words in TEXTS["recurring_frequency_keywords"].items()
+                          if schedule_word in words), 'monthly')
+        today = dt.date.today()
         try:
             amount = int(parts[1].replace(',', '').replace('.', ''))
-            day = int(parts[3])
+            if frequency == 'monthly':
+                day = int(schedule_word)
+            else:
+                day = {'daily': None, 'weekly': today.weekday(), 'yearly': today.day}[frequency]
         except ValueError:
             await update.message.reply_text(TEXTS["recurring_tx_invalid_format"])
             return True
 
-        if not (1 <= day <= 28):
+        if frequency == 'monthly' and not (1 <= day <= 28):
             await update.message.reply_text(TEXTS["recurring_tx_invalid_format"])
             return True
 
         description = parts[2].strip()
 
-        all_categories = self.data_manager.get_all_categories(
+        all_categories = await self.data_manager.get_all_categories(
             user_id, tx_type, TEXTS[f"{tx_type}_categories"])
         category = next(
             (c for c in all_categories if c in description), all_categories[-1])
 
-        self.data_manager.add_recurring_tx(
-            user_id, tx_type, amount, description, category, day)
+        await self.data_manager.add_recurring_tx(
+            user_id, tx_type, amount, description, category, day, frequency)
 
         await update.message.reply_text(
             TEXTS["recurring_tx_add_success"].format(
                 desc=description,
                 amount=amount,
-                day=day
+                schedule=self._recurring_schedule_label(
+                    {'frequency': frequency, 'day': day, 'next_run_at': today.isoformat()})
             )
         )
 
@@ -1701,7 +2014,7 @@ class MyanmarFinanceBot:
             await update.message.reply_text("ℹ️ Admin Dashboard မှ Admin ကိုယ်တိုင်၏ Data ကို ရှာဖွေ၍ မရပါ။")
             return True
 
-        details = self.data_manager.get_user_details(target_user_id)
+        details = await self.data_manager.get_user_details(target_user_id)
 
         if not details:
             await update.message.reply_text(TEXTS["admin_user_not_found"].format(user_id=target_user_id))
@@ -1715,6 +2028,8 @@ class MyanmarFinanceBot:
             status=status_text,
             end_date=details['end_date'],
             tx_count=details['tx_count'],
+            last_tx_at=details['last_tx_at'].strftime('%Y-%m-%d %H:%M') if details['last_tx_at'] else '-',
+            last_active_at=details['last_active_at'].strftime('%Y-%m-%d') if details['last_active_at'] else '-',
             used_trial="Yes" if details['used_trial'] else "No"
         )
 
@@ -1746,8 +2061,7 @@ class MyanmarFinanceBot:
         context.user_data['broadcast_message'] = text
         context.user_data['mode'] = 'admin_broadcast_confirm'  # Change mode
 
-        user_ids = self.data_manager.get_all_user_ids()
-        count = len(user_ids)
+        count = await self.data_manager.count_broadcast_recipients(exclude_id=user_id)
 
         keyboard = [
             [InlineKeyboardButton(TEXTS["admin_broadcast_confirm_button"],
@@ -1795,7 +2109,7 @@ class MyanmarFinanceBot:
                     return
 
             # DB Manager ကို ခေါ်သုံးပါ
-            account, message = self.data_manager.add_account(user_id, account_name, initial_balance)
+            account, message = await self.data_manager.add_account(user_id, account_name, initial_balance)
             
             await update.message.reply_text(message) # Show success or fail message
             
@@ -1916,7 +2230,7 @@ class MyanmarFinanceBot:
                 context.user_data.clear()
                 return
 
-            if self.data_manager.add_custom_category(user_id, cat_type, cat_name):
+            if await self.data_manager.add_custom_category(user_id, cat_type, cat_name):
                 await update.message.reply_text(TEXTS["cat_add_success"].format(name=cat_name))
             else:
                 await update.message.reply_text(TEXTS["cat_add_fail_exists"].format(name=cat_name))
@@ -1947,7 +2261,7 @@ class MyanmarFinanceBot:
             await self.summary(update, context)
             return
         elif text == TEXTS["main_reply_buttons"][1][1]:  # 🧾 အစီရင်ခံစာ
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await self.check_premium(user_id, context)
                 return
             await self.monthly_report(update, context)
@@ -1999,7 +2313,7 @@ class MyanmarFinanceBot:
                     return
                 description = parts[2].strip()
 
-                all_categories = self.data_manager.get_all_categories(
+                all_categories = await self.data_manager.get_all_categories(
                     user_id, tx_type, TEXTS[f"{tx_type}_categories"])
                 category = next(
                     (c for c in all_categories if c in description), all_categories[-1])
@@ -2041,7 +2355,7 @@ class MyanmarFinanceBot:
                 context.user_data['quick_add_amount'] = amount
                 context.user_data['quick_add_type'] = tx_type # <-- Type ကို ကြိုသိတယ်
 
-                all_categories = self.data_manager.get_all_categories(
+                all_categories = await self.data_manager.get_all_categories(
                     user_id, tx_type, TEXTS[f"{tx_type}_categories"])
                 
                 context.user_data['quick_add_categories'] = all_categories
@@ -2105,12 +2419,12 @@ class MyanmarFinanceBot:
                 return
             category = parts[2].strip()
 
-            all_expense_cats = self.data_manager.get_all_categories(
+            all_expense_cats = await self.data_manager.get_all_categories(
                 user_id, 'expense', TEXTS["expense_categories"])
             if category not in all_expense_cats:
                 await update.message.reply_text(f"❌ '{category}' ဆိုတဲ့ Category မရှိပါဘူး။ အသုံးပြုနိုင်တဲ့ Category တွေကတော့: {', '.join(all_expense_cats)} ဖြစ်ပါတယ်။")
                 return
-            self.data_manager.set_budget(user_id, category, amount)
+            await self.data_manager.set_budget(user_id, category, amount)
             await update.message.reply_text(TEXTS["budget_set_success"].format(category=category, amount=amount))
             return # <--- ...ဒီအထိ အကုန် Indent ဝင်ရပါမယ်
 
@@ -2191,41 +2505,50 @@ class MyanmarFinanceBot:
             return
 
         document = update.message.document
-        if not document.file_name.endswith('.json'):
+        if not document.file_name.endswith(('.json', '.json.gz')):
             await update.message.reply_text(TEXTS["restore_error_json"])
             return
 
+        # (!!!) File တစ်ခုလုံးကို bytearray / str / dict အဖြစ် Memory ထဲ မတင်တော့ဘဲ Temp file ထဲ Download လုပ်ပြီး
+        # Worker thread ပေါ်မှာ Record တစ်ခုချင်း ဖတ်၊ စစ်ဆေး၊ Chunk လိုက် INSERT လုပ်ပါ
+        backup_file = tempfile.SpooledTemporaryFile(max_size=BACKUP_SPOOL_MAX_BYTES)
         try:
             # Download the file
             json_file = await document.get_file()
-            file_content_bytes = await json_file.download_as_bytearray()
-
-            # Decode and parse JSON
-            file_content_str = file_content_bytes.decode('utf-8')
-            backup_data = json.loads(file_content_str)
-
-            # Check if file format is valid (key တွေ အကုန် ပါ, မပါ စစ်ပါ)
-            required_keys = ["transactions", "budgets",
-                             "goals", "custom_categories", "recurring_txs"]
-            if not all(key in backup_data for key in required_keys):
-                await update.message.reply_text(TEXTS["restore_error_format"])
-                context.user_data.clear()
-                return
-
-            # Run the restore process in DatabaseManager
-            success = self.data_manager.restore_data_from_backup(
-                user_id, backup_data)
-
-            if success:
-                await update.message.reply_text(TEXTS["restore_success"])
+            await json_file.download_to_memory(out=backup_file)
+            backup_file.seek(0)
+
+            # Run the streaming restore (gzip NDJSON သို့မဟုတ် JSON အဟောင်း) in DatabaseManager
+            # Timeout နဲ့ မဖြတ်ပါ - Worker က backup_file ကို ဖတ်နေဆဲ finally က ပိတ်မိမှာစိုးလို့ ပြီးတဲ့အထိ စောင့်ပါ
+            # (Unit of work session ကိုလည်း Worker က ကိုင်ထားဆဲ ဖြစ်ပါတယ်)
+            report = await self.data_manager.run_until_done(
+                self.data_manager.sync.restore_from_backup_file, user_id, backup_file)
+
+            if report:
+                lines = [TEXTS["restore_success"], ""]
+                for table, rows in report["counts"].items():
+                    lines.append(TEXTS["restore_report_line"].format(
+                        table=table, rows=rows, seconds=report["seconds"].get(table, 0)))
+                lines.append(TEXTS["restore_report_total"].format(
+                    rows=sum(report["counts"].values()), seconds=report["total_seconds"]))
+                await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.MARKDOWN)
             else:
                 await update.message.reply_text(TEXTS["restore_error_general"])
 
         except json.JSONDecodeError:
             await update.message.reply_text(TEXTS["restore_error_json"])
+        except asyncio.TimeoutError:
+            # Python 3.11 မှာ TimeoutError က OSError subclass - File ပုံစံ မမှန်တာ မဟုတ်ပါ
+            logger.error(f"Restore for user {user_id} timed out")
+            await update.message.reply_text(TEXTS["restore_error_general"])
+        except (ValueError, OSError, EOFError):
+            # Header / Row မမှန် / File ပြတ်နေ / gzip ပျက်နေ (Data အဟောင်းကို Rollback လုပ်ပြီးပါပြီ)
+            await update.message.reply_text(TEXTS["restore_error_format"])
         except Exception as e:
             logger.error(f"Error restoring backup for user {user_id}: {e}")
             await update.message.reply_text(TEXTS["restore_error_general"])
+        finally:
+            backup_file.close()
 
         context.user_data.clear()
 
@@ -2282,7 +2605,7 @@ class MyanmarFinanceBot:
             
             if account_id == 'none':
                 # User က "Account မသတ်မှတ်" ကို ရွေးသည်
-                self.data_manager.add_transaction(
+                await self.data_manager.add_transaction(
                     user_id=user_id,
                     type=tx_data['type'],
                     amount=tx_data['amount'],
@@ -2296,7 +2619,7 @@ class MyanmarFinanceBot:
             
             else:
                 # User က Account တစ်ခုခုကို ရွေးသည်
-                self.data_manager.add_transaction(
+                await self.data_manager.add_transaction(
                     user_id=user_id,
                     type=tx_data['type'],
                     amount=tx_data['amount'],
@@ -2307,7 +2630,7 @@ class MyanmarFinanceBot:
                 
                 # (!!!) --- FINAL FIXED BLOCK (!!!) ---
                 # Account နာမည်ကို ပြန်ရှာပြီး user ကို ပြပါ
-                account_list = self.data_manager.get_accounts(user_id)
+                account_list = await self.data_manager.get_accounts(user_id)
                 # 'account' ဆိုတဲ့ variable ထဲကို ရှာတွေ့တဲ့ dict ကို ထည့်ပါ
                 account = next((acc for acc in account_list if acc['id'] == account_id), None)
                 # 'acc' ကို မသုံးဘဲ၊ 'account' variable ကို သုံးပါ
@@ -2323,7 +2646,7 @@ class MyanmarFinanceBot:
             context.user_data.clear() # State ကို ရှင်းပါ
             
             # --- (!!!) Real-time Budget Alert Check (ဒီနေရာကို ရွှေ့ပါ) (!!!) ---
-            if tx_data['type'] == 'expense' and self.data_manager.get_premium_status(user_id)['is_premium']:
+            if tx_data['type'] == 'expense' and (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await self.check_budget_alert(user_id, tx_data['category'], tx_data['amount'], context)
             
             return
@@ -2357,33 +2680,34 @@ class MyanmarFinanceBot:
 
             await query.edit_message_text(TEXTS["backup_prompt_sending"])
 
+            # (!!!) Data တွေကို Memory ထဲ တစ်ခါတည်း မတင်တော့ဘဲ gzip NDJSON အဖြစ် Spooled temp file ထဲ တစ်ကြောင်းချင်း ရေးပါ
+            # (BACKUP_SPOOL_MAX_BYTES ထက် ကြီးရင် Disk ပေါ် ရောက်သွားပါမယ်)
+            backup_file = tempfile.SpooledTemporaryFile(max_size=BACKUP_SPOOL_MAX_BYTES)
             try:
-                # 1. Get all data from DB
-                all_data = self.data_manager.get_all_data_for_backup(user_id)
+                # 1. Stream all tables from DB into the compressed file (Worker ရေးနေဆဲ File ကို မပိတ်မိစေရန် ပြီးတဲ့အထိ စောင့်ပါ)
+                await self.data_manager.run_until_done(self.data_manager.sync.write_backup, user_id, backup_file)
+                backup_file.seek(0)
 
-                # 2. Convert to JSON string (use default=str to handle datetime objects)
-                backup_json_str = json.dumps(
-                    all_data, indent=4, ensure_ascii=False, default=str)
-
-                # 3. Convert string to BytesIO file
-                backup_file = io.BytesIO(backup_json_str.encode('utf-8'))
-
-                # 4. Send file to user
+                # 2. Send file to user
                 date_str = dt.datetime.now().strftime('%Y-%m-%d')
-                file_name = f"backup_adu_finance_{date_str}.json"
+                file_name = f"backup_adu_finance_{date_str}.json.gz"
 
                 await context.bot.send_document(
                     chat_id=user_id,
                     document=backup_file,
                     filename=file_name,
                     caption=TEXTS["backup_prompt_success"].format(
-                        date=date_str)
+                        date=date_str),
+                    read_timeout=60.0,
+                    write_timeout=60.0
                 )
                 await query.delete_message()  # "Processing..." message ကို ဖျက်ပါ
 
             except Exception as e:
                 logger.error(f"Error during backup for user {user_id}: {e}")
                 await query.edit_message_text("❌ Backup ပြုလုပ်ရာတွင် အမှားအယွင်း ဖြစ်ပွားပါသည်။")
+            finally:
+                backup_file.close()
             return
 
         elif data == 'restore_start':
@@ -2420,7 +2744,7 @@ class MyanmarFinanceBot:
             # <-- (!!!) Save the type
             context.user_data['quick_add_type'] = transaction_type
 
-            all_categories = self.data_manager.get_all_categories(
+            all_categories = await self.data_manager.get_all_categories(
                 user_id, transaction_type, TEXTS[f"{transaction_type}_categories"])
 
             context.user_data['quick_add_categories'] = all_categories
@@ -2547,7 +2871,7 @@ class MyanmarFinanceBot:
             if user_id != self.ADMIN_ID:
                 return await query.answer(TEXTS["not_admin"], show_alert=True)
             target_user_id = int(data.split('_')[-1])
-            self.data_manager.grant_premium(target_user_id, 30)
+            await self.data_manager.grant_premium(target_user_id, 30)
             await query.answer(TEXTS["admin_user_granted"].format(user_id=target_user_id))
             await self._send_user_details(query.message, context, target_user_id)
             return
@@ -2556,7 +2880,7 @@ class MyanmarFinanceBot:
             if user_id != self.ADMIN_ID:
                 return await query.answer(TEXTS["not_admin"], show_alert=True)
             target_user_id = int(data.split('_')[-1])
-            self.data_manager.revoke_premium(target_user_id)
+            await self.data_manager.revoke_premium(target_user_id)
             await query.answer(TEXTS["admin_user_revoked"].format(user_id=target_user_id))
             await self._send_user_details(query.message, context, target_user_id)
             return
@@ -2571,7 +2895,7 @@ class MyanmarFinanceBot:
                 target_user_id = int(parts[2])
                 days = int(parts[3])
 
-                end_date = self.data_manager.grant_premium(
+                end_date = await self.data_manager.grant_premium(
                     target_user_id, days)
 
                 await context.bot.send_message(
@@ -2616,7 +2940,7 @@ class MyanmarFinanceBot:
 
         # --- NEW: Delete Data Callbacks ---
         if data == 'delete_my_data_confirm':
-            if self.data_manager.delete_user_data(user_id):
+            if await self.data_manager.delete_user_data(user_id):
                 await query.edit_message_text(TEXTS["delete_data_success"], reply_markup=None)
                 logger.info(f"User {user_id} has deleted all their data.")
             else:
@@ -2649,10 +2973,10 @@ class MyanmarFinanceBot:
             return
         elif data.startswith('goal_delete_confirm_'):
             goal_id = data.split('_')[3]
-            goals = self.data_manager.get_all_goals(user_id)
+            goals = await self.data_manager.get_all_goals(user_id)
             goal = next((g for g in goals if g['id'] == goal_id), None)
 
-            if goal and self.data_manager.delete_goal(user_id, goal_id):
+            if goal and await self.data_manager.delete_goal(user_id, goal_id):
                 await query.edit_message_text(TEXTS["goal_delete_success"].format(name=goal['name']), reply_markup=None)
             else:
                 await query.edit_message_text(TEXTS["goal_not_found"], reply_markup=None)
@@ -2661,7 +2985,7 @@ class MyanmarFinanceBot:
         # --- Transaction Management Callbacks ---
         elif data.startswith('tx_select_'):
             tx_id = data.split('_')[2]
-            tx = self.data_manager.get_transaction_by_id(user_id, tx_id)
+            tx = await self.data_manager.get_transaction_by_id(user_id, tx_id)
 
             if not tx:
                 await query.edit_message_text(TEXTS["tx_not_found"], reply_markup=None)
@@ -2688,7 +3012,7 @@ class MyanmarFinanceBot:
 
         elif data.startswith('tx_delete_confirm_'):
             tx_id = data.split('_')[3]
-            if self.data_manager.delete_transaction(user_id, tx_id):
+            if await self.data_manager.delete_transaction(user_id, tx_id):
                 await query.edit_message_text(TEXTS["tx_delete_success"], reply_markup=None)
             else:
                 await query.edit_message_text(TEXTS["tx_not_found"], reply_markup=None)
@@ -2696,7 +3020,7 @@ class MyanmarFinanceBot:
 
         elif data.startswith('tx_edit_start_'):
             tx_id = data.split('_')[3]
-            tx = self.data_manager.get_transaction_by_id(user_id, tx_id)
+            tx = await self.data_manager.get_transaction_by_id(user_id, tx_id)
 
             if not tx:
                 await query.edit_message_text(TEXTS["tx_not_found"], reply_markup=None)
@@ -2727,6 +3051,50 @@ class MyanmarFinanceBot:
             await self.manage_transactions_menu(update, context)
             return
 
+        # --- (!!!) NEW: Transaction History Callbacks (!!!) ---
+        # Callback data (64 bytes) ထဲမှာ Cursor tx id ကိုသာ ထည့်ပြီး Filter တွေကို user_data ထဲမှာ သိမ်းပါ
+        elif data == 'txh_first':
+            await self.transaction_history(update, context)
+            return
+
+        elif data.startswith('txh_o_') or data.startswith('txh_n_'):
+            direction = 'older' if data.startswith('txh_o_') else 'newer'
+            await self.transaction_history(update, context, cursor_id=data[len('txh_o_'):], direction=direction)
+            return
+
+        elif data == 'txh_filter':
+            await self.transaction_history_filter_menu(update, context)
+            return
+
+        elif data.startswith('txh_ft_'):
+            tx_type = data[len('txh_ft_'):]
+            filters = context.user_data.setdefault('tx_history_filters', {})
+            filters['type'] = None if tx_type == 'all' else tx_type
+            filters['category'] = None  # Category က အမျိုးအစားနဲ့ တွဲနေလို့ ပြန်ရှင်းပါ
+            await self.transaction_history_filter_menu(update, context)
+            return
+
+        elif data.startswith('txh_fc_'):
+            categories = context.user_data.get('tx_history_categories', [])
+            index = int(data[len('txh_fc_'):])
+            filters = context.user_data.setdefault('tx_history_filters', {})
+            filters['category'] = categories[index] if 0 <= index < len(categories) else None
+            await self.transaction_history(update, context)
+            return
+
+        elif data.startswith('txh_fa_'):
+            account_id = data[len('txh_fa_'):]
+            filters = context.user_data.setdefault('tx_history_filters', {})
+            filters['account_id'] = None if account_id == 'all' else account_id
+            await self.transaction_history(update, context)
+            return
+
+        elif data == 'txh_fclear':
+            context.user_data.pop('tx_history_filters', None)
+            await self.transaction_history(update, context)
+            return
+        # --- (!!!) End of New (!!!) ---
+
         # --- Recurring Transaction Callbacks ---
         elif data == 'recurring_tx_menu':
             if not await self.check_premium(user_id, context):
@@ -2754,7 +3122,7 @@ class MyanmarFinanceBot:
             if not await self.check_premium(user_id, context):
                 return
 
-            rtxs = self.data_manager.get_recurring_txs(user_id)
+            rtxs = await self.data_manager.get_recurring_txs(user_id)
             if not rtxs:
                 await query.edit_message_text(TEXTS["recurring_tx_no_set"], reply_markup=None)
                 return
@@ -2762,7 +3130,7 @@ class MyanmarFinanceBot:
             keyboard = []
             for rtx in rtxs:
                 tx_type_my = "ဝင်ငွေ" if rtx['type'] == 'income' else "ထွက်ငွေ"
-                label = f"🗑️ {rtx['description']} ({tx_type_my}) - လစဉ် {rtx['day']} ရက်နေ့"
+                label = f"🗑️ {rtx['description']} ({tx_type_my}) - {self._recurring_schedule_label(rtx)}"
                 keyboard.append([InlineKeyboardButton(
                     label, callback_data=f'recurring_tx_delete_confirm_{rtx["id"]}')])
 
@@ -2776,10 +3144,10 @@ class MyanmarFinanceBot:
                 return
 
             tx_id = data.split('_')[4]
-            rtx_list = self.data_manager.get_recurring_txs(user_id)
+            rtx_list = await self.data_manager.get_recurring_txs(user_id)
             rtx = next((tx for tx in rtx_list if tx['id'] == tx_id), None)
 
-            if rtx and self.data_manager.delete_recurring_tx(user_id, tx_id):
+            if rtx and await self.data_manager.delete_recurring_tx(user_id, tx_id):
                 await query.edit_message_text(TEXTS["recurring_tx_delete_success"].format(name=rtx['description']), reply_markup=None)
             else:
                 await query.edit_message_text(TEXTS["recurring_tx_not_found"], reply_markup=None)
@@ -2816,7 +3184,7 @@ class MyanmarFinanceBot:
             return
         elif data.startswith('cat_remove_'):
             cat_type = data.split('_')[-1]
-            custom_cats = self.data_manager.get_custom_categories(
+            custom_cats = await self.data_manager.get_custom_categories(
                 user_id, cat_type)
             if not custom_cats:
                 await query.edit_message_text("ℹ️ ဖယ်ရှားရန် စိတ်ကြိုက် Category မရှိသေးပါ။")
@@ -2831,7 +3199,7 @@ class MyanmarFinanceBot:
             cat_type = parts[3]
             cat_name = '_'.join(parts[4:])
 
-            if self.data_manager.remove_custom_category(user_id, cat_type, cat_name):
+            if await self.data_manager.remove_custom_category(user_id, cat_type, cat_name):
                 await query.edit_message_text(TEXTS["cat_remove_success"].format(name=cat_name))
             else:
                 await query.edit_message_text(TEXTS["cat_remove_fail"].format(name=cat_name))
@@ -2843,7 +3211,7 @@ class MyanmarFinanceBot:
                 await query.edit_message_text("❌ Chart ပြုလုပ်ရန် လိုအပ်သော Library မရှိပါ။ (Plotly)")
                 return
 
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await query.answer("🚫 Premium မရှိသေးပါ။", show_alert=True)
                 return
 
@@ -2856,14 +3224,13 @@ class MyanmarFinanceBot:
             today = dt.datetime.now()
             month_date = dt.datetime(today.year, today.month, 1)
 
-            transactions = self.data_manager.get_transactions(
-                user_id, start_date=month_date)
+            df = await self.data_manager.get_transactions_frame(
+                user_id, start_date=month_date, columns=['type', 'category', 'amount'])
 
-            if not transactions:
+            if df.empty:
                 await query.edit_message_text(TEXTS["no_data"])
                 return
 
-            df = pd.DataFrame(transactions)
             df_filtered = df[df['type'] == analytics_type]
 
             if df_filtered.empty:
@@ -2890,7 +3257,7 @@ class MyanmarFinanceBot:
 
         # === UPDATED PREMIUM CALLBACK FLOW (STEP 3) ===
         elif data == 'premium_menu_back':
-            status = self.data_manager.get_premium_status(user_id)
+            status = await self.data_manager.get_premium_status(user_id)
             if not status['is_premium']:
                 message_text = TEXTS['premium_menu_header'] + "\n\n" + \
                     TEXTS['premium_menu_content'] + \
@@ -2909,7 +3276,7 @@ class MyanmarFinanceBot:
             query_data_parts = data.split('_')
             action = query_data_parts[1]
 
-            status = self.data_manager.get_premium_status(user_id)
+            status = await self.data_manager.get_premium_status(user_id)
             if status['is_premium'] and action not in ['menu', 'back']:
                 await query.edit_message_text(f"✅ သင့် Premium/Trial မှာ {status['end_date']} နေ့အထိ သုံးစွဲခွင့်ရှိနေပါပြီ။", reply_markup=None)
                 return
@@ -2937,7 +3304,7 @@ class MyanmarFinanceBot:
                     await query.edit_message_text("❌ Free Trial ကို တစ်ကြိမ်သာ သုံးစွဲနိုင်ပါသည်။ ကျေးဇူးပြု၍ ပုံမှန် Premium Plan ကို ယူပေးပါ။", reply_markup=None)
                     return
 
-                end_date = self.data_manager.grant_premium(
+                end_date = await self.data_manager.grant_premium(
                     user_id, 7, is_trial=True)
                 await query.edit_message_text(
                     TEXTS["premium_trial_granted"].format(end_date=end_date),
@@ -3030,7 +3397,7 @@ class MyanmarFinanceBot:
         # === END OF UPDATED PREMIUM FLOW ===
 
         elif data.startswith('select_month_'):
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await query.answer("🚫 Premium မရှိသေးပါ။", show_alert=True)
                 return
 
@@ -3049,7 +3416,7 @@ class MyanmarFinanceBot:
                 pass
 
         elif data.startswith('export_type_monthly_'):
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await query.answer("🚫 Premium မရှိသေးပါ။", show_alert=True)
                 return
 
@@ -3076,7 +3443,7 @@ class MyanmarFinanceBot:
             context.user_data.clear()
 
         elif data.startswith('export_custom_'):
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 await query.answer("🚫 Premium မရှိသေးပါ။", show_alert=True)
                 return
 
@@ -3101,10 +3468,10 @@ class MyanmarFinanceBot:
 
         # --- Reminder Callbacks ---
         elif data == 'weekly_reminder_select_day':
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 return
 
-            settings = self.data_manager.get_reminder_settings(user_id)
+            settings = await self.data_manager.get_reminder_settings(user_id)
             current_day = settings.get('weekly_day', 'Sunday')
 
             keyboard = []
@@ -3124,27 +3491,27 @@ class MyanmarFinanceBot:
             return
 
         elif data.startswith('set_reminder_day_'):
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 return
             day = data.split('_')[3]
 
-            self.data_manager.set_reminder_setting(
+            await self.data_manager.set_reminder_setting(
                 user_id, 'weekly_summary', True)
-            self.data_manager.set_reminder_setting(user_id, 'weekly_day', day)
+            await self.data_manager.set_reminder_setting(user_id, 'weekly_day', day)
 
             await query.edit_message_text(TEXTS["reminder_set_success"].format(day=day))
             await self.reminder_menu(update, context)
             return
 
         elif data == 'toggle_weekly_reminder':
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 return
 
-            current_status = self.data_manager.get_reminder_settings(
-                user_id).get('weekly_summary', False)
+            current_status = (await self.data_manager.get_reminder_settings(
+                user_id)).get('weekly_summary', False)
             new_status = not current_status
 
-            self.data_manager.set_reminder_setting(
+            await self.data_manager.set_reminder_setting(
                 user_id, 'weekly_summary', new_status)
 
             message = f"✅ အပတ်စဉ် အစီရင်ခံစာ သတိပေးချက်ကို ဖွင့်လိုက်ပါပြီ။" if new_status else f"❌ အပတ်စဉ် အစီရင်ခံစာ သတိပေးချက်ကို ပိတ်လိုက်ပါပြီ။"
@@ -3153,14 +3520,14 @@ class MyanmarFinanceBot:
             return
 
         elif data == 'toggle_daily_reminder':
-            if not self.data_manager.get_premium_status(user_id)['is_premium']:
+            if not (await self.data_manager.get_premium_status(user_id))['is_premium']:
                 return
 
-            current_status = self.data_manager.get_reminder_settings(
-                user_id).get('daily_transaction', False)
+            current_status = (await self.data_manager.get_reminder_settings(
+                user_id)).get('daily_transaction', False)
             new_status = not current_status
 
-            self.data_manager.set_reminder_setting(
+            await self.data_manager.set_reminder_setting(
                 user_id, 'daily_transaction', new_status)
 
             message = TEXTS["daily_reminder_on"] if new_status else TEXTS["daily_reminder_off"]
@@ -3206,20 +3573,16 @@ class MyanmarFinanceBot:
             caption_text = f"✅ {start_str} မှ {end_str} အထိ {export_type.upper()} အစီရင်ခံစာကို အောက်ပါအတိုင်း ထုတ်ယူပေးလိုက်ပါပြီ။"
             file_name = f"custom_report_{report_start_date.strftime('%Y%m%d')}_{report_end_date.strftime('%Y%m%d')}.{export_type}"
 
-        transactions = self.data_manager.get_transactions(
-            user_id, start_date=report_start_date, end_date=report_end_date)
+        transactions = await self.data_manager.get_transactions_frame(
+            user_id, start_date=report_start_date, end_date=report_end_date,
+            columns=['date', 'type', 'amount', 'description', 'category'])
 
-        if not transactions:
+        if transactions.empty:
             await context.bot.send_message(user_id, TEXTS["data_not_found"])
             return
 
-        for tx in transactions:
-            if isinstance(tx['date'], str):
-                tx['date'] = self._parse_date(tx['date'])
-
         if export_type == 'pdf' and self.chart_manager.PLOTLY_AVAILABLE:
-            df = pd.DataFrame(transactions)
-            df_expense = df[df['type'] == 'expense']
+            df_expense = transactions[transactions['type'] == 'expense']
 
             if not df_expense.empty:
                 chart_title = f"{title} - အသုံးစရိတ် Chart"
@@ -3253,127 +3616,94 @@ class MyanmarFinanceBot:
             await context.bot.send_message(user_id, TEXTS["export_failure"])
 
     # --- Send Daily Reminder ---
-    async def send_daily_transaction_reminder(self, user_id: int, time_of_day: str):
-        try:
-            context = ContextTypes.DEFAULT_TYPE(application=self.application)
-
-            if time_of_day == 'morning':
-                message = TEXTS['daily_reminder_morning']
-            else:
-                message = TEXTS['daily_reminder_evening']
-
-            keyboard = [[KeyboardButton(text) for text in row]
-                        for row in TEXTS["main_reply_buttons"][:1]]
-            reply_markup = ReplyKeyboardMarkup(
-                keyboard, resize_keyboard=True, one_time_keyboard=False)
-
-            await context.bot.send_message(
-                user_id,
-                message,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-        except Exception as e:
-            logger.error(f"Failed to send daily reminder to {user_id}: {e}")
+    def _daily_reminder_markup(self) -> ReplyKeyboardMarkup:
+        keyboard = [[KeyboardButton(text) for text in row]
+                    for row in TEXTS["main_reply_buttons"][:1]]
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
 
     # --- Scheduler Methods ---
     def setup_reminders(self):
+        # ၉ နာရီ job တစ်ခုတည်းက Weekly Summary ရော Morning reminder ပါ ပို့ပါတယ်
         self.scheduler.add_job(self._check_and_send_reminders,
-                               'cron', hour=9, minute=0, name='Weekly_Summary_Check')
-        self.scheduler.add_job(self._check_and_send_reminders,
-                               'cron', hour=9, minute=0, name='Daily_Tx_Morning_Check')
+                               'cron', hour=9, minute=0, name='Weekly_Summary_Daily_Morning_Check')
         self.scheduler.add_job(self._check_and_send_reminders,
                                'cron', hour=19, minute=0, name='Daily_Tx_Evening_Check')
+        # Due queue (next_run_at index) ကို ခဏခဏ စစ်ပါ - Start ချိန်မှာ တစ်ခါ run လို့ Downtime အတွင်း လွတ်သွားတာတွေ ပြန်လုပ်ပါတယ်
         self.scheduler.add_job(self._check_and_run_recurring_tx,
-                               'cron', hour=8, minute=0, name='Recurring_TX_Check')
+                               'interval', minutes=RECURRING_CHECK_INTERVAL_MINUTES,
+                               next_run_time=dt.datetime.now(), name='Recurring_TX_Check')
         # (!!!) NEW: Add Premium Reminder Job (!!!)
         # နေ့စဉ် မနက် ၉ နာရီ ၁ မိနစ်မှာ run ပါ (တခြား job တွေနဲ့ တပြိုင်တည်း မဖြစ်အောင်)
         self.scheduler.add_job(self._check_and_send_premium_reminders, 
                                'cron', hour=9, minute=1, name='Premium_Expiration_Check')
+        # သက်တမ်းကုန်ပြီးသား Premium တွေကို UPDATE တစ်ခုတည်းနဲ့ ပိတ်ပါ (get_premium_status က မရေးတော့ပါ)
+        self.scheduler.add_job(self._expire_lapsed_premiums,
+                               'interval', minutes=PREMIUM_EXPIRY_SWEEP_MINUTES,
+                               next_run_time=dt.datetime.now(), name='Premium_Expiry_Sweep')
         # (!!!) End of New Job (!!!)
+        # လစဉ် transaction partition တွေကို ကြိုဆောက်ပြီး Retention ကျော်တာတွေကို ဖြုတ်ပါ (PostgreSQL)
+        self.scheduler.add_job(self._maintain_transaction_partitions,
+                               'cron', hour=3, minute=30, name='Transaction_Partition_Maintenance')
 
     async def _check_and_send_reminders(self):
         today = dt.datetime.now()
         day_name = today.strftime('%A')
         current_hour = today.hour
 
-        users_to_remind = self.data_manager.get_all_users_for_reminders()
+        users_to_remind = await self.data_manager.get_all_users_for_reminders()
 
+        weekly_user_ids, daily_user_ids = [], []
         for user_id, daily_on, weekly_day, weekly_on in users_to_remind:
-            try:
-                if weekly_on and weekly_day.capitalize() == day_name and current_hour == 9:
-                    logger.info(
-                        f"Sending weekly summary reminder to user {user_id} on {day_name}")
-                    await self.send_weekly_summary(user_id)
-
-                if daily_on:
-                    if current_hour == 9:
-                        logger.info(
-                            f"Sending daily transaction morning reminder to user {user_id}")
-                        await self.send_daily_transaction_reminder(user_id, 'morning')
-                    elif current_hour == 19:
-                        logger.info(
-                            f"Sending daily transaction evening reminder to user {user_id}")
-                        await self.send_daily_transaction_reminder(user_id, 'evening')
-
-            except Exception as e:
-                logger.error(
-                    f"Error checking reminder for user {user_id}: {e}")
+            if weekly_on and weekly_day and weekly_day.capitalize() == day_name and current_hour == 9:
+                weekly_user_ids.append(user_id)
+            if daily_on and current_hour in (9, 19):
+                daily_user_ids.append(user_id)
+
+        if weekly_user_ids:
+            logger.info(f"Sending weekly summary to {len(weekly_user_ids)} users on {day_name}")
+            await self.dispatcher.run_each('weekly_summary', weekly_user_ids, self.send_weekly_summary)
+
+        if daily_user_ids:
+            time_of_day = 'morning' if current_hour == 9 else 'evening'
+            logger.info(f"Sending daily transaction {time_of_day} reminder to {len(daily_user_ids)} users")
+            message = TEXTS[f'daily_reminder_{time_of_day}']
+            await self.dispatcher.send_many(
+                f'daily_reminder_{time_of_day}', ((user_id, message) for user_id in daily_user_ids),
+                parse_mode=ParseMode.MARKDOWN, reply_markup=self._daily_reminder_markup())
 
     # --- Scheduler job for Recurring Transactions ---
     async def _check_and_run_recurring_tx(self):
-        today_day = dt.datetime.now().day
-        logger.info(
-            f"Running recurring transaction check for day {today_day}...")
+        logger.info("Running recurring transaction due queue...")
 
-        context = ContextTypes.DEFAULT_TYPE(application=self.application)
-
-        user_ids = self.data_manager.get_all_users_for_recurring_tx()
+        try:
+            # next_run_at <= now ဖြစ်တဲ့ item တွေကိုပဲ run ပါ (recurring_tx_run က တစ်ရက် တစ်ကြိမ်သာ ဖြစ်စေပါတယ်)
+            executed = await self.data_manager.run(
+                self.data_manager.sync.run_due_recurring_txs, timeout=DB_LONG_CALL_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error running recurring transactions: {e}")
+            return
 
-        for user_id in user_ids:
-            try:
-                recurring_txs = self.data_manager.get_recurring_txs(user_id)
-
-                for rtx in recurring_txs:
-                    if rtx['day'] == today_day:
-                        today_start = dt.datetime.now().replace(
-                            hour=0, minute=0, second=0, microsecond=0)
-                        txs_today = self.data_manager.get_transactions(
-                            user_id, start_date=today_start, end_date=dt.datetime.now())
-
-                        already_added = False
-                        for tx in txs_today:
-                            if tx['description'] == rtx['description'] and tx['amount'] == rtx['amount'] and tx['type'] == rtx['type']:
-                                already_added = True
-                                break
-
-                        if not already_added:
-                            logger.info(
-                                f"Executing recurring transaction '{rtx['description']}' for user {user_id}")
-                            self.data_manager.add_transaction(
-                                user_id,
-                                rtx['type'],
-                                rtx['amount'],
-                                rtx['description'],
-                                rtx['category']
-                            )
-                            await context.bot.send_message(
-                                user_id,
-                                TEXTS["recurring_tx_executed"].format(
-                                    desc=rtx['description'],
-                                    amount=rtx['amount']
-                                ),
-                                parse_mode=ParseMode.MARKDOWN
-                            )
-                        else:
-                            logger.warning(
-                                f"Skipping recurring tx '{rtx['description']}' for user {user_id}, already added today.")
+        await self.dispatcher.send_many('recurring_tx', [
+            (rtx['user_id'], TEXTS["recurring_tx_executed"].format(
+                desc=rtx['description'], amount=rtx['amount'], date=rtx['date'].strftime('%Y-%m-%d')))
+            for rtx in executed
+        ], parse_mode=ParseMode.MARKDOWN)
 
-            except Exception as e:
-                logger.error(
-                    f"Error processing recurring transaction for user {user_id}: {e}")
     # ... ( _check_and_run_recurring_tx function ရဲ့ အောက်မှာ ထည့်ပါ) ...
 
+    async def _expire_lapsed_premiums(self):
+        try:
+            await self.data_manager.expire_lapsed_premiums()
+        except Exception as e:
+            logger.error(f"Error during premium expiry sweep: {e}")
+
+    async def _maintain_transaction_partitions(self):
+        try:
+            await self.data_manager.run(
+                self.data_manager.sync.maintain_transaction_partitions, timeout=DB_LONG_CALL_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error during transaction partition maintenance: {e}")
+
     # (!!!) NEW: Scheduler Job for Premium Expiration (!!!)
     async def _check_and_send_premium_reminders(self):
         """
@@ -3383,43 +3713,30 @@ class MyanmarFinanceBot:
         logger.info("Running daily premium expiration check...")
         
         try:
-            expiring_users = self.data_manager.get_expiring_premium_users()
+            expiring_users = await self.data_manager.get_expiring_premium_users()
             if not expiring_users:
                 logger.info("No expiring premium users found today.")
                 return
 
-            context = ContextTypes.DEFAULT_TYPE(application=self.application)
-            
             # User ကို သက်တမ်းတိုးဖို့ ခလုတ်ပါ တစ်ခါတည်း ထည့်ပို့ပါမယ်
             keyboard = InlineKeyboardMarkup([
                 [InlineKeyboardButton("⭐️ Premium Plan သက်တမ်းတိုးရန်", callback_data='premium_0')]
             ])
 
+            messages = []
             for user_info in expiring_users:
-                user_id = user_info['user_id']
-                end_date = user_info['end_date']
                 days_left = user_info['days_left']
-
                 if days_left == 3:
                     message_key = "premium_reminder_3_days"
                 elif days_left == 1:
                     message_key = "premium_reminder_1_day"
                 else:
                     continue # မဖြစ်နိုင်သလောက်ပါပဲ
+                messages.append((user_info['user_id'], TEXTS[message_key].format(end_date=user_info['end_date'])))
 
-                message_text = TEXTS[message_key].format(end_date=end_date)
-                
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=keyboard
-                    )
-                    logger.info(f"Sent {days_left}-day premium reminder to user {user_id}")
-                except Exception as e:
-                    # Bot ကို Block သွားတဲ့ User တွေဆို ပို့လို့ရမှာ မဟုတ်ပါ
-                    logger.warning(f"Failed to send premium reminder to user {user_id}: {e}")
+            # Bot ကို Block သွားတဲ့ User တွေဆို ပို့လို့ရမှာ မဟုတ်ပါ (failed metrics ထဲ ဝင်ပါမယ်)
+            await self.dispatcher.send_many(
+                'premium_reminder', messages, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
         
         except Exception as e:
             logger.error(f"Error during _check_and_send_premium_reminders: {e}")
@@ -3435,8 +3752,10 @@ class MyanmarFinanceBot:
 
         try:
             update = MockUpdate(user_id)
-            context = ContextTypes.DEFAULT_TYPE(application=self.application)
-            await context.bot.send_message(user_id, "🔔 **အပတ်စဉ် အစီရင်ခံစာ သတိပေးချက်**\n\nယခုတစ်ပတ်၏ ငွေစာရင်းအခြေအနေကို အောက်ပါအတိုင်း စစ်ဆေးနိုင်ပါပြီ။", parse_mode=ParseMode.MARKDOWN)
+            # Summary handler ရဲ့ send_message တွေပါ dispatcher (rate limit / retry) ကို ဖြတ်ပါစေ
+            context = SimpleNamespace(bot=self.dispatcher.as_bot('weekly_summary'), user_data={}, args=[])
+            if not await context.bot.send_message(user_id, "🔔 **အပတ်စဉ် အစီရင်ခံစာ သတိပေးချက်**\n\nယခုတစ်ပတ်၏ ငွေစာရင်းအခြေအနေကို အောက်ပါအတိုင်း စစ်ဆေးနိုင်ပါပြီ။", parse_mode=ParseMode.MARKDOWN):
+                return
             await self.summary(update, context)
         except Exception as e:
             logger.error(f"Failed to send weekly summary to {user_id}: {e}")
@@ -3446,7 +3765,7 @@ class MyanmarFinanceBot:
         user_id = update.effective_user.id
 
         try:
-            analysis_data = self.data_manager.get_financial_analysis_data(
+            analysis_data = await self.data_manager.get_financial_analysis_data(
                 user_id)
 
             if not analysis_data or (analysis_data['total_income'] == 0 and analysis_data['total_expense'] == 0):
@@ -3535,9 +3854,9 @@ class MyanmarFinanceBot:
     # --- Manage Transactions Menu ---
     async def manage_transactions_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        recent_txs = self.data_manager.get_recent_transactions(
-            user_id, limit=5)
-        is_premium = self.data_manager.get_premium_status(user_id)[
+        recent_txs = await self.data_manager.get_transactions_frame(
+            user_id, columns=['id', 'date', 'type', 'category', 'amount'], limit=5)
+        is_premium = (await self.data_manager.get_premium_status(user_id))[
             'is_premium']
 
         keyboard = []
@@ -3559,11 +3878,13 @@ class MyanmarFinanceBot:
                 InlineKeyboardButton(TEXTS["info_button_text"], callback_data='info_recurring_tx') # <-- ထည့်ရန်
             ])
 
+        keyboard.append([InlineKeyboardButton(TEXTS["tx_history_button"], callback_data='txh_first')])
+
         # --- (!!!) START OF FIX (!!!) ---
         
         message_text = TEXTS['manage_tx_menu'] # <-- Default message header
 
-        if not recent_txs:
+        if recent_txs.empty:
             # If no transactions, just add this text to the message
             # "return" မလုပ်တော့ပါ
             message_text += "\n\n" + TEXTS["no_recent_tx"]
@@ -3571,17 +3892,13 @@ class MyanmarFinanceBot:
             # If there are transactions, add the selection prompt
             message_text += "\n\n" + TEXTS['select_tx_action']
             # And add the transactions to the keyboard
-            for tx in recent_txs:
-                tx_date_obj = self._parse_date(tx['date'])
-                if tx_date_obj:
-                    tx_date = tx_date_obj.strftime('%m/%d')
-                else:
-                    tx_date = "N/A"
+            for tx in recent_txs.itertuples(index=False):
+                tx_date = tx.date.strftime('%m/%d') if pd.notna(tx.date) else "N/A"
 
-                tx_type_my = "ဝင်ငွေ" if tx['type'] == 'income' else "ထွက်ငွေ"
-                tx_label = f"{tx_date} - {tx_type_my} ({tx['category']}) : {tx['amount']:,.0f} Ks"
+                tx_type_my = "ဝင်ငွေ" if tx.type == 'income' else "ထွက်ငွေ"
+                tx_label = f"{tx_date} - {tx_type_my} ({tx.category}) : {tx.amount:,.0f} Ks"
                 keyboard.append([InlineKeyboardButton(
-                    tx_label, callback_data=f'tx_select_{tx["id"]}')])
+                    tx_label, callback_data=f'tx_select_{tx.id}')])
         
         # --- (!!!) END OF FIX (!!!) ---
 
@@ -3609,6 +3926,99 @@ class MyanmarFinanceBot:
                 parse_mode=ParseMode.MARKDOWN,
                 reply_markup=InlineKeyboardMarkup(keyboard)
             )
+    # --- (!!!) NEW: Transaction History (Keyset Pagination) (!!!) ---
+    async def transaction_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                  cursor_id: Optional[str] = None, direction: str = 'older'):
+        """Next/Prev ခလုတ်များဖြင့် မှတ်တမ်း အားလုံးကို (date, id) keyset ဖြင့် စာမျက်နှာ ခွဲပြပါ"""
+        user_id = update.effective_user.id
+        filters = context.user_data.get('tx_history_filters', {})
+
+        page = await self.data_manager.get_transactions_page(
+            user_id, cursor_id=cursor_id, direction=direction,
+            tx_type=filters.get('type'), category=filters.get('category'), account_id=filters.get('account_id'))
+        if not page['items'] and direction == 'newer':
+            # အသစ်ဘက် မှတ်တမ်းတွေ ဖျက်ခံရပြီးသားဆိုရင် ပထမ စာမျက်နှာကို ပြပါ
+            page = await self.data_manager.get_transactions_page(
+                user_id, tx_type=filters.get('type'), category=filters.get('category'), account_id=filters.get('account_id'))
+
+        message_text = TEXTS["tx_history_header"]
+        active = []
+        if filters.get('type'):
+            active.append("ဝင်ငွေ" if filters['type'] == 'income' else "ထွက်ငွေ")
+        if filters.get('category'):
+            active.append(filters['category'])
+        if filters.get('account_id'):
+            accounts = await self.data_manager.get_accounts(user_id)
+            active.append(next((acc['name'] for acc in accounts if acc['id'] == filters['account_id']), "Account"))
+        if active:
+            message_text += "\n" + TEXTS["tx_history_filter_active"].format(filters=", ".join(active))
+
+        keyboard = []
+        if not page['items']:
+            message_text += "\n\n" + TEXTS["tx_history_empty"]
+        else:
+            message_text += "\n\n" + TEXTS['select_tx_action']
+            for tx in page['items']:
+                tx_type_my = "ဝင်ငွေ" if tx['type'] == 'income' else "ထွက်ငွေ"
+                tx_label = f"{tx['date'].strftime('%Y/%m/%d')} - {tx_type_my} ({tx['category']}) : {tx['amount']:,.0f} Ks"
+                keyboard.append([InlineKeyboardButton(tx_label, callback_data=f'tx_select_{tx["id"]}')])
+
+            nav_row = []
+            if page['has_newer']:
+                nav_row.append(InlineKeyboardButton(TEXTS["tx_history_newer"], callback_data=f'txh_n_{page["items"][0]["id"]}'))
+            if page['has_older']:
+                nav_row.append(InlineKeyboardButton(TEXTS["tx_history_older"], callback_data=f'txh_o_{page["items"][-1]["id"]}'))
+            if nav_row:
+                keyboard.append(nav_row)
+
+        keyboard.append([InlineKeyboardButton(TEXTS["tx_history_filter_button"], callback_data='txh_filter')])
+        keyboard.append([InlineKeyboardButton("↩️ စီမံခန့်ခွဲ မီနူးသို့", callback_data='manage_tx_menu_back')])
+
+        await update.callback_query.edit_message_text(
+            message_text, parse_mode=ParseMode.MARKDOWN, reply_markup=InlineKeyboardMarkup(keyboard))
+
+    async def transaction_history_filter_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """အမျိုးအစား / Category / Account Filter ရွေးရန် Menu"""
+        user_id = update.effective_user.id
+        filters = context.user_data.get('tx_history_filters', {})
+        selected_type = filters.get('type')
+
+        def mark(label, selected):
+            return f"✅ {label}" if selected else label
+
+        keyboard = [[
+            InlineKeyboardButton(mark(TEXTS["tx_history_filter_all"], not selected_type), callback_data='txh_ft_all'),
+            InlineKeyboardButton(mark("ဝင်ငွေ", selected_type == 'income'), callback_data='txh_ft_income'),
+            InlineKeyboardButton(mark("ထွက်ငွေ", selected_type == 'expense'), callback_data='txh_ft_expense'),
+        ]]
+
+        # Category နာမည်တွေက 64 bytes ထက် ရှည်နိုင်လို့ Index ကိုသာ Callback ထဲ ထည့်ပါ
+        if selected_type:
+            categories = await self.data_manager.get_all_categories(
+                user_id, selected_type, TEXTS[f"{selected_type}_categories"])
+            context.user_data['tx_history_categories'] = categories
+            category_buttons = [
+                InlineKeyboardButton(mark(cat, filters.get('category') == cat), callback_data=f'txh_fc_{i}')
+                for i, cat in enumerate(categories)]
+            keyboard.extend(category_buttons[i:i + 2] for i in range(0, len(category_buttons), 2))
+
+        accounts = await self.data_manager.get_accounts(user_id)
+        if accounts:
+            account_buttons = [InlineKeyboardButton(mark(f"💰 {TEXTS['tx_history_filter_all']}", not filters.get('account_id')), callback_data='txh_fa_all')]
+            account_buttons += [
+                InlineKeyboardButton(mark(f"💰 {acc['name']}", filters.get('account_id') == acc['id']), callback_data=f'txh_fa_{acc["id"]}')
+                for acc in accounts]
+            keyboard.extend(account_buttons[i:i + 2] for i in range(0, len(account_buttons), 2))
+
+        keyboard.append([
+            InlineKeyboardButton(TEXTS["tx_history_filter_show"], callback_data='txh_first'),
+            InlineKeyboardButton(TEXTS["tx_history_filter_clear"], callback_data='txh_fclear'),
+        ])
+
+        await update.callback_query.edit_message_text(
+            TEXTS["tx_history_filter_header"], parse_mode=ParseMode.MARKDOWN, reply_markup=InlineKeyboardMarkup(keyboard))
+    # --- (!!!) End of New (!!!) ---
+
     # (!!!) --- NEW: Account Management Bot Functions --- (!!!)
     
     async def account_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -3634,7 +4044,7 @@ class MyanmarFinanceBot:
         if update.callback_query:
             await update.callback_query.answer("💰 လက်ကျန်ငွေများ စစ်ဆေးနေပါသည်...")
 
-        accounts_with_balance = self.data_manager.get_accounts_with_balance(user_id)
+        accounts_with_balance = await self.data_manager.get_accounts_with_balance(user_id)
         
         if not accounts_with_balance:
             message_text = TEXTS["account_list_empty"]
@@ -3668,23 +4078,17 @@ class MyanmarFinanceBot:
     async def check_budget_alert(self, user_id: int, category: str, amount: int, context: ContextTypes.DEFAULT_TYPE):
         """Checks and sends a budget alert if needed."""
         try:
-            budgets = self.data_manager.get_budgets(user_id)
+            budgets = await self.data_manager.get_budgets(user_id)
             if category in budgets:
                 current_tx = {'type': 'expense', 'amount': amount, 'category': category}
-                _, _, alert_needed = self.calculate_budget_status(
+                _, _, alert_needed = await self.calculate_budget_status(
                     user_id, current_tx=current_tx)
 
                 if alert_needed:
                     budgeted_amount = budgets[category]
                     today = dt.datetime.now()
-                    start_of_month = today.replace(
-                        day=1, hour=0, minute=0, second=0)
-                    transactions = self.data_manager.get_transactions(
-                        user_id, start_date=start_of_month)
-                    expense_df = pd.DataFrame(
-                        [tx for tx in transactions if tx['type'] == 'expense'])
-                    spent = expense_df[expense_df['category']
-                                       == category]['amount'].sum()
+                    monthly_totals = await self.data_manager.get_monthly_totals(user_id, today.year, today.month)
+                    spent = monthly_totals['expense_by_category'].get(category, 0)
                     remaining = budgeted_amount - spent
                     percent_spent = (spent / budgeted_amount) * 100
 
@@ -3704,7 +4108,8 @@ class MyanmarFinanceBot:
         """
         User ကို Account ရွေးခိုင်းတဲ့ ခလုတ်တွေ (Keyboard) ကို ပြပေးမယ့် Helper Function
         """
-        accounts = self.data_manager.get_accounts(user_id) # <-- (!!!) ဒါက အခု List[Dict] ဖြစ်သွားပါပြီ
+        # (!!!) လက်ကျန်ငွေပါ ခလုတ်ပေါ်မှာ ပြနိုင်အောင် Balance Engine ကို သုံးပါ (!!!)
+        accounts = await self.data_manager.get_accounts_with_balance(user_id)
         
         # Account မရှိသေးရင်၊ Account အရင် ဆောက်ခိုင်းပါ
         if not accounts:
@@ -3718,7 +4123,7 @@ class MyanmarFinanceBot:
             # (!!!) Object (acc.name) အစား၊ Dict Key (acc['name']) ကို သုံးပါ (!!!)
             acc_name = acc['name']
             acc_id = acc['id']
-            row.append(InlineKeyboardButton(f"💰 {acc_name}", callback_data=f'tx_select_account_{acc_id}'))
+            row.append(InlineKeyboardButton(f"💰 {acc_name} ({acc['balance']:,} Ks)", callback_data=f'tx_select_account_{acc_id}'))
             if len(row) == 2: # တစ်တန်းမှာ ၂ ခု
                 keyboard.append(row)
                 row = []
@@ -3777,11 +4182,23 @@ class MyanmarFinanceBot:
             )
 
     async def admin_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        stats = self.data_manager.get_stats()
+        stats = await self.data_manager.get_stats()
         message = TEXTS["admin_stats_message"].format(
             total=stats.get('total', 0),
-            premium=stats.get('premium', 0)
+            premium=stats.get('premium', 0),
+            blocked=stats.get('blocked', 0)
         )
+        message += TEXTS["admin_stats_activity"].format(**stats)
+        message += TEXTS["admin_stats_cache"].format(**self.data_manager.premium_cache.stats())
+        replica_stats = self.data_manager.replica.stats()
+        if replica_stats['configured']:
+            lag = "unreachable" if replica_stats['lag'] is None else f"{replica_stats['lag']:.1f}s"
+            message += TEXTS["admin_stats_replica"].format(**{**replica_stats, 'lag': lag})
+        job_stats = self.dispatcher.stats()
+        if job_stats:
+            message += TEXTS["admin_stats_dispatch"]
+            for job in job_stats:
+                message += TEXTS["admin_stats_dispatch_line"].format(**{**job, 'running': ' ⏳' if job['running'] else ''})
         keyboard = [[InlineKeyboardButton(
             "↩️ Admin Menu သို့ ပြန်သွားရန်", callback_data='admin_dashboard')]]
 
@@ -3791,6 +4208,50 @@ class MyanmarFinanceBot:
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
 
+    async def admin_rebuild_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/rebuild balances [fix] | rollups | stats - Verifies / rebuilds the derived tables."""
+        user_id = update.effective_user.id
+        if user_id != self.ADMIN_ID:
+            await update.message.reply_text(TEXTS["not_admin"])
+            return
+
+        args = [a.lower() for a in (context.args or [])]
+        if args and args[0] == 'rollups':
+            result = await self.data_manager.run(
+                self.data_manager.sync.rebuild_monthly_rollups, timeout=DB_LONG_CALL_TIMEOUT)
+            await update.message.reply_text(TEXTS["admin_rebuild_rollups_done"].format(**result), parse_mode=ParseMode.MARKDOWN)
+            return
+
+        if args and args[0] == 'stats':
+            result = await self.data_manager.run(
+                self.data_manager.sync.rebuild_stats, timeout=DB_LONG_CALL_TIMEOUT)
+            await update.message.reply_text(TEXTS["admin_rebuild_stats_done"].format(**result), parse_mode=ParseMode.MARKDOWN)
+            return
+
+        if not args or args[0] != 'balances':
+            await update.message.reply_text(TEXTS["admin_rebuild_usage"], parse_mode=ParseMode.MARKDOWN)
+            return
+
+        fix = len(args) > 1 and args[1] == 'fix'
+        result = await self.data_manager.run(
+            self.data_manager.sync.verify_account_balances, fix=fix, timeout=DB_LONG_CALL_TIMEOUT)
+
+        details = ""
+        for d in result['drift'][:10]:  # အများဆုံး ၁၀ ကြောင်းသာ ပြပါ
+            details += TEXTS["admin_rebuild_drift_line"].format(
+                user_id=d['user_id'], account_id=d['account_id'][:8],
+                stored=d['stored'] if d['stored'] is not None else '-', expected=d['expected'])
+
+        message = TEXTS["admin_rebuild_balances_report"].format(
+            users=result['users_checked'],
+            rows=result['rows_checked'],
+            uninitialized=result['uninitialized_users'],
+            drift_count=result['drift_count'],
+            details=details,
+            status=TEXTS["admin_rebuild_status_fixed"] if fix else TEXTS["admin_rebuild_status_report_only"]
+        )
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+
     async def admin_broadcast_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['mode'] = 'admin_broadcast_message'
         await update.callback_query.edit_message_text(
@@ -3798,38 +4259,65 @@ class MyanmarFinanceBot:
             parse_mode=ParseMode.MARKDOWN
         )
 
-    async def _run_broadcast(self, admin_chat_id: int, message: str, context: ContextTypes.DEFAULT_TYPE):
-        """Helper async task to send broadcast messages without blocking."""
-        user_ids = self.data_manager.get_all_user_ids()
-        count = len(user_ids)
-        sent_count = 0
-        failed_count = 0
+    def _broadcast_progress_text(self, job: Dict[str, Any], rate: float) -> str:
+        remaining = max(0, job['total'] - job['sent'] - job['failed'])
+        eta = remaining / rate if rate > 0 else 0
+        return TEXTS["admin_broadcast_progress"].format(
+            sent=job['sent'], failed=job['failed'], remaining=remaining, total=job['total'],
+            eta=str(dt.timedelta(seconds=int(eta))), rate=rate)
 
-        await context.bot.send_message(
-            admin_chat_id,
-            TEXTS["admin_broadcast_start"].format(count=count),
-            parse_mode=ParseMode.MARKDOWN
-        )
+    async def _edit_broadcast_progress(self, job: Dict[str, Any], text: str):
+        if not job.get('progress_message_id'):
+            return
+        try:
+            await self.application.bot.edit_message_text(
+                text, chat_id=job['admin_chat_id'], message_id=job['progress_message_id'],
+                parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:  # "message is not modified" / message ဖျက်ထားတာ စသည်
+            logger.debug(f"Broadcast progress edit skipped: {e}")
 
-        for user_id in user_ids:
-            if user_id == admin_chat_id:  # Don't send to self
-                sent_count += 1
-                continue
-            try:
-                await context.bot.send_message(user_id, message, parse_mode=ParseMode.MARKDOWN)
-                sent_count += 1
-            except Exception as e:
-                logger.warning(f"Broadcast failed for user {user_id}: {e}")
-                failed_count += 1
+    async def _run_broadcast(self, job_id: str):
+        """
+        DB-backed Broadcast job ကို batch လိုက် ပို့ပါ။ Batch တစ်ခုချင်းစီ မပို့ခင် cursor ကို သိမ်းလို့
+        Restart ဖြစ်ရင် post_init ကနေ ကျန်တဲ့ recipient တွေကိုပဲ ဆက်ပို့ပါတယ်။
+        """
+        job = await self.data_manager.get_broadcast_job(job_id)
+        if not job:
+            return
+        job_name = f"broadcast:{job_id[:8]}"
+        stats = self.dispatcher.start_job(job_name)
+        last_edit = 0.0
+        loop = asyncio.get_running_loop()
 
-            await asyncio.sleep(0.1)  # Avoid rate limits
+        try:
+            while True:
+                user_ids = await self.data_manager.claim_broadcast_batch(job_id, BROADCAST_BATCH_SIZE)
+                if not user_ids:
+                    break
+                sent_before, failed_before = stats['sent'], stats['failed']
+                await self.dispatcher.send_many(
+                    job_name, ((user_id, job['message']) for user_id in user_ids),
+                    track=False, parse_mode=ParseMode.MARKDOWN)
+                job = await self.data_manager.record_broadcast_results(
+                    job_id, stats['sent'] - sent_before, stats['failed'] - failed_before)
+
+                if loop.time() - last_edit >= BROADCAST_PROGRESS_INTERVAL:
+                    last_edit = loop.time()
+                    await self._edit_broadcast_progress(
+                        job, self._broadcast_progress_text(job, self.dispatcher.stats_for(job_name)['rate']))
+        except Exception as e:
+            # Job က 'running' အဖြစ် ကျန်နေလို့ နောက် Restart မှာ ဆက်ပို့ပါမယ်
+            logger.error(f"Broadcast {job_id} interrupted: {e}")
+            return
+        finally:
+            self.dispatcher.finish_job(job_name)
 
-        await context.bot.send_message(
-            admin_chat_id,
-            TEXTS["admin_broadcast_complete"].format(
-                sent=sent_count, failed=failed_count),
-            parse_mode=ParseMode.MARKDOWN
-        )
+        job = await self.data_manager.get_broadcast_job(job_id)
+        complete_text = TEXTS["admin_broadcast_complete"].format(
+            sent=job['sent'], failed=job['failed'],
+            seconds=stats['elapsed'], rate=self.dispatcher.stats_for(job_name)['rate'])
+        await self._edit_broadcast_progress(job, complete_text)
+        await self.application.bot.send_message(job['admin_chat_id'], complete_text, parse_mode=ParseMode.MARKDOWN)
 
     async def admin_broadcast_send(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = context.user_data.get('broadcast_message')
@@ -3837,11 +4325,18 @@ class MyanmarFinanceBot:
             await update.callback_query.edit_message_text("❌ Message မရှိပါ။")
             return
 
-        await update.callback_query.edit_message_text("✅ Broadcast ကို စတင် ပို့နေပါပြီ...")
+        admin_chat_id = update.effective_user.id
+        job = await self.data_manager.create_broadcast_job(admin_chat_id, message)
+        await update.callback_query.edit_message_text(
+            TEXTS["admin_broadcast_start"].format(count=job['total']), parse_mode=ParseMode.MARKDOWN)
+
+        # Live progress ကို ဒီ message မှာ edit လုပ်ပါမယ်
+        progress = await context.bot.send_message(
+            admin_chat_id, self._broadcast_progress_text(job, 0), parse_mode=ParseMode.MARKDOWN)
+        await self.data_manager.set_broadcast_progress_message(job['id'], progress.message_id)
 
-        # Run broadcast in background
-        asyncio.create_task(self._run_broadcast(
-            update.effective_user.id, message, context))
+        # Run broadcast in background (Job က DB ထဲမှာ ရှိလို့ Restart ဖြစ်လည်း ဆက်ပို့ပါမယ်)
+        asyncio.create_task(self._run_broadcast(job['id']))
 
         context.user_data.clear()
 
@@ -3854,7 +4349,7 @@ class MyanmarFinanceBot:
 
     async def _send_user_details(self, message: Any, context: ContextTypes.DEFAULT_TYPE, target_user_id: int):
         """Helper to send or edit the user details message."""
-        details = self.data_manager.get_user_details(target_user_id)
+        details = await self.data_manager.get_user_details(target_user_id)
         if not details:
             # Check if message is callback_query or regular message
             if hasattr(message, 'edit_message_text'):
@@ -3869,6 +4364,8 @@ class MyanmarFinanceBot:
             status=status_text,
             end_date=details['end_date'],
             tx_count=details['tx_count'],
+            last_tx_at=details['last_tx_at'].strftime('%Y-%m-%d %H:%M') if details['last_tx_at'] else '-',
+            last_active_at=details['last_active_at'].strftime('%Y-%m-%d') if details['last_active_at'] else '-',
             used_trial="Yes" if details['used_trial'] else "No"
         )
 
@@ -3887,8 +4384,30 @@ class MyanmarFinanceBot:
             await message.reply_text(message_text, parse_mode=ParseMode.MARKDOWN, reply_markup=InlineKeyboardMarkup(keyboard))
             # --- Post Init Tasks ---
 
+    def _with_unit_of_work(self, handler, read_only: bool = False):
+        """
+        Wraps a handler so the whole update runs on one DB session (committed at the end, and
+        before every Telegram API call by OutboundCommitRequest).
+        """
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            if update.effective_user:
+                # DAU မှတ်ပြီး Bot ကို ပြန်သုံးလာတဲ့ User ရဲ့ blocked flag ကို ရှင်းပါ (ရက်တစ်ရက် တစ်ကြိမ်သာ DB ကို သွားပါတယ်)
+                await self.data_manager.touch_user(update.effective_user.id)
+            user_id = update.effective_user.id if update.effective_user else None
+            async with self.data_manager.unit_of_work(read_only=read_only, user_id=user_id):
+                return await handler(update, context)
+        return wrapper
+
     async def post_init_tasks(self, application: Application):
         """Tasks to run after the bot is initialized but before polling starts."""
+        self.dispatcher.bot = application.bot
+
+        # Restart မတိုင်ခင် မပြီးသေးတဲ့ Broadcast တွေကို ဆက်ပို့ပါ
+        for job in await self.data_manager.resume_broadcast_jobs():
+            logger.info(f"Resuming broadcast {job['id']} ({job['claimed']}/{job['total']} claimed)")
+            await self._edit_broadcast_progress(job, TEXTS["admin_broadcast_resumed"])
+            asyncio.create_task(self._run_broadcast(job['id']))
         if self.scheduler.state != 1:
             self.scheduler.start()
             logger.info("Scheduler started successfully in PTB event loop.")
@@ -3908,44 +4427,53 @@ class MyanmarFinanceBot:
         # --- Persistence (State တွေ မှတ်ထားရန်) ---
         persistence = PicklePersistence(filepath=PERSISTENCE_FILE_PATH)
 
+        # concurrent_updates: User တစ်ယောက်ရဲ့ Query ကြာနေချိန်မှာ တခြား User တွေရဲ့ Update တွေကို ဆက်လုပ်နိုင်ရန်
+        # (User တစ်ယောက်တည်းရဲ့ Update တွေကိုတော့ တစ်ခုချင်း - PerUserUpdateProcessor)
         self.application = Application.builder().token(
-            TELEGRAM_BOT_TOKEN).persistence(persistence).build()
+            TELEGRAM_BOT_TOKEN).persistence(persistence).concurrent_updates(
+            PerUserUpdateProcessor(UPDATE_CONCURRENCY)).request(
+            OutboundCommitRequest(self.data_manager)).build()
 
         # --- Handlers (User ဆီက Message တွေကို ဘယ်သူက တာဝန်ယူမလဲ) ---
 
         # Command Handlers (/)
-        self.application.add_handler(CommandHandler('start', self.start))
+        # (!!!) Update တစ်ခုချင်းစီကို DB Unit of Work တစ်ခု (Session / Connection တစ်ခု) နဲ့ run ပါ (!!!)
+        # ဖတ်ရုံသာ ဖတ်တဲ့ Handler တွေကို read_only=True (COMMIT မလုပ်ပါ)
+        uow = self._with_unit_of_work
+        self.application.add_handler(CommandHandler('start', uow(self.start, read_only=True)))
         self.application.add_handler(CommandHandler('help', self.help))
         self.application.add_handler(CommandHandler('privacy', self.privacy))
         self.application.add_handler(CommandHandler(
-            'delete_my_data', self.delete_my_data_command))
-        self.application.add_handler(CommandHandler('summary', self.summary))
+            'delete_my_data', uow(self.delete_my_data_command)))
+        self.application.add_handler(CommandHandler('summary', uow(self.summary, read_only=True)))
         self.application.add_handler(CommandHandler(
-            'budget_status', self.budget_status))
+            'budget_status', uow(self.budget_status, read_only=True)))
         self.application.add_handler(CommandHandler(
-            'monthly_report', self.monthly_report))
+            'monthly_report', uow(self.monthly_report, read_only=True)))
         self.application.add_handler(
             CommandHandler('add_income', self.add_income))
         self.application.add_handler(
             CommandHandler('add_expense', self.add_expense))
         self.application.add_handler(CommandHandler(
-            'grant_premium', self.grant_premium_command))
+            'grant_premium', uow(self.grant_premium_command)))
 
         # Admin Command Handler
         self.application.add_handler(
             CommandHandler('admin', self.admin_dashboard))
+        self.application.add_handler(
+            CommandHandler('rebuild', self.admin_rebuild_command))
 
         # Message Handlers (ပုံ၊ File၊ စာသား)
         self.application.add_handler(MessageHandler(
-            filters.PHOTO & ~filters.COMMAND, self.handle_screenshot))
+            filters.PHOTO & ~filters.COMMAND, uow(self.handle_screenshot)))
         self.application.add_handler(MessageHandler(
-            filters.Document.ALL, self.handle_backup_file))
+            filters.Document.ALL, uow(self.handle_backup_file)))
         self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, self.handle_message))
+            filters.TEXT & ~filters.COMMAND, uow(self.handle_message)))
 
         # Callback Handler (ခလုတ်နှိပ်ခြင်းများ)
         self.application.add_handler(
-            CallbackQueryHandler(self.handle_callback))
+            CallbackQueryHandler(uow(self.handle_callback)))
 
         # --- Scheduler (အချိန် နဲ့ အလုပ်လုပ်ရန်) ---
         self.setup_reminders()
@@ -1,35 +1,480 @@
 # database_manager.py (UPDATED for Multi-Wallet Step 3)
+import os
+import asyncio
+import calendar
+import contextvars
+import functools
+import gzip
+import io
+import json
 import logging
+import threading
+import time
 import uuid
-from contextlib import contextmanager
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime, timedelta
 import datetime as dt # For compatibility
 from typing import Dict, List, Optional, Any, Tuple
 
+import pandas as pd
+
 from sqlalchemy.orm import sessionmaker, Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import func, case, select, union_all, literal, literal_column, and_, event, cast, extract, Integer, tuple_, bindparam, exists, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # Import models and SessionLocal from models.py
 # (!!!) Account, TransferLog ကို ထပ်တိုးပါ (!!!)
 from models import User, Transaction, Budget, Goal, CustomCategory, RecurringTx, SessionLocal, setup_database, Account, TransferLog
+from models import AccountBalance, MonthlyRollup, RecurringTxRun, BroadcastJob, UNASSIGNED_ACCOUNT_KEY, engine, read_engine
+from models import UserStats, GlobalStats, DailyStats, STATS_COUNTER_SLOTS, DB_POOL_SIZE
+from models import Category, NO_CATEGORY_ID, UUIDString, coerce_uuid
+from models import UNDATED_TRANSACTION_DATE, ensure_transaction_partitions, detach_old_transaction_partitions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- (!!!) NEW: Request-scoped Unit of Work (!!!) ---
+# Telegram Update တစ်ခုလုံးအတွက် Session (Connection) တစ်ခုတည်း သုံးရန်
+_current_uow: contextvars.ContextVar[Optional['UnitOfWork']] = contextvars.ContextVar('current_uow', default=None)
+
+def _new_session(read_only: bool = False) -> Session:
+    if read_only:
+        # AUTOCOMMIT: Read query တွေအတွက် BEGIN / COMMIT round trip မလိုပါ
+        return SessionLocal(bind=engine.execution_options(isolation_level="AUTOCOMMIT"), info={'autocommit': True})
+    return SessionLocal()
+
+class UnitOfWork:
+    """
+    One session for a whole update; every get_session() joins it while it is active.
+    read_only=True runs in autocommit mode (no BEGIN/COMMIT). Write methods called during
+    a read-only unit of work still get their own short transaction.
+    The connection is checked out lazily, on the first query.
+    A failed scope fails the whole unit: it is rolled back at the end and later writes raise.
+    user_id: whose update this is - a committed read-write unit keeps that user's reads on the primary.
+    """
+
+    def __init__(self, read_only: bool = False, user_id: Optional[int] = None):
+        self.read_only = read_only
+        self.user_id = user_id
+        self.active = True
+        self.failed = False
+        self._session: Optional[Session] = None
+        self._replica_session: Optional[Session] = None # read_session() အတွက် (read_only unit မှာသာ)
+        self._lock = threading.RLock() # Worker thread တွေကြား Session ကို တပြိုင်နက် မသုံးမိစေရန်
+        self.owner_task: Optional[asyncio.Task] = None # Async unit ကို ဖွင့်ခဲ့တဲ့ Handler task
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = _new_session(self.read_only)
+        return self._session
+
+    @property
+    def replica_session(self) -> Session:
+        if self._replica_session is None:
+            self._replica_session = replica.new_session()
+        return self._replica_session
+
+    def joins(self, read_only: bool) -> bool:
+        """Read-write units join every call; read-only units only join read calls."""
+        return self.active and (read_only or not self.read_only)
+
+    def commit(self):
+        """
+        Commits the work so far without ending the unit (called before Telegram API calls), so
+        row locks on account_balance / stats rows aren't held across network round trips.
+        """
+        if self.read_only or self.failed or not self.active or self._session is None:
+            return
+        with self._lock:
+            if not self._session.in_transaction():
+                return
+            try:
+                _note_user_write(self._session, self.user_id)
+                self._session.commit()
+            except Exception:
+                self.failed = True
+                self._session.rollback()
+                logger.error("Unit of work commit failed; rolled back.", exc_info=True)
+                raise
+
+    def finish(self):
+        """Commits (or rolls back) once at the end of the update and releases the connection."""
+        self.active = False
+        if self._replica_session is not None:
+            self._replica_session.close()
+        if self._session is None:
+            return # DB ကို မသုံးခဲ့ပါ
+        with self._lock:
+            try:
+                if self.failed:
+                    self._session.rollback()
+                elif self.read_only:
+                    self._session.flush()
+                else:
+                    # Core write (Ledger / Stats / bulk) တွေပါ - Unit တစ်ခုလုံးကို User ရဲ့ Write အဖြစ် မှတ်ပါ
+                    _note_user_write(self._session, self.user_id)
+                    self._session.commit()
+            except Exception:
+                self._session.rollback()
+                logger.error("Unit of work commit failed; rolled back.", exc_info=True)
+                raise
+            finally:
+                self._session.close()
+
+@contextmanager
+def unit_of_work(read_only: bool = False, user_id: Optional[int] = None):
+    """Sync unit of work (scripts / scheduler). Handlers use AsyncDatabaseManager.unit_of_work."""
+    uow = UnitOfWork(read_only, user_id)
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+    except Exception:
+        uow.failed = True
+        raise
+    finally:
+        _current_uow.reset(token)
+        uow.finish()
+
 # --- Context Manager for DB Sessions ---
 @contextmanager
-def get_session() -> Session:
-    """Provides a transactional scope around a series of operations."""
-    session = SessionLocal()
+def get_session(read_only: bool = False) -> Session:
+    """
+    Provides a transactional scope around a series of operations.
+    Joins the active unit of work if there is one; read_only scopes never COMMIT.
+    """
+    uow = _current_uow.get()
+    if uow is not None and uow.joins(read_only):
+        if uow.failed and not uow.read_only and not read_only:
+            # ယခင် Write တွေ Rollback ဖြစ်ပြီးသား - နောက် Write တွေကို Commit လုပ်ရင် Ledger / Stats မကိုက်တော့ပါ
+            raise RuntimeError("Unit of work already failed; write rejected.")
+        with uow._lock:
+            session = uow.session
+            try:
+                yield session
+                session.flush() # Error ကို ဒီ method ထဲမှာပဲ ပေါ်စေရန်
+            except Exception:
+                # Session တစ်ခုလုံး Rollback ဖြစ်လို့ Unit တစ်ခုလုံး ပျက်ပါပြီ (Handler က Error ကို ဖမ်းထားရင်တောင်)
+                uow.failed = True
+                session.rollback()
+                logger.error("Database session rolled back due to error.", exc_info=True)
+                raise
+        return
+
+    session = _new_session(read_only)
     try:
         yield session
-        session.commit()
+        if read_only:
+            session.flush() # Autocommit mode မှာ flush က တိုက်ရိုက် သိမ်းပါတယ်
+        else:
+            session.commit()
     except Exception:
         session.rollback()
         logger.error("Database session rolled back due to error.", exc_info=True)
         raise
     finally:
         session.close()
+# --- (!!!) End of Unit of Work (!!!) ---
+
+def _dialect_insert(model):
+    """INSERT that supports ON CONFLICT on both PostgreSQL (Render) and SQLite (local)."""
+    if engine.dialect.name == 'sqlite':
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+# --- (!!!) NEW: After-transaction hooks (Cache invalidation) (!!!) ---
+def _on_transaction_end(session: Session, callback):
+    """
+    Runs `callback` now AND again when the session's transaction commits or rolls back,
+    so a reader can't re-cache the old value between our write and the COMMIT.
+    """
+    callback()
+    session.info.setdefault('on_transaction_end', []).append(callback)
+
+def _after_commit(session: Session, callback):
+    """Runs `callback` only once the data is committed (right away for autocommit sessions)."""
+    if session.info.get('autocommit'):
+        callback()
+    else:
+        session.info.setdefault('after_commit', []).append(callback)
+
+def _run_hooks(callbacks):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"After-transaction hook failed: {e}")
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _run_after_commit_hooks(session: Session):
+    session.info.pop('written_users', None) # Unit of work session ရဲ့ နောက် Transaction မှာ ပြန်မှတ်ရန်
+    _run_hooks(session.info.pop('after_commit', []))
+    _run_hooks(session.info.pop('on_transaction_end', []))
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _run_after_rollback_hooks(session: Session):
+    session.info.pop('after_commit', None) # Commit မဖြစ်ခဲ့ပါ
+    session.info.pop('written_users', None)
+    session.info.pop('stats_deltas', None)
+    _run_hooks(session.info.pop('on_transaction_end', []))
+
+# --- (!!!) NEW: In-process TTL / LRU Cache (!!!) ---
+class TTLCache:
+    """
+    Small thread-safe LRU cache where every entry carries its own expiry time.
+    Keeps hit / miss counters for the admin dashboard.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._data[key] # သက်တမ်းကုန်ပြီ
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, expires_at: Optional[float] = None):
+        """Stores value until min(now + ttl, expires_at)."""
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._data[key] = (deadline, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False) # အဟောင်းဆုံးကို ဖယ်ပါ
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'hit_rate': (self.hits / total * 100) if total else 0.0
+            }
+
+# --- (!!!) NEW: Category id <-> name Dictionary Cache (!!!) ---
+class CategoryCache:
+    """
+    In-process category id <-> name map. Category rows are never renamed or deleted, so entries
+    don't expire. A name -> id entry is only stored after the row that holds it has committed.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, category_id: int, name: str):
+        with self._lock:
+            self._ids[name] = category_id
+            self._names[category_id] = name
+
+    def id_for(self, session: Session, name: Optional[str], create: bool = True) -> Optional[int]:
+        """Category name -> id ('' / None -> None). create=True adds unknown names in the caller's transaction."""
+        return self.ids_for(session, [name], create).get(name) if name else None
+
+    def ids_for(self, session: Session, names, create: bool = True) -> Dict[str, int]:
+        """Bulk name -> id lookup: one SELECT for the names not cached yet (plus one INSERT when creating)."""
+        wanted = {name for name in names if name}
+        found = {name: self._ids[name] for name in wanted if name in self._ids}
+        missing = wanted - found.keys()
+        if missing and create:
+            session.execute(_dialect_insert(Category).on_conflict_do_nothing(index_elements=[Category.name]),
+                            [{"name": name} for name in sorted(missing)])
+        if missing:
+            rows = session.execute(select(Category.id, Category.name).where(Category.name.in_(missing))).all()
+            for category_id, name in rows:
+                found[name] = category_id
+                _after_commit(session, functools.partial(self._remember, category_id, name))
+        return found
+
+    def names_for(self, session: Session, category_ids) -> Dict[int, str]:
+        """Bulk id -> name lookup (ids that don't exist are left out)."""
+        wanted = {category_id for category_id in category_ids if category_id}
+        with self._lock:
+            found = {category_id: self._names[category_id] for category_id in wanted if category_id in self._names}
+        missing = wanted - found.keys()
+        if missing:
+            rows = session.execute(select(Category.id, Category.name).where(Category.id.in_(missing))).all()
+            with self._lock:
+                # id တွေကို ပြန်မသုံးလို့ id -> name ကို ချက်ချင်း cache လုပ်လို့ရပါတယ်
+                for category_id, name in rows:
+                    found[category_id] = self._names[category_id] = name
+        return found
+
+    def name_for(self, session: Session, category_id: Optional[int]) -> Optional[str]:
+        return self.names_for(session, [category_id]).get(category_id) if category_id else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'size': len(self._names)}
+# --- (!!!) End of New (!!!) ---
+
+PREMIUM_CACHE_TTL = float(os.getenv('PREMIUM_CACHE_TTL', '300')) # seconds
+PREMIUM_CACHE_SIZE = int(os.getenv('PREMIUM_CACHE_SIZE', '10000'))
+KNOWN_USERS_TTL = 24 * 3600
+ACTIVE_MONTHS_CACHE_TTL = float(os.getenv('ACTIVE_MONTHS_CACHE_TTL', '3600'))
+KNOWN_USERS_CACHE_SIZE = int(os.getenv('KNOWN_USERS_CACHE_SIZE', '50000'))
+
+# --- (!!!) NEW: Read Replica Routing (!!!) ---
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '2')) # Lag ကို ဘယ်နှစက္ကန့်တစ်ခါ ပြန်တိုင်းမလဲ
+
+class ReplicaRouter:
+    """
+    Decides whether a read may be served by the read replica (models.read_engine).
+      - Replica lag is measured at most every REPLICA_CHECK_INTERVAL seconds; while it is above
+        REPLICA_MAX_LAG_SECONDS (or the replica is unreachable) every read goes to the primary.
+      - Read-your-writes: a user's reads stay on the primary for a lag window after their last write.
+    """
+    # Replay လုပ်စရာ မကျန်ရင် 0 (Write မရှိတဲ့အချိန် replay timestamp ဟောင်းနေလို့ Lag အတုမပေါ်စေရန်)
+    LAG_SQL = text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, read_engine=None, max_lag: float = REPLICA_MAX_LAG_SECONDS, check_interval: float = REPLICA_CHECK_INTERVAL):
+        self.engine = read_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.recent_writers = TTLCache(max_lag + check_interval, KNOWN_USERS_CACHE_SIZE) # user_id -> Primary ကနေ ဖတ်ရမယ်
+        self.lag: Optional[float] = None # None = မတိုင်းရသေး / ချိတ်မရ
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return self.engine is not None
+
+    def new_session(self) -> Session:
+        return SessionLocal(bind=self.engine.execution_options(isolation_level="AUTOCOMMIT"),
+                            info={'autocommit': True, 'replica': True})
+
+    def note_write(self, user_id: int):
+        if self.configured:
+            self.recent_writers.set(user_id, True)
+
+    def current_lag(self) -> Optional[float]:
+        """Replica lag in seconds (None = unreachable). Only one thread measures; the rest use the last value."""
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self.lag
+            self._checked_at = time.monotonic()
+        try:
+            with self.engine.connect() as conn:
+                lag = float(conn.execute(self.LAG_SQL).scalar() or 0) if self.engine.dialect.name == 'postgresql' else 0.0
+        except Exception as e:
+            if self.lag is not None:
+                logger.warning(f"Read replica unreachable, reading from primary: {e}")
+            lag = None
+        if lag is not None and (self.lag is None or (lag > self.max_lag) != (self.lag > self.max_lag)):
+            logger.info(f"Read replica lag {lag:.1f}s - reads go to the {'primary' if lag > self.max_lag else 'replica'}.")
+        self.lag = lag
+        return lag
+
+    def usable(self, user_id: Optional[int] = None) -> bool:
+        if not self.configured:
+            return False
+        lag = self.current_lag()
+        ok = lag is not None and lag <= self.max_lag and (user_id is None or self.recent_writers.get(user_id) is None)
+        if ok:
+            self.replica_reads += 1
+        else:
+            self.primary_reads += 1
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.replica_reads + self.primary_reads
+        return {
+            'configured': self.configured,
+            'lag': self.lag,
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads,
+            'replica_rate': (self.replica_reads / total * 100) if total else 0.0,
+        }
+
+replica = ReplicaRouter(read_engine)
+
+@contextmanager
+def read_session(user_id: Optional[int] = None) -> Session:
+    """
+    Read-only scope that the read replica may serve (user_id: whose data is read, for read-your-writes).
+    Falls back to get_session(read_only=True) - the primary - when no replica is configured or usable,
+    and inside a read-write unit of work (it must see its own uncommitted writes).
+    """
+    uow = _current_uow.get()
+    in_write_uow = uow is not None and uow.active and not uow.read_only
+    if in_write_uow or not replica.usable(user_id):
+        with get_session(read_only=True) as session:
+            yield session
+        return
+
+    if uow is not None and uow.active:
+        # Read-only unit of work: Update တစ်ခုလုံးအတွက် Replica connection တစ်ခုတည်း
+        with uow._lock:
+            yield uow.replica_session
+        return
+
+    session = replica.new_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def _note_user_write(session: Session, user_id: Optional[int]):
+    """Marks user_id as recently written (now and again at COMMIT) so their reads stay on the primary."""
+    if not replica.configured or user_id is None:
+        return
+    written = session.info.setdefault('written_users', set())
+    if user_id not in written:
+        written.add(user_id)
+        _on_transaction_end(session, functools.partial(replica.note_write, user_id))
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _track_user_writes(session: Session, flush_context):
+    """ORM write (add / update / delete) တွေကနေ User ကို အလိုအလျောက် မှတ်ပါ (Core bulk write တွေက _note_user_write ကို ခေါ်ပါတယ်)"""
+    if not replica.configured:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        _note_user_write(session, obj.id if isinstance(obj, User) else getattr(obj, 'user_id', None))
+# --- (!!!) End of Read Replica Routing (!!!) ---
+
+def _signed_amount(tx_type: str, amount: int) -> int:
+    """income -> +amount, expense -> -amount (anything else doesn't move a balance)."""
+    if tx_type == 'income':
+        return amount or 0
+    if tx_type == 'expense':
+        return -(amount or 0)
+    return 0
 
 
 class DatabaseManager:
@@ -37,34 +482,68 @@ class DatabaseManager:
     def __init__(self):
         """Initializes the DatabaseManager and ensures tables are created."""
         setup_database() # This creates tables if they don't exist
+        self.premium_cache = TTLCache(PREMIUM_CACHE_TTL, PREMIUM_CACHE_SIZE) # user_id -> premium status
+        self.known_users = TTLCache(KNOWN_USERS_TTL, KNOWN_USERS_CACHE_SIZE) # DB ထဲမှာ ရှိပြီးသား user_id များ
+        self.ledger_users = TTLCache(KNOWN_USERS_TTL, KNOWN_USERS_CACHE_SIZE) # account_balance ledger ရှိပြီးသား user_id များ
+        self.active_months_cache = TTLCache(ACTIVE_MONTHS_CACHE_TTL, PREMIUM_CACHE_SIZE) # user_id -> [(year, month), ...]
+        self.activity_touched = TTLCache(KNOWN_USERS_TTL, KNOWN_USERS_CACHE_SIZE) # (user_id, date) - ဒီနေ့ Activity မှတ်ပြီးသား
+        self.categories = CategoryCache() # category id <-> name
+        self.replica = replica # Read replica routing (DATABASE_READ_URL)
+        self._backfill_rollups_if_empty()
+        self._backfill_recurring_schedule()
+        self._backfill_stats_if_empty()
         logger.info("DatabaseManager initialized. Tables are ready.")
 
+    def ensure_user(self, session: Session, user_id: int):
+        """
+        Makes sure the user row exists without a SELECT:
+        known_users (LRU) hit -> nothing; otherwise INSERT ... ON CONFLICT DO NOTHING.
+        Runs inside the caller's transaction (no mid-transaction COMMIT).
+        """
+        if self.known_users.get(user_id):
+            return
+        stmt = _dialect_insert(User).values(
+            id=user_id,
+            premium_is_premium=False,
+            premium_end_date=datetime.min,
+            premium_used_trial=False,
+            settings_daily_reminder=False,
+            settings_weekly_summary=False,
+            settings_weekly_day='Sunday'
+        ).on_conflict_do_nothing(index_elements=[User.id])
+        if session.execute(stmt).rowcount:
+            logger.info(f"Creating new user: {user_id}")
+            session.execute(_dialect_insert(UserStats).values(user_id=user_id, tx_count=0).on_conflict_do_nothing())
+            self._bump_global_stats(session, user_id, total_users=1)
+            self._bump_daily_stats(session, user_id, datetime.now().date(), new_users=1)
+        # Commit ဖြစ်ပြီးမှ "ရှိပြီ" လို့ မှတ်ပါ (Rollback ဖြစ်ရင် မမှတ်ပါ)
+        _after_commit(session, lambda: self.known_users.set(user_id, True))
+
     def get_or_create_user(self, session: Session, user_id: int) -> User:
         """
         Gets a user from the DB. If not found, creates a new one.
         This replaces the old _initialize_user.
         """
-        user = session.query(User).filter_by(id=user_id).first()
-        if not user:
-            logger.info(f"Creating new user: {user_id}")
-            user = User(
-                id=user_id,
-                premium_is_premium=False,
-                premium_end_date=datetime.min,
-                premium_used_trial=False,
-                settings_daily_reminder=False,
-                settings_weekly_summary=False,
-                settings_weekly_day='Sunday'
-            )
-            session.add(user)
-            session.commit() # Commit immediately so user exists
+        self.ensure_user(session, user_id)
+        return session.get(User, user_id)
+
+    def _get_user_for_read(self, session: Session, user_id: int) -> User:
+        """
+        get_or_create_user for read_only scopes: a plain SELECT; only a missing user is created,
+        through ensure_user in a write session (read_only session ထဲမှာ INSERT မလုပ်ရပါ)
+        """
+        user = session.get(User, user_id)
+        if user is None:
+            with get_session() as write_session:
+                self.ensure_user(write_session, user_id)
+            user = session.get(User, user_id)
         return user
 
     # --- (!!!) NEW: Account Management Functions (!!!) ---
     def add_account(self, user_id: int, name: str, initial_balance: int = 0) -> Tuple[Optional[Account], str]:
         """Creates a new account for the user."""
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+            self.ensure_user(session, user_id)
             
             # Check if account with same name already exists
             existing = session.query(Account).filter_by(user_id=user_id, name=name).first()
@@ -88,11 +567,18 @@ class DatabaseManager:
                     type=tx_type,
                     amount=abs(initial_balance),
                     description="Opening Balance",
-                    category="Initial Balance",
+                    category_id=self.categories.id_for(session, "Initial Balance"),
                     user_id=user_id,
                     account_id=new_account.id # Account အသစ်နဲ့ ချိတ်ဆက်ပါ
                 )
                 session.add(new_tx)
+                self._apply_rollup_delta(session, user_id, new_tx.date, tx_type, new_tx.category_id, new_account.id, new_tx.amount, 1)
+                self._record_tx_stats(session, user_id, 1, new_tx.date)
+            
+            # Ledger: initial_balance + Opening Balance Transaction (balance formula နဲ့ ကိုက်ညီအောင်)
+            self._apply_balance_deltas(session, user_id, {
+                new_account.id: initial_balance + _signed_amount('income' if initial_balance > 0 else 'expense', abs(initial_balance))
+            })
             
             logger.info(f"User {user_id} created new account '{name}' with balance {initial_balance}")
             return new_account, "✅ Account အသစ်ကို အောင်မြင်စွာ ဖန်တီးပြီးပါပြီ။"
@@ -103,7 +589,7 @@ class DatabaseManager:
 
     def get_accounts(self, user_id: int) -> List[Dict[str, Any]]: # <-- (!!!) Return Type ကို ပြောင်းပါ
         """Gets all accounts for a user as dictionaries."""
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             accounts = session.query(Account).filter_by(user_id=user_id).order_by(Account.name).all()
             # (!!!) Object အစစ်အစား၊ Dictionary တွေ ပြန်ပေးပါ (!!!)
             # ဒါမှ DetachedInstanceError နဲ့ TypeError နှစ်ခုလုံးကနေ ကင်းဝေးမှာပါ
@@ -111,6 +597,7 @@ class DatabaseManager:
 
     def calculate_account_balance(self, session: Session, account_id: str) -> int:
         """Calculates the current balance for a single account."""
+        account_id = coerce_uuid(account_id)
         
         # 1. Initial Balance
         account = session.query(Account).filter_by(id=account_id).first()
@@ -129,18 +616,192 @@ class DatabaseManager:
         balance = balance + incomes - expenses + transfers_in - transfers_out
         return int(balance) # Ensure it returns integer
 
+    def _source_balances(self, session: Session, user_id: Optional[int] = None) -> Dict[Tuple[int, str], int]:
+        """
+        Recomputes balances from `transaction` + `transfer_log` (the source of truth)
+        in ONE grouped statement. Used to build and verify the account_balance ledger.
+        Returns {(user_id, account_key): balance}; unassigned uses UNASSIGNED_ACCOUNT_KEY.
+        """
+        signed_amount = case(
+            (Transaction.type == 'income', Transaction.amount),
+            (Transaction.type == 'expense', -Transaction.amount),
+            else_=0
+        )
+        account_key = func.coalesce(Transaction.account_id, literal(UNASSIGNED_ACCOUNT_KEY, UUIDString))
+        # Every balance movement as (user_id, account_key, amount) rows
+        selects = [
+            select(Account.user_id.label('user_id'), Account.id.label('account_id'), Account.initial_balance.label('amount')),
+            select(Transaction.user_id, account_key, signed_amount),
+            select(TransferLog.user_id, TransferLog.to_account_id, TransferLog.amount),
+            select(TransferLog.user_id, TransferLog.from_account_id, -TransferLog.amount),
+        ]
+        if user_id is not None:
+            selects = [
+                selects[0].where(Account.user_id == user_id),
+                selects[1].where(Transaction.user_id == user_id),
+                selects[2].where(TransferLog.user_id == user_id),
+                selects[3].where(TransferLog.user_id == user_id),
+            ]
+        movements = union_all(*selects).subquery('movements')
+
+        stmt = (
+            select(movements.c.user_id, movements.c.account_id, func.coalesce(func.sum(movements.c.amount), 0))
+            .group_by(movements.c.user_id, movements.c.account_id)
+        )
+        return {(uid, acc_id): int(balance) for uid, acc_id, balance in session.execute(stmt)}
+
+    # --- (!!!) NEW: Materialized Balance Ledger (account_balance) (!!!) ---
+    def _rebuild_balance_ledger(self, session: Session, user_id: int):
+        """Replaces a user's account_balance rows with freshly computed values."""
+        session.flush()
+        balances = self._source_balances(session, user_id)
+        balances.setdefault((user_id, UNASSIGNED_ACCOUNT_KEY), 0) # Unassigned row က အမြဲရှိရပါမယ်
+        
+        session.query(AccountBalance).filter_by(user_id=user_id).delete(synchronize_session=False)
+        # Rollback ဖြစ်ခဲ့ရင် Ledger မရှိတော့လို့ Cache ကို Transaction ပြီးမှ ပြန်စစ်ခိုင်းပါ
+        _on_transaction_end(session, lambda: self.ledger_users.invalidate(user_id))
+        now = datetime.now()
+        session.execute(
+            AccountBalance.__table__.insert(),
+            [{"user_id": uid, "account_id": acc_id, "balance": balance, "updated_at": now}
+             for (uid, acc_id), balance in balances.items()]
+        )
+
+    def _has_balance_ledger(self, session: Session, user_id: int) -> bool:
+        if self.ledger_users.get(user_id):
+            return True
+        exists = session.query(AccountBalance.user_id).filter_by(
+            user_id=user_id, account_id=UNASSIGNED_ACCOUNT_KEY
+        ).first() is not None
+        if exists:
+            self.ledger_users.set(user_id, True)
+        return exists
+
+    def _ensure_balance_ledger(self, session: Session, user_id: int) -> bool:
+        """
+        Builds the ledger for users who don't have one yet (e.g. data from before the ledger existed).
+        Returns True if it was built now, which means pending writes are already included.
+        """
+        if self._has_balance_ledger(session, user_id):
+            return False
+        
+        # User row ကို Lock လုပ်ပြီး ထပ်စစ်ပါ (Concurrent write နှစ်ခု တပြိုင်နက် မဆောက်မိစေရန်)
+        session.query(User.id).filter_by(id=user_id).with_for_update().first()
+        if self._has_balance_ledger(session, user_id):
+            return False
+        
+        self._rebuild_balance_ledger(session, user_id)
+        logger.info(f"Built account_balance ledger for user {user_id}")
+        return True
+
+    def _apply_balance_deltas(self, session: Session, user_id: int, deltas: Dict[Optional[str], int]):
+        """
+        Applies balance changes to the ledger inside the caller's DB transaction.
+        `deltas` is {account_id (None = Unassigned): amount_change}.
+        """
+        session.flush() # Pending write ကို DB ထဲ အရင်ရောက်စေပါ
+        _note_user_write(session, user_id) # Recurring runner လို Core bulk insert တွေပါ ဒီကို ဖြတ်ပါတယ်
+        if self._ensure_balance_ledger(session, user_id):
+            return # Ledger ကို အခုမှ ဆောက်လို့ ဒီ write ပါပြီးသားပါ
+        
+        now = datetime.now()
+        for account_id, delta in deltas.items():
+            stmt = _dialect_insert(AccountBalance).values(
+                user_id=user_id,
+                account_id=account_id or UNASSIGNED_ACCOUNT_KEY,
+                balance=delta,
+                updated_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AccountBalance.user_id, AccountBalance.account_id],
+                set_={"balance": AccountBalance.balance + stmt.excluded.balance, "updated_at": now}
+            )
+            session.execute(stmt)
+
+    def _compute_balances(self, session: Session, user_id: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Reads every account balance (and the unassigned balance) for a user
+        from the account_balance ledger (primary-key range lookup).
+        Returns (accounts sorted by name, unassigned_balance).
+        """
+        if not self._has_balance_ledger(session, user_id):
+            # Read path (Autocommit) ဖြစ်နိုင်လို့ Ledger ကို Transaction သီးသန့်နဲ့ ဆောက်ပါ
+            with get_session() as write_session:
+                self._ensure_balance_ledger(write_session, user_id)
+                if session.info.get('replica'):
+                    return self._compute_balances(write_session, user_id) # Replica ဆီ မရောက်သေးပါ
+        
+        rows = session.query(AccountBalance.account_id, Account.name, AccountBalance.balance).outerjoin(
+            Account, and_(Account.id == AccountBalance.account_id, Account.user_id == AccountBalance.user_id)
+        ).filter(AccountBalance.user_id == user_id).all()
+
+        accounts = []
+        unassigned = 0
+        for account_id, name, balance in rows:
+            if account_id == UNASSIGNED_ACCOUNT_KEY:
+                # Account မသတ်မှတ်ထားသော Transaction များ (Unassigned)
+                unassigned = int(balance)
+            elif name is not None:
+                accounts.append({"id": account_id, "name": name, "balance": int(balance)})
+
+        accounts.sort(key=lambda acc: acc['name'])
+        return accounts, unassigned
+
+    def verify_account_balances(self, fix: bool = False, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Recomputes balances from transaction + transfer_log and compares them with the
+        account_balance ledger. Reports drift; with fix=True the ledger is corrected.
+        """
+        with get_session() as session:
+            expected = self._source_balances(session, user_id)
+            
+            ledger_query = session.query(AccountBalance.user_id, AccountBalance.account_id, AccountBalance.balance)
+            if user_id is not None:
+                ledger_query = ledger_query.filter(AccountBalance.user_id == user_id)
+            stored = {(uid, acc_id): int(balance) for uid, acc_id, balance in ledger_query.all()}
+            
+            # Ledger မရှိသေးတဲ့ User တွေက Drift မဟုတ်ပါ (ပထမဆုံး သုံးတဲ့အချိန် ဆောက်ပါမယ်)
+            ledger_users = {uid for uid, _ in stored}
+            uninitialized = {uid for uid, _ in expected} - ledger_users
+            
+            drift = []
+            for key in set(expected) | set(stored):
+                if key[0] not in ledger_users:
+                    continue
+                exp = expected.get(key, 0)
+                got = stored.get(key)
+                if got is None and exp == 0:
+                    continue
+                if got != exp:
+                    drift.append({"user_id": key[0], "account_id": key[1], "stored": got, "expected": exp})
+            
+            if fix:
+                for uid in {d['user_id'] for d in drift} | uninitialized:
+                    self._rebuild_balance_ledger(session, uid)
+                logger.info(f"account_balance rebuilt for {len({d['user_id'] for d in drift} | uninitialized)} users")
+            
+            drift.sort(key=lambda d: abs((d['stored'] or 0) - d['expected']), reverse=True)
+            return {
+                "users_checked": len(ledger_users | uninitialized),
+                "rows_checked": len(stored),
+                "uninitialized_users": len(uninitialized),
+                "drift_count": len(drift),
+                "drift": drift,
+                "fixed": fix
+            }
+    # --- (!!!) End of Materialized Balance Ledger (!!!) ---
+
+    def get_balance_overview(self, user_id: int) -> Dict[str, Any]:
+        """Gets all account balances and the unassigned balance in one round trip."""
+        with get_session(read_only=True) as session:
+            accounts, unassigned = self._compute_balances(session, user_id)
+            return {"accounts": accounts, "unassigned": unassigned}
+
     def get_accounts_with_balance(self, user_id: int) -> List[Dict[str, Any]]:
         """Gets all accounts and their calculated balances."""
-        with get_session() as session:
-            accounts = session.query(Account).filter_by(user_id=user_id).order_by(Account.name).all()
-            result = []
-            for acc in accounts:
-                result.append({
-                    "id": acc.id,
-                    "name": acc.name,
-                    "balance": self.calculate_account_balance(session, acc.id)
-                })
-            return result
+        with read_session(user_id) as session:
+            accounts, _ = self._compute_balances(session, user_id)
+            return accounts
     # --- (!!!) End of New Account Functions (!!!) ---
 
     # (!!!) --- NEW: Get Unassigned Balance (Step 3) --- (!!!)
@@ -149,16 +810,9 @@ class DatabaseManager:
         Calculates the balance of all transactions not assigned to any account.
         (User အဟောင်းတွေ သို့မဟုတ် "Unassigned" အဖြစ် သိမ်းထားတဲ့ စာရင်းတွေ)
         """
-        with get_session() as session:
-            unassigned_income = session.query(func.sum(Transaction.amount)).filter_by(
-                user_id=user_id, type='income', account_id=None
-            ).scalar() or 0
-            
-            unassigned_expense = session.query(func.sum(Transaction.amount)).filter_by(
-                user_id=user_id, type='expense', account_id=None
-            ).scalar() or 0
-            
-            return int(unassigned_income - unassigned_expense)
+        with get_session(read_only=True) as session:
+            _, unassigned = self._compute_balances(session, user_id)
+            return unassigned
     # (!!!) --- End of New Function --- (!!!)
 
     # --- NEW: Get all user IDs for schedulers ---
@@ -167,25 +821,16 @@ class DatabaseManager:
         Fetches all users who need reminders (Premium only).
         Returns list of (user_id, daily_on, weekly_day, weekly_on)
         """
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             users = session.query(User).filter(
                 User.premium_is_premium == True,
                 User.premium_end_date > datetime.now(),
-                (User.settings_daily_reminder == True) | (User.settings_weekly_summary == True)
+                (User.settings_daily_reminder == True) | (User.settings_weekly_summary == True),
+                User.blocked_at.is_(None) # ix_user_reminder_targets (partial index)
             ).all()
             
             return [(u.id, u.settings_daily_reminder, u.settings_weekly_day, u.settings_weekly_summary) for u in users]
 
-    def get_all_users_for_recurring_tx(self) -> List[int]:
-        """Fetches all users who have recurring TX (Premium only)."""
-        with get_session() as session:
-            users = session.query(User.id).filter(
-                User.premium_is_premium == True,
-                User.premium_end_date > datetime.now()
-            ).join(User.recurring_txs).distinct().all()
-            
-            return [u[0] for u in users] # u is a tuple (user_id,)
-
 
     # --- User Data Deletion ---
     def delete_user_data(self, user_id: int) -> bool:
@@ -193,30 +838,47 @@ class DatabaseManager:
         with get_session() as session:
             user = session.query(User).filter_by(id=user_id).first()
             if user:
+                self._bump_global_stats(session, user_id, total_users=-1,
+                                        premium_users=-1 if user.premium_is_premium else 0,
+                                        total_transactions=-(user.stats.tx_count if user.stats else 0))
                 session.delete(user)
+                self._invalidate_premium(session, user_id)
+                _on_transaction_end(session, lambda: self.known_users.invalidate(user_id))
+                _on_transaction_end(session, lambda: self.ledger_users.invalidate(user_id))
                 logger.info(f"Deleted all data for user {user_id}")
                 return True
             return False
 
     # --- Premium Methods ---
     
+    def _invalidate_premium(self, session: Session, user_id: int):
+        _on_transaction_end(session, lambda: self.premium_cache.invalidate(user_id))
+
     def get_premium_status(self, user_id: int) -> Dict[str, Any]:
-        """Gets premium status from the User table."""
-        with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+        """Gets premium status (served from premium_cache until TTL or premium_end_date)."""
+        cached = self.premium_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+        return self._load_premium_status(user_id)
+
+    def _load_premium_status(self, user_id: int) -> Dict[str, Any]:
+        """
+        Gets premium status from the User table and caches it.
+        သက်တမ်းကုန်တာကို end_date နဲ့ပဲ တွက်ပါတယ် (flag ကို expire_lapsed_premiums job က ပိတ်ပါတယ်)
+        """
+        with get_session(read_only=True) as session:
+            user = self._get_user_for_read(session, user_id)
             
             is_premium = user.premium_is_premium and (user.premium_end_date > datetime.now())
             
-            if user.premium_is_premium and not is_premium:
-                # Premium expired, update it
-                user.premium_is_premium = False
-                logger.info(f"Premium expired for user {user_id}")
-            
-            return {
+            status = {
                 'is_premium': is_premium,
                 'end_date': user.premium_end_date.strftime('%Y-%m-%d'),
                 'used_trial': user.premium_used_trial
             }
+            # Premium သက်တမ်းကုန်တဲ့ အချိန်မှာ Cache လည်း ကုန်ပါမယ်
+            self.premium_cache.set(user_id, status, user.premium_end_date.timestamp() if is_premium else None)
+            return dict(status)
 
     def grant_premium(self, user_id: int, days: int, is_trial: bool = False):
         """Grants premium access by updating the User table."""
@@ -224,62 +886,51 @@ class DatabaseManager:
             user = self.get_or_create_user(session, user_id)
             
             end_date = datetime.now() + timedelta(days=days)
+            if not user.premium_is_premium:
+                self._bump_global_stats(session, user_id, premium_users=1)
+            if not is_trial:
+                self._bump_daily_stats(session, user_id, datetime.now().date(), premium_grants=1)
             user.premium_is_premium = True
             user.premium_end_date = end_date
             if is_trial:
                 user.premium_used_trial = True
+            self._invalidate_premium(session, user_id)
             
             logger.info(f"Granted premium to {user_id} for {days} days.")
             return end_date.strftime('%Y-%m-%d')
 
     # (!!!) NEW: Premium Expiration Checker Function (!!!)
+    PREMIUM_REMINDER_DAYS = (3, 1) # သက်တမ်း ဒီရက်အလိုမှာ သတိပေးပါ
+
     def get_expiring_premium_users(self) -> List[Dict[str, Any]]:
         """
         Premium သက်တမ်း (၃) ရက်အလို နှင့် (၁) ရက်အလို User များကို ရှာဖွေပေးသည်။
+        Range query တစ်ခုတည်း (ix_user_premium_end_date) နဲ့ ယူပြီး days_left ကို Python မှာ တွက်ပါတယ်
         """
         today = datetime.now().date()
-        
-        # (၃) ရက်အလို (ဥပမာ- ဒီနေ့ 11/11 -> 11/14 ကုန်မယ့်သူ)
-        target_date_3_days = (today + timedelta(days=3))
-        
-        # (၁) ရက်အလို (ဥပမာ- ဒီနေ့ 11/11 -> 11/12 ကုန်မယ့်သူ)
-        target_date_1_day = (today + timedelta(days=1))
-        
-        expiring_users = []
+        # ဥပမာ- ဒီနေ့ 11/11 -> 11/12 00:00 မှ 11/15 00:00 မတိုင်ခင် ကုန်မယ့်သူ
+        range_start = datetime.combine(today + timedelta(days=min(self.PREMIUM_REMINDER_DAYS)), datetime.min.time())
+        range_end = datetime.combine(today + timedelta(days=max(self.PREMIUM_REMINDER_DAYS) + 1), datetime.min.time())
         
         try:
-            with get_session() as session:
-                # (၃) ရက်အလို User များကို ရှာသည်
-                # premium_end_date က (target_date_3_days 00:00:00) နဲ့ (target_date_3_days 23:59:59) ကြားမှာ ရှိရမယ်
-                start_of_day_3 = datetime.combine(target_date_3_days, datetime.min.time())
-                end_of_day_3 = datetime.combine(target_date_3_days, datetime.max.time())
-
-                users_3_days = session.query(User).filter(
-                    User.premium_is_premium == True,
-                    User.premium_end_date.between(start_of_day_3, end_of_day_3)
-                ).all()
-                
-                for user in users_3_days:
-                    expiring_users.append({
-                        'user_id': user.id,
-                        'end_date': user.premium_end_date.strftime('%Y-%m-%d'),
-                        'days_left': 3  # (၃) ရက်အလို
-                    })
-
-                # (၁) ရက်အလို User များကို ရှာသည်
-                start_of_day_1 = datetime.combine(target_date_1_day, datetime.min.time())
-                end_of_day_1 = datetime.combine(target_date_1_day, datetime.max.time())
-                
-                users_1_day = session.query(User).filter(
-                    User.premium_is_premium == True,
-                    User.premium_end_date.between(start_of_day_1, end_of_day_1)
+            with get_session(read_only=True) as session:
+                rows = session.execute(
+                    select(User.id, User.premium_end_date).where(
+                        User.premium_is_premium == True,
+                        User.premium_end_date >= range_start,
+                        User.premium_end_date < range_end,
+                        User.blocked_at.is_(None)
+                    )
                 ).all()
 
-                for user in users_1_day:
+            expiring_users = []
+            for user_id, end_date in rows:
+                days_left = (end_date.date() - today).days
+                if days_left in self.PREMIUM_REMINDER_DAYS:
                     expiring_users.append({
-                        'user_id': user.id,
-                        'end_date': user.premium_end_date.strftime('%Y-%m-%d'),
-                        'days_left': 1  # (၁) ရက်အလို
+                        'user_id': user_id,
+                        'end_date': end_date.strftime('%Y-%m-%d'),
+                        'days_left': days_left
                     })
                     
             logger.info(f"Found {len(expiring_users)} users with expiring premium.")
@@ -288,17 +939,38 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Database error while fetching expiring users: {e}")
             return []
+
+    def expire_lapsed_premiums(self) -> int:
+        """
+        သက်တမ်းကုန်ပြီးသား Premium User အားလုံးကို UPDATE တစ်ခုတည်းနဲ့ ပိတ်ပါ (Scheduler job)။
+        get_premium_status က end_date နဲ့ တွက်လို့ ဒီ flag ကို Read path မှာ မရေးတော့ပါ
+        """
+        with get_session() as session:
+            expired_ids = list(session.execute(
+                User.__table__.update()
+                .where(User.__table__.c.premium_is_premium == True,
+                       User.__table__.c.premium_end_date < datetime.now())
+                .values(premium_is_premium=False)
+                .returning(User.__table__.c.id)
+            ).scalars())
+            for user_id in expired_ids:
+                self._bump_global_stats(session, user_id, premium_users=-1)
+        for user_id in expired_ids:
+            self.premium_cache.invalidate(user_id)
+        if expired_ids:
+            logger.info(f"Expired premium for {len(expired_ids)} users.")
+        return len(expired_ids)
     # (!!!) End of New Function (!!!)
             
     # --- Custom Category Methods ---
     def get_custom_categories(self, user_id: int, type: str) -> List[str]:
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             cats = session.query(CustomCategory.name).filter_by(user_id=user_id, type=type).all()
             return [c.name for c in cats]
 
     def add_custom_category(self, user_id: int, type: str, category_name: str) -> bool:
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id) # Ensure user exists
+            self.ensure_user(session, user_id)
             category_name = category_name.strip()
             
             exists = session.query(CustomCategory).filter_by(user_id=user_id, type=type, name=category_name).first()
@@ -319,7 +991,7 @@ class DatabaseManager:
     # --- Goal Tracking Methods ---
     def add_goal(self, user_id: int, name: str, amount: int, target_date: datetime):
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+            self.ensure_user(session, user_id)
             new_goal = Goal(
                 id=str(uuid.uuid4()),
                 name=name.strip(),
@@ -332,31 +1004,27 @@ class DatabaseManager:
             return new_goal.id
 
     def get_all_goals(self, user_id: int) -> List[Dict[str, Any]]:
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             goals = session.query(Goal).filter_by(user_id=user_id).all()
             return [g.to_dict() for g in goals] # Use helper
 
     def delete_goal(self, user_id: int, goal_id: str) -> bool:
         with get_session() as session:
-            goal = session.query(Goal).filter_by(user_id=user_id, id=goal_id).first()
+            goal = session.query(Goal).filter_by(user_id=user_id, id=coerce_uuid(goal_id)).first()
             if goal:
                 session.delete(goal)
                 return True
             return False
 
     def calculate_goal_progress(self, user_id: int) -> List[Dict[str, Any]]:
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             goals = session.query(Goal).filter_by(user_id=user_id).all()
             
             # (!!!) Calculate current balance (NEW LOGIC) (!!!)
             # လက်ကျန်ငွေဆိုတာ Account အားလုံးထဲက စုစုပေါင်း ပိုက်ဆံ ဖြစ်ရပါမယ်
-            all_accounts = self.get_accounts_with_balance(user_id)
-            current_balance = sum(acc['balance'] for acc in all_accounts)
-            
             # (!!!) Account မရှိသေးတဲ့ User အဟောင်းတွေအတွက်၊ Transaction အဟောင်းတွေကိုလည်း ထည့်တွက်ပါ (!!!)
-            unassigned_income = session.query(func.sum(Transaction.amount)).filter_by(user_id=user_id, type='income', account_id=None).scalar() or 0
-            unassigned_expense = session.query(func.sum(Transaction.amount)).filter_by(user_id=user_id, type='expense', account_id=None).scalar() or 0
-            current_balance += (unassigned_income - unassigned_expense)
+            all_accounts, unassigned = self._compute_balances(session, user_id)
+            current_balance = sum(acc['balance'] for acc in all_accounts) + unassigned
             
             progress_list = []
             for goal in goals:
@@ -378,12 +1046,144 @@ class DatabaseManager:
                 })
             return progress_list
 
+    # --- (!!!) NEW: Monthly Rollup (monthly_rollup) (!!!) ---
+    def _apply_rollup_delta(self, session: Session, user_id: int, tx_date: Optional[datetime], tx_type: str,
+                            category_id: Optional[int], account_id: Optional[str], amount: int, count: int):
+        """Adds (amount, count) to the transaction's month bucket inside the caller's DB transaction."""
+        if tx_date is None:
+            return
+        _on_transaction_end(session, lambda: self.active_months_cache.invalidate(user_id))
+        stmt = _dialect_insert(MonthlyRollup).values(
+            user_id=user_id,
+            year=tx_date.year,
+            month=tx_date.month,
+            type=tx_type or '',
+            category_id=category_id or NO_CATEGORY_ID,
+            account_id=account_id or UNASSIGNED_ACCOUNT_KEY,
+            total=amount or 0,
+            count=count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MonthlyRollup.user_id, MonthlyRollup.year, MonthlyRollup.month,
+                            MonthlyRollup.type, MonthlyRollup.category_id, MonthlyRollup.account_id],
+            set_={"total": MonthlyRollup.total + stmt.excluded.total,
+                  "count": MonthlyRollup.count + stmt.excluded['count']}
+        )
+        session.execute(stmt)
+
+    def _rebuild_rollups(self, session: Session, user_id: Optional[int] = None) -> int:
+        """Recomputes monthly_rollup from `transaction` with one INSERT ... SELECT (all users or one)."""
+        session.flush()
+        year = cast(extract('year', Transaction.date), Integer)
+        month = cast(extract('month', Transaction.date), Integer)
+        tx_type = func.coalesce(Transaction.type, literal(''))
+        category = func.coalesce(Transaction.category_id, literal(NO_CATEGORY_ID))
+        account_key = func.coalesce(Transaction.account_id, literal(UNASSIGNED_ACCOUNT_KEY, UUIDString))
+        
+        grouped = select(
+            Transaction.user_id, year, month, tx_type, category, account_key,
+            func.coalesce(func.sum(Transaction.amount), 0), func.count(Transaction.id)
+        ).where(Transaction.date.isnot(None), Transaction.user_id.isnot(None)).group_by(
+            Transaction.user_id, year, month, tx_type, category, account_key
+        )
+        delete_query = session.query(MonthlyRollup)
+        if user_id is not None:
+            grouped = grouped.where(Transaction.user_id == user_id)
+            delete_query = delete_query.filter(MonthlyRollup.user_id == user_id)
+        delete_query.delete(synchronize_session=False)
+        if user_id is not None:
+            _on_transaction_end(session, lambda: self.active_months_cache.invalidate(user_id))
+        else:
+            _on_transaction_end(session, self.active_months_cache.clear)
+        
+        result = session.execute(MonthlyRollup.__table__.insert().from_select(
+            ['user_id', 'year', 'month', 'type', 'category_id', 'account_id', 'total', 'count'], grouped
+        ))
+        return result.rowcount or 0
+
+    def rebuild_monthly_rollups(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Backfill / repair command: rebuilds monthly_rollup from raw transactions."""
+        started = time.time()
+        with get_session() as session:
+            rows = self._rebuild_rollups(session, user_id)
+            tx_query = session.query(func.count(Transaction.id))
+            if user_id is not None:
+                tx_query = tx_query.filter(Transaction.user_id == user_id)
+            tx_count = tx_query.scalar() or 0
+        seconds = time.time() - started
+        logger.info(f"monthly_rollup rebuilt: {rows} rows from {tx_count} transactions in {seconds:.1f}s")
+        return {"rows": rows, "transactions": tx_count, "seconds": seconds}
+
+    def _backfill_rollups_if_empty(self):
+        """First start after the upgrade: rollup table is empty but transactions exist."""
+        try:
+            with get_session() as session:
+                has_rollups = session.query(MonthlyRollup.user_id).first() is not None
+                has_transactions = session.query(Transaction.id).first() is not None
+            if not has_rollups and has_transactions:
+                logger.info("monthly_rollup is empty - running initial backfill...")
+                self.rebuild_monthly_rollups()
+        except Exception as e:
+            logger.error(f"monthly_rollup backfill failed (run /rebuild rollups): {e}")
+
+    def get_monthly_totals(self, user_id: int, year: int, month: int) -> Dict[str, Any]:
+        """
+        One month's income / expense totals and per-category breakdown
+        from monthly_rollup (single primary-key range lookup).
+        """
+        with get_session(read_only=True) as session:
+            rows = session.query(
+                MonthlyRollup.type, MonthlyRollup.category_id,
+                func.sum(MonthlyRollup.total), func.sum(MonthlyRollup.count)
+            ).filter(
+                MonthlyRollup.user_id == user_id,
+                MonthlyRollup.year == year,
+                MonthlyRollup.month == month
+            ).group_by(MonthlyRollup.type, MonthlyRollup.category_id).having(
+                func.sum(MonthlyRollup.count) != 0 # Update / Delete ကြောင့် ကျန်ခဲ့တဲ့ အလွတ် bucket များ
+            ).all()
+            
+            names = self.categories.names_for(session, [row[1] for row in rows])
+            totals = {"income": 0, "expense": 0, "tx_count": 0, "income_by_category": {}, "expense_by_category": {}}
+            for tx_type, category_id, total, count in rows:
+                category = names.get(category_id, '')
+                totals["tx_count"] += int(count or 0)
+                if tx_type in ("income", "expense"):
+                    totals[tx_type] += int(total or 0)
+                    by_category = totals[f"{tx_type}_by_category"]
+                    by_category[category] = by_category.get(category, 0) + int(total or 0)
+            return totals
+    def get_active_months(self, user_id: int) -> List[Tuple[int, int]]:
+        """
+        (year, month) pairs that have transactions, newest first.
+        Reads the (user_id, year, month) primary-key prefix of monthly_rollup; cached per user.
+        """
+        cached = self.active_months_cache.get(user_id)
+        if cached is not None:
+            return list(cached)
+        with get_session(read_only=True) as session:
+            rows = session.query(MonthlyRollup.year, MonthlyRollup.month).filter(
+                MonthlyRollup.user_id == user_id
+            ).group_by(MonthlyRollup.year, MonthlyRollup.month).having(
+                func.sum(MonthlyRollup.count) > 0
+            ).order_by(MonthlyRollup.year.desc(), MonthlyRollup.month.desc()).all()
+            months = [(int(year), int(month)) for year, month in rows]
+        self.active_months_cache.set(user_id, months)
+        return list(months)
+    # --- (!!!) End of Monthly Rollup (!!!) ---
+
+    # --- (!!!) NEW: Transaction Partition Maintenance (PostgreSQL) (!!!) ---
+    def maintain_transaction_partitions(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """Scheduler job: creates the upcoming monthly partitions and detaches the ones past retention."""
+        return {"created": ensure_transaction_partitions(now), "detached": detach_old_transaction_partitions(now)}
+
     # --- Transaction Management Methods ---
     
     # (!!!) MODIFIED: add_transaction (!!!)
     def add_transaction(self, user_id: int, type: str, amount: int, description: str, category: str, account_id: Optional[str] = None):
+        account_id = coerce_uuid(account_id) # Callback data ထဲက id အဟောင်း (UUID မဟုတ်တာ) တွေလည်း ရပါတယ်
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+            self.ensure_user(session, user_id)
             
             # (!!!) Account ID ကိုပါ ထည့်သွင်းပါ (!!!)
             new_tx = Transaction(
@@ -392,17 +1192,21 @@ class DatabaseManager:
                 type=type,
                 amount=amount,
                 description=description,
-                category=category,
+                category_id=self.categories.id_for(session, category),
                 user_id=user_id,
                 account_id=account_id # <-- (!!!) ဒီလိုင်း အသစ် ထပ်တိုးပါ (!!!)
             )
             session.add(new_tx)
+            self._apply_balance_deltas(session, user_id, {account_id: _signed_amount(type, amount)})
+            self._apply_rollup_delta(session, user_id, new_tx.date, type, new_tx.category_id, account_id, amount, 1)
+            self._record_tx_stats(session, user_id, 1, new_tx.date)
 
     # --- (!!!) NEW: Transfer Function (!!!) ---
     def add_transfer(self, user_id: int, from_account_id: str, to_account_id: str, amount: int, description: str) -> bool:
         """Logs a transfer between two accounts."""
+        from_account_id, to_account_id = coerce_uuid(from_account_id), coerce_uuid(to_account_id)
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+            self.ensure_user(session, user_id)
             
             # Check if accounts exist
             from_acc = session.query(Account).filter_by(id=from_account_id, user_id=user_id).first()
@@ -420,86 +1224,198 @@ class DatabaseManager:
                 description=description
             )
             session.add(new_transfer)
+            self._apply_balance_deltas(session, user_id, {from_account_id: -amount, to_account_id: amount})
             logger.info(f"User {user_id} transferred {amount} from {from_acc.name} to {to_acc.name}")
             return True
     # --- (!!!) End of New Transfer Function (!!!) ---
 
     def get_transaction_by_id(self, user_id: int, tx_id: str) -> Optional[Dict[str, Any]]:
-        with get_session() as session:
-            tx = session.query(Transaction).filter_by(user_id=user_id, id=tx_id).first()
-            return tx.to_dict() if tx else None
-        
-    def get_recent_transactions(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
-        with get_session() as session:
-            txs = session.query(Transaction).filter_by(user_id=user_id).order_by(Transaction.date.desc()).limit(limit).all()
-            return [tx.to_dict() for tx in txs]
+        with get_session(read_only=True) as session:
+            tx = session.query(Transaction).filter_by(user_id=user_id, id=coerce_uuid(tx_id)).first()
+            return self._with_category_names(session, [tx.to_dict()])[0] if tx else None
         
     def delete_transaction(self, user_id: int, tx_id: str) -> bool:
         with get_session() as session:
-            tx = session.query(Transaction).filter_by(user_id=user_id, id=tx_id).first()
+            tx = session.query(Transaction).filter_by(user_id=user_id, id=coerce_uuid(tx_id)).first()
             if tx:
                 session.delete(tx)
+                self._apply_balance_deltas(session, user_id, {tx.account_id: -_signed_amount(tx.type, tx.amount)})
+                self._apply_rollup_delta(session, user_id, tx.date, tx.type, tx.category_id, tx.account_id, -(tx.amount or 0), -1)
+                self._record_tx_stats(session, user_id, -1)
                 return True
             return False
 
     def update_transaction(self, user_id: int, tx_id: str, new_type: str, new_amount: int, new_description: str, new_category: str) -> Optional[Dict[str, Any]]:
         with get_session() as session:
-            tx = session.query(Transaction).filter_by(user_id=user_id, id=tx_id).first()
+            tx = session.query(Transaction).filter_by(user_id=user_id, id=coerce_uuid(tx_id)).first()
             if tx:
+                old_signed = _signed_amount(tx.type, tx.amount)
+                self._apply_rollup_delta(session, user_id, tx.date, tx.type, tx.category_id, tx.account_id, -(tx.amount or 0), -1)
                 tx.type = new_type
                 tx.amount = new_amount
                 tx.description = new_description
-                tx.category = new_category
+                tx.category_id = self.categories.id_for(session, new_category)
                 # Note: This doesn't update the account_id. We'd need more logic in the bot to handle that.
-                return tx.to_dict()
+                self._apply_balance_deltas(session, user_id, {tx.account_id: _signed_amount(new_type, new_amount) - old_signed})
+                self._apply_rollup_delta(session, user_id, tx.date, new_type, tx.category_id, tx.account_id, new_amount, 1)
+                return self._with_category_names(session, [tx.to_dict()])[0]
             return None
         
     def get_all_categories(self, user_id: int, type: str, default_cats: List[str]) -> List[str]:
         custom_cats = self.get_custom_categories(user_id, type)
         return default_cats + custom_cats
 
+    def _with_category_names(self, session: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """to_dict() rows: category_id -> 'category' name (Bot ဘက်က Category နာမည်နဲ့ပဲ အလုပ်လုပ်ပါတယ်)"""
+        names = self.categories.names_for(session, [row.get('category_id') for row in rows])
+        for row in rows:
+            row['category'] = names.get(row.pop('category_id', None))
+        return rows
+
+    @staticmethod
+    def _transaction_date_bounds(start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[Tuple[datetime, datetime]]:
+        """get_transactions / get_transactions_frame နှစ်ခုလုံး သုံးတဲ့ ရက်စွဲ အပိုင်းအခြား"""
+        if start_date is None:
+            return None
+        if end_date is None:
+            # Monthly report (start_date is first of month)
+            if start_date.month == 12:
+                end_date = start_date.replace(year=start_date.year + 1, month=1, day=1) - timedelta(days=1)
+            else:
+                end_date = start_date.replace(month=start_date.month + 1, day=1) - timedelta(days=1)
+        return start_date.replace(hour=0, minute=0), end_date.replace(hour=23, minute=59)
+
     def get_transactions(self, user_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        with get_session() as session:
+        with read_session(user_id) as session:
             query = session.query(Transaction).filter_by(user_id=user_id)
             
-            if start_date is not None and end_date is None:
-                # Monthly report (start_date is first of month)
-                if start_date.month == 12:
-                    month_end = start_date.replace(year=start_date.year + 1, month=1, day=1) - timedelta(days=1)
-                else:
-                    month_end = start_date.replace(month=start_date.month + 1, day=1) - timedelta(days=1)
-                
-                query = query.filter(Transaction.date >= start_date.replace(hour=0, minute=0), 
-                                     Transaction.date <= month_end.replace(hour=23, minute=59))
-                                     
-            elif start_date is not None and end_date is not None:
-                # Custom date range
-                query = query.filter(Transaction.date >= start_date.replace(hour=0, minute=0), 
-                                     Transaction.date <= end_date.replace(hour=23, minute=59))
+            bounds = self._transaction_date_bounds(start_date, end_date)
+            if bounds:
+                query = query.filter(Transaction.date >= bounds[0], Transaction.date <= bounds[1])
             
             transactions = query.order_by(Transaction.date.asc()).all()
-            return [tx.to_dict() for tx in transactions]
+            return self._with_category_names(session, [tx.to_dict() for tx in transactions])
+
+    # --- (!!!) NEW: Columnar fetch for Reports / Charts (!!!) ---
+    TRANSACTION_FRAME_DTYPES = {
+        'id': 'object', 'date': 'datetime64[ns]', 'type': 'object', 'amount': 'int64',
+        'description': 'object', 'category': 'object', 'account_id': 'object',
+    }
+
+    def get_transactions_frame(self, user_id: int, start_date: Optional[datetime] = None,
+                               end_date: Optional[datetime] = None, columns: Optional[List[str]] = None,
+                               limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        get_transactions နဲ့ ရက်စွဲ semantics တူပါတယ်၊ ဒါပေမယ့် ORM object / to_dict / ISO string မဖြတ်ဘဲ
+        Core select ကနေ DataFrame (date = datetime64, amount = int64) ကို တိုက်ရိုက် ပြန်ပေးပါတယ်။
+        limit ပေးရင် နောက်ဆုံး limit ခု (အသစ်ဆုံး အရင်) ကိုသာ ယူပါတယ်။
+        """
+        columns = list(columns or self.TRANSACTION_FRAME_DTYPES)
+        unknown = set(columns) - set(self.TRANSACTION_FRAME_DTYPES)
+        if unknown:
+            raise ValueError(f"Unknown transaction columns: {sorted(unknown)}")
+
+        table = Transaction.__table__
+        # 'category' column က category_id ကို Dictionary cache နဲ့ နာမည်ပြန်ပြောင်းထားတာပါ
+        stmt = select(*(table.c.category_id if name == 'category' else table.c[name] for name in columns)).where(table.c.user_id == user_id)
+        bounds = self._transaction_date_bounds(start_date, end_date)
+        if bounds:
+            stmt = stmt.where(table.c.date >= bounds[0], table.c.date <= bounds[1])
+        if limit is not None:
+            stmt = stmt.order_by(table.c.date.desc()).limit(limit)
+        else:
+            stmt = stmt.order_by(table.c.date.asc())
+
+        with read_session(user_id) as session:
+            rows = session.execute(stmt).all()
+            if 'category' in columns:
+                position = columns.index('category')
+                names = self.categories.names_for(session, {row[position] for row in rows})
+                rows = [tuple(row[:position]) + (names.get(row[position]),) + tuple(row[position + 1:]) for row in rows]
+
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if 'amount' in df:
+            df['amount'] = df['amount'].fillna(0)
+        return df.astype({name: self.TRANSACTION_FRAME_DTYPES[name] for name in columns})
+    # --- (!!!) End of New (!!!) ---
+
+    # --- (!!!) NEW: Keyset-paginated History (!!!) ---
+    def get_transactions_page(self, user_id: int, cursor_id: Optional[str] = None, direction: str = 'older',
+                              page_size: int = 8, tx_type: Optional[str] = None, category: Optional[str] = None,
+                              account_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        (date, id) keyset pagination - OFFSET မသုံးလို့ စာမျက်နှာ 200 ကလည်း စာမျက်နှာ 1 လောက်ပဲ ကြာပါတယ်။
+        cursor_id: ယခင်စာမျက်နှာရဲ့ အစွန်ဆုံး Transaction id (direction='older' ဆို နောက်ဆုံး၊ 'newer' ဆို ပထမ)
+        items တွေကို အသစ်ဆုံး အရင် စီပြီး ပြန်ပေးပါတယ်။
+        """
+        cursor_id, account_id = coerce_uuid(cursor_id), coerce_uuid(account_id)
+        table = Transaction.__table__
+        key = tuple_(table.c.date, table.c.id)
+        stmt = select(table.c.id, table.c.date, table.c.type, table.c.category_id, table.c.amount).where(table.c.user_id == user_id)
+        if tx_type:
+            stmt = stmt.where(table.c.type == tx_type)
+        if account_id:
+            stmt = stmt.where(table.c.account_id == account_id)
+        
+        with get_session(read_only=True) as session:
+            if category:
+                category_id = self.categories.id_for(session, category, create=False)
+                if category_id is None:
+                    # Dictionary ထဲ မရှိသေးတဲ့ နာမည် - ဘယ် Row နဲ့မှ မကိုက်ပါ (None နဲ့ Filter ရင် IS NULL ဖြစ်သွားပါမယ်)
+                    return {"items": [], "has_newer": False, "has_older": False}
+                stmt = stmt.where(table.c.category_id == category_id)
+            anchor = None
+            if cursor_id:
+                anchor = session.execute(
+                    select(table.c.date, table.c.id).where(table.c.user_id == user_id, table.c.id == cursor_id)
+                ).first()
+            # Cursor မှတ်တမ်း ဖျက်ခံရပြီးသားဆိုရင် ပထမ စာမျက်နှာကို ပြပါ
+            if anchor is None:
+                direction = 'older'
+            
+            if direction == 'newer':
+                page_stmt = stmt.where(key > tuple_(anchor.date, anchor.id)).order_by(table.c.date.asc(), table.c.id.asc())
+            else:
+                page_stmt = stmt.order_by(table.c.date.desc(), table.c.id.desc())
+                if anchor is not None:
+                    page_stmt = page_stmt.where(key < tuple_(anchor.date, anchor.id))
+            
+            # page_size + 1 ခု ယူပြီး နောက်ထပ် စာမျက်နှာ ရှိမရှိ သိပါ
+            rows = session.execute(page_stmt.limit(page_size + 1)).all()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            if direction == 'newer':
+                rows.reverse()
+            
+            names = self.categories.names_for(session, [r.category_id for r in rows])
+            items = [{"id": r.id, "date": r.date, "type": r.type, "category": names.get(r.category_id), "amount": r.amount} for r in rows]
+            if direction == 'newer':
+                return {"items": items, "has_newer": has_more, "has_older": True}
+            return {"items": items, "has_newer": anchor is not None, "has_older": has_more}
+    # --- (!!!) End of New (!!!) ---
 
     # --- Budget Methods ---
     def set_budget(self, user_id: int, category: str, amount: int):
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
-            existing_budget = session.query(Budget).filter_by(user_id=user_id, category=category).first()
+            self.ensure_user(session, user_id)
+            category_id = self.categories.id_for(session, category)
+            existing_budget = session.query(Budget).filter_by(user_id=user_id, category_id=category_id).first()
             if existing_budget:
                 existing_budget.amount = amount
             else:
-                new_budget = Budget(user_id=user_id, category=category, amount=amount)
+                new_budget = Budget(user_id=user_id, category_id=category_id, amount=amount)
                 session.add(new_budget)
 
     def get_budgets(self, user_id: int) -> Dict[str, int]:
-        with get_session() as session:
-            budgets = session.query(Budget).filter_by(user_id=user_id).all()
-            return {b.category: b.amount for b in budgets}
+        with get_session(read_only=True) as session:
+            budgets = session.query(Budget.category_id, Budget.amount).filter_by(user_id=user_id).all()
+            names = self.categories.names_for(session, [b.category_id for b in budgets])
+            return {names.get(b.category_id): b.amount for b in budgets}
 
     # --- Reminder Methods ---
     def get_reminder_settings(self, user_id: int) -> Dict[str, Any]:
-        with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+        with get_session(read_only=True) as session:
+            user = self._get_user_for_read(session, user_id)
             return {
                 'weekly_summary': user.settings_weekly_summary,
                 'weekly_day': user.settings_weekly_day,
@@ -523,65 +1439,473 @@ class DatabaseManager:
                 logger.warning(f"Unknown setting: {setting_name}")
 
     # --- Recurring Transaction Methods ---
-    def add_recurring_tx(self, user_id: int, type: str, amount: int, description: str, category: str, day_of_month: int) -> str:
+    def add_recurring_tx(self, user_id: int, type: str, amount: int, description: str, category: str,
+                         day_of_month: Optional[int], frequency: str = 'monthly') -> str:
+        """day_of_month: monthly/yearly -> day (1-28), weekly -> weekday (0=Monday), daily -> None"""
         with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+            self.ensure_user(session, user_id)
             new_rtx = RecurringTx(
                 id=str(uuid.uuid4()),
                 type=type,
                 amount=amount,
                 description=description,
-                category=category,
+                category_id=self.categories.id_for(session, category),
                 day=day_of_month,
+                frequency=frequency,
+                next_run_at=self._first_recurring_run(frequency, day_of_month, datetime.now()),
                 user_id=user_id
             )
             session.add(new_rtx)
             return new_rtx.id
 
     def get_recurring_txs(self, user_id: int) -> List[Dict[str, Any]]:
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             rtxs = session.query(RecurringTx).filter_by(user_id=user_id).all()
-            return [r.to_dict() for r in rtxs]
+            return self._with_category_names(session, [r.to_dict() for r in rtxs])
 
     def delete_recurring_tx(self, user_id: int, tx_id: str) -> bool:
         with get_session() as session:
-            rtx = session.query(RecurringTx).filter_by(user_id=user_id, id=tx_id).first()
+            rtx = session.query(RecurringTx).filter_by(user_id=user_id, id=coerce_uuid(tx_id)).first()
             if rtx:
                 session.delete(rtx)
                 return True
             return False
 
-# --- (STEP 4) NEW: Admin Dashboard Functions ---
+    # --- (!!!) NEW: Due-queue Recurring Runner (!!!) ---
+    # next_run_at <= now() ဖြစ်တဲ့ row တွေကိုပဲ Index နဲ့ ယူပါ (Table တစ်ခုလုံး scan မလုပ်ပါ)
+    RECURRING_FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+    RECURRING_RUN_HOUR = int(os.getenv('RECURRING_RUN_HOUR', '8')) # Run ရမယ့်နေ့ရဲ့ ဘယ်နှနာရီမှာ Due ဖြစ်မလဲ
+    RECURRING_BATCH_SIZE = int(os.getenv('RECURRING_BATCH_SIZE', '500'))
+    RECURRING_MAX_CATCHUP = int(os.getenv('RECURRING_MAX_CATCHUP', '31')) # Downtime ကြာရင် item တစ်ခုလျှင် နောက်ဆုံး run ဘယ်နှခုအထိ ပြန်လုပ်မလဲ
+
+    @classmethod
+    def _advance_recurring_run(cls, frequency: Optional[str], day: Optional[int], run_at: datetime) -> datetime:
+        """run_at ရဲ့ နောက် Run ရမယ့် အချိန်"""
+        if frequency == 'daily':
+            return run_at + timedelta(days=1)
+        if frequency == 'weekly':
+            return run_at + timedelta(days=7)
+        if frequency == 'yearly':
+            year = run_at.year + 1
+            return run_at.replace(year=year, day=min(day or run_at.day, calendar.monthrange(year, run_at.month)[1]))
+        # monthly (NULL အပါအဝင်)
+        year, month = (run_at.year + 1, 1) if run_at.month == 12 else (run_at.year, run_at.month + 1)
+        return run_at.replace(year=year, month=month, day=min(day or run_at.day, calendar.monthrange(year, month)[1]))
+
+    @classmethod
+    def _first_recurring_run(cls, frequency: Optional[str], day: Optional[int], now: datetime) -> datetime:
+        """ယနေ့ (သို့) ယနေ့နောက်ပိုင်း ပထမဆုံး Run ရမယ့် အချိန် (ယနေ့ ဆိုရင် ယနေ့ပဲ run ပါမယ်)"""
+        today = now.replace(hour=cls.RECURRING_RUN_HOUR, minute=0, second=0, microsecond=0)
+        if frequency == 'weekly' and day is not None:
+            return today + timedelta(days=(day - today.weekday()) % 7)
+        if frequency in ('monthly', None) and day:
+            candidate = today.replace(day=min(day, calendar.monthrange(today.year, today.month)[1]))
+            return candidate if candidate.date() >= today.date() else cls._advance_recurring_run('monthly', day, candidate)
+        return today # daily / yearly (ယနေ့ကနေ စပါ)
+
+    def _backfill_recurring_schedule(self):
+        """next_run_at မရှိသေးတဲ့ row (Upgrade မတိုင်ခင် Data) တွေကို ဖြည့်ပါ"""
+        try:
+            with get_session() as session:
+                now = datetime.now()
+                rows = session.query(RecurringTx).filter(RecurringTx.next_run_at.is_(None)).all()
+                for rtx in rows:
+                    rtx.frequency = rtx.frequency or 'monthly'
+                    rtx.next_run_at = self._first_recurring_run(rtx.frequency, rtx.day, now)
+                if rows:
+                    logger.info(f"Scheduled next_run_at for {len(rows)} recurring transactions.")
+        except Exception as e:
+            logger.error(f"recurring_tx next_run_at backfill failed: {e}")
+
+    def run_due_recurring_txs(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Due queue ကို Batch လိုက် run ပါ:
+          1. next_run_at <= now row တွေကို FOR UPDATE SKIP LOCKED နဲ့ ယူပါ (Worker အများ တပြိုင်နက် run နိုင်)
+          2. Premium user ဆိုရင် လွတ်သွားတဲ့ run တွေပါ (RECURRING_MAX_CATCHUP အထိ) recurring_tx_run နဲ့ claim လုပ်ပြီး bulk insert
+          3. next_run_at ကို now ရဲ့ နောက် Run ရမယ့် အချိန်သို့ ရွှေ့ပါ (Premium မဟုတ်ရင် run မလုပ်ဘဲ ရွှေ့ရုံပါ)
+        Returns the executed items (for notifications).
+        """
+        now = now or datetime.now()
+        executed: List[Dict[str, Any]] = []
+        while True:
+            with get_session() as session:
+                batch = self._run_recurring_batch(session, now)
+            executed.extend(batch["executed"])
+            if batch["picked"] < self.RECURRING_BATCH_SIZE:
+                break
+        if executed:
+            logger.info(f"Recurring runner: {len(executed)} transactions executed.")
+        return executed
+
+    def _run_recurring_batch(self, session: Session, now: datetime) -> Dict[str, Any]:
+        premium_active = and_(User.premium_is_premium == True, User.premium_end_date > now).label('premium_active')
+        due = session.execute(
+            select(RecurringTx.id, RecurringTx.user_id, RecurringTx.type, RecurringTx.amount, RecurringTx.description,
+                   RecurringTx.category_id, RecurringTx.day, RecurringTx.frequency, RecurringTx.next_run_at, premium_active)
+            .join(User, User.id == RecurringTx.user_id)
+            .where(RecurringTx.next_run_at <= now)
+            .order_by(RecurringTx.next_run_at)
+            .limit(self.RECURRING_BATCH_SIZE)
+            .with_for_update(skip_locked=True, of=RecurringTx)
+        ).all()
+        if not due:
+            return {"picked": 0, "executed": []}
+        
+        # 1. Run ရမယ့် အကြိမ်တွေ (Catch-up) နဲ့ next_run_at အသစ်ကို တွက်ပါ
+        occurrences = [] # (row, run_at)
+        advances = []
+        for r in due:
+            run_at, runs = r.next_run_at, []
+            while run_at <= now:
+                runs.append(run_at)
+                run_at = self._advance_recurring_run(r.frequency, r.day, run_at)
+            if r.premium_active:
+                if len(runs) > self.RECURRING_MAX_CATCHUP:
+                    logger.warning(f"Recurring {r.id}: {len(runs)} missed runs, executing the last {self.RECURRING_MAX_CATCHUP}.")
+                occurrences.extend((r, run) for run in runs[-self.RECURRING_MAX_CATCHUP:])
+            advances.append({"rid": r.id, "next_run": run_at})
+        
+        # 2. recurring_tx_run ကို claim လုပ်ပြီး claim ရတဲ့ run တွေကိုပဲ Transaction အဖြစ် ထည့်ပါ
+        executed = []
+        if occurrences:
+            tx_ids = {(r.id, run.date()): str(uuid.uuid4()) for r, run in occurrences}
+            claim = _dialect_insert(RecurringTxRun).on_conflict_do_nothing().returning(
+                RecurringTxRun.recurring_id, RecurringTxRun.run_date)
+            claimed = {tuple(row) for row in session.execute(claim, [
+                {"recurring_id": r.id, "run_date": run.date(), "transaction_id": tx_ids[(r.id, run.date())], "created_at": now}
+                for r, run in occurrences
+            ])}
+            # ယနေ့ run ကို လက်ရှိအချိန်နဲ့၊ လွတ်သွားတဲ့ run တွေကို သူ့ရက်စွဲနဲ့ မှတ်ပါ (လအလိုက် Report မှန်စေရန်)
+            rows = [{
+                "id": tx_ids[(r.id, run.date())], "date": now if run.date() == now.date() else run,
+                "type": r.type, "amount": r.amount, "description": r.description, "category_id": r.category_id,
+                "user_id": r.user_id, "account_id": None,
+            } for r, run in occurrences if (r.id, run.date()) in claimed]
+            if rows:
+                session.execute(Transaction.__table__.insert(), rows)
+                self._apply_bulk_transaction_deltas(session, rows)
+            names = self.categories.names_for(session, [row["category_id"] for row in rows])
+            executed = [{"user_id": row["user_id"], "type": row["type"], "amount": row["amount"], "description": row["description"],
+                         "category": names.get(row["category_id"]), "date": row["date"]} for row in rows]
+        
+        # 3. next_run_at ကို ရှေ့ရွှေ့ပါ
+        table = RecurringTx.__table__
+        session.execute(
+            table.update().where(table.c.id == bindparam('rid')).values(next_run_at=bindparam('next_run')), advances)
+        return {"picked": len(due), "executed": executed}
+
+    def _apply_bulk_transaction_deltas(self, session: Session, rows: List[Dict[str, Any]]):
+        """Bulk insert လုပ်ထားတဲ့ Transaction row တွေအတွက် Ledger / Rollup ကို User / Bucket အလိုက် စုပြီး Update လုပ်ပါ"""
+        balance_deltas: Dict[int, Dict[Optional[str], int]] = {}
+        rollup_deltas: Dict[tuple, List] = {}
+        for row in rows:
+            user_deltas = balance_deltas.setdefault(row["user_id"], {})
+            user_deltas[row["account_id"]] = user_deltas.get(row["account_id"], 0) + _signed_amount(row["type"], row["amount"])
+            key = (row["user_id"], row["date"].year, row["date"].month, row["type"], row["category_id"], row["account_id"])
+            bucket = rollup_deltas.setdefault(key, [row["date"], 0, 0])
+            bucket[1] += row["amount"] or 0
+            bucket[2] += 1
+        for user_id, deltas in balance_deltas.items():
+            self._apply_balance_deltas(session, user_id, deltas)
+        for (user_id, _, _, tx_type, category_id, account_id), (tx_date, amount, count) in rollup_deltas.items():
+            self._apply_rollup_delta(session, user_id, tx_date, tx_type, category_id, account_id, amount, count)
+        now = datetime.now()
+        for user_id in sorted(balance_deltas):
+            self._record_tx_stats(session, user_id, sum(1 for row in rows if row["user_id"] == user_id), now)
+    # --- (!!!) End of New (!!!) ---
+
+    # --- (!!!) NEW: Incremental Admin Statistics (!!!) ---
+    def _bump_global_stats(self, session: Session, user_id: int, **deltas: int):
+        """global_stats ရဲ့ user slot row ကို deltas ပေါင်းပါ (Commit ပြီးမှ _flush_stats က သိမ်းပါတယ်)"""
+        self._queue_stats(session, (GlobalStats, user_id % STATS_COUNTER_SLOTS), deltas)
+
+    def _bump_daily_stats(self, session: Session, user_id: int, day, **deltas: int):
+        self._queue_stats(session, (DailyStats, day, user_id % STATS_COUNTER_SLOTS), deltas)
+
+    def _queue_stats(self, session: Session, key: tuple, deltas: Dict[str, int]):
+        """
+        Slot row တွေကို Handler ရဲ့ Transaction ထဲမှာ Lock မယူပါ - deltas ကို session.info မှာ စုထားပြီး
+        Commit ပြီးမှ Transaction တို တစ်ခုနဲ့ Upsert လုပ်ပါ (Rollback ဖြစ်ရင် ပျက်ပါတယ်)
+        """
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        if session.info.get('autocommit'):
+            self._flush_stats({key: deltas})
+            return
+        pending = session.info.get('stats_deltas')
+        if pending is None:
+            pending = session.info['stats_deltas'] = {}
+            _after_commit(session, lambda: self._flush_stats(session.info.pop('stats_deltas', {})))
+        row = pending.setdefault(key, {})
+        for name, value in deltas.items():
+            row[name] = row.get(name, 0) + value
+
+    def _flush_stats(self, pending: Dict[tuple, Dict[str, int]]):
+        """Queued slot deltas တွေကို Transaction သီးသန့်မှာ သိမ်းပါ (Key အစဉ်လိုက် - Deadlock မဖြစ်စေရန်)"""
+        if not pending:
+            return
+        try:
+            with engine.begin() as conn:
+                for key in sorted(pending, key=lambda k: (k[0].__tablename__,) + tuple(str(part) for part in k[1:])):
+                    model, deltas = key[0], pending[key]
+                    if model is GlobalStats:
+                        stmt = _dialect_insert(GlobalStats).values(slot=key[1], **deltas)
+                        index_elements = [GlobalStats.slot]
+                    else:
+                        stmt = _dialect_insert(DailyStats).values(day=key[1], slot=key[2], **deltas)
+                        index_elements = [DailyStats.day, DailyStats.slot]
+                    conn.execute(stmt.on_conflict_do_update(
+                        index_elements=index_elements,
+                        set_={k: getattr(model, k) + stmt.excluded[k] for k in deltas}))
+        except Exception as e:
+            logger.error(f"Admin stats counters not updated (run /rebuild stats): {e}")
 
-    def get_stats(self) -> Dict[str, int]:
-        """Gets basic statistics about the bot users."""
+    def _record_tx_stats(self, session: Session, user_id: int, count: int, created_at: Optional[datetime] = None):
+        """Transaction count ပြောင်းတိုင်း user_stats / global_stats / daily_stats ကို Update လုပ်ပါ (count < 0 = Delete)"""
+        stmt = _dialect_insert(UserStats).values(user_id=user_id, tx_count=count,
+                                                 last_tx_at=created_at if count > 0 else None)
+        set_ = {"tx_count": UserStats.tx_count + stmt.excluded.tx_count}
+        if count > 0:
+            set_["last_tx_at"] = stmt.excluded.last_tx_at
+        session.execute(stmt.on_conflict_do_update(index_elements=[UserStats.user_id], set_=set_))
+        self._bump_global_stats(session, user_id, total_transactions=count)
+        if count > 0:
+            self._bump_daily_stats(session, user_id, datetime.now().date(), transactions=count)
+
+    def _resync_user_tx_stats(self, session: Session, user_id: int):
+        """Restore လို Bulk ပြောင်းလဲမှုအပြီး User တစ်ယောက်ရဲ့ tx_count ကို ပြန်ရေတွက်ပြီး global total ကို ညှိပါ"""
+        session.flush()
+        tx_count, last_tx_at = session.query(func.count(Transaction.id), func.max(Transaction.date)).filter(
+            Transaction.user_id == user_id).one()
+        stats = session.get(UserStats, user_id)
+        if stats is None:
+            stats = UserStats(user_id=user_id, tx_count=0)
+            session.add(stats)
+        self._bump_global_stats(session, user_id, total_transactions=tx_count - (stats.tx_count or 0))
+        stats.tx_count = tx_count
+        stats.last_tx_at = last_tx_at
+
+    def record_user_activity(self, user_id: int):
+        """
+        User ရဲ့ ယနေ့ ပထမဆုံး Update မှာ DAU ကို +1 လုပ်ပြီး blocked flag ကိုလည်း ရှင်းပါ
+        (AsyncDatabaseManager.touch_user က (user_id, date) cache နဲ့ ရက်တစ်ရက် တစ်ကြိမ်သာ ခေါ်ပါတယ်)
+        """
+        now = datetime.now()
         with get_session() as session:
-            total_users = session.query(func.count(User.id)).scalar()
-            
-            premium_users = session.query(func.count(User.id)).filter(
-                User.premium_is_premium == True,
-                User.premium_end_date > datetime.now()
-            ).scalar()
+            self.ensure_user(session, user_id)
+            stmt = _dialect_insert(UserStats).values(user_id=user_id, tx_count=0, last_active_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={"last_active_at": stmt.excluded.last_active_at},
+                where=(UserStats.last_active_at.is_(None)) | (UserStats.last_active_at < datetime.combine(now.date(), datetime.min.time())))
+            if session.execute(stmt).rowcount:
+                self._bump_daily_stats(session, user_id, now.date(), active_users=1)
+            unblocked = session.query(User).filter(User.id == user_id, User.blocked_at.isnot(None)).update(
+                {User.blocked_at: None, User.last_delivery_error: None}, synchronize_session=False)
+        if unblocked:
+            logger.info(f"User {user_id} is reachable again, cleared blocked flag.")
+        self.activity_touched.set((user_id, now.date()), True)
+
+    def rebuild_stats(self) -> Dict[str, Any]:
+        """Repair command: user_stats / global_stats ကို User / Transaction table တွေကနေ ပြန်တွက်ပါ (daily_stats ကို မထိပါ)"""
+        started = time.time()
+        with get_session() as session:
+            session.execute(UserStats.__table__.insert().from_select(
+                ['user_id', 'tx_count'],
+                select(User.id, literal(0)).where(~exists().where(UserStats.user_id == User.id))))
+            session.execute(UserStats.__table__.update().values(
+                tx_count=select(func.count(Transaction.id)).where(Transaction.user_id == UserStats.user_id).scalar_subquery(),
+                last_tx_at=select(func.max(Transaction.date)).where(Transaction.user_id == UserStats.user_id).scalar_subquery()))
             
-            return {
-                'total': total_users,
-                'premium': premium_users
-            }
+            session.query(GlobalStats).delete(synchronize_session=False)
+            slot = User.id % literal_column(str(STATS_COUNTER_SLOTS)) # GROUP BY နဲ့ SELECT expression တူစေရန် (bind param မသုံးပါ)
+            session.execute(GlobalStats.__table__.insert().from_select(
+                ['slot', 'total_users', 'premium_users', 'total_transactions'],
+                select(slot, func.count(User.id),
+                       func.coalesce(func.sum(case((User.premium_is_premium == True, 1), else_=0)), 0),
+                       func.coalesce(func.sum(UserStats.tx_count), 0))
+                .select_from(User).outerjoin(UserStats, UserStats.user_id == User.id).group_by(slot)))
+            users, transactions = session.query(func.sum(GlobalStats.total_users), func.sum(GlobalStats.total_transactions)).one()
+        seconds = time.time() - started
+        logger.info(f"Admin stats rebuilt: {users or 0} users, {transactions or 0} transactions in {seconds:.1f}s")
+        return {"users": int(users or 0), "transactions": int(transactions or 0), "seconds": seconds}
 
-    def get_all_user_ids(self) -> List[int]:
-        """Gets all user IDs for broadcasting."""
+    def _backfill_stats_if_empty(self):
+        """First start after the upgrade: counters ကို တစ်ကြိမ် ဆောက်ပြီး daily_stats.transactions ကို Transaction ရက်စွဲနဲ့ ဖြည့်ပါ"""
+        try:
+            with get_session(read_only=True) as session:
+                has_stats = session.query(GlobalStats.slot).first() is not None
+                has_users = session.query(User.id).first() is not None
+            if has_stats or not has_users:
+                return
+            logger.info("global_stats is empty - running initial backfill...")
+            self.rebuild_stats()
+            with get_session() as session:
+                day = func.date(Transaction.date)
+                slot = Transaction.user_id % literal_column(str(STATS_COUNTER_SLOTS))
+                session.execute(DailyStats.__table__.insert().from_select(
+                    ['day', 'slot', 'transactions'],
+                    select(day, slot, func.count(Transaction.id))
+                    .where(Transaction.date.isnot(None), Transaction.user_id.isnot(None)).group_by(day, slot)))
+        except Exception as e:
+            logger.error(f"Admin stats backfill failed (run /rebuild stats): {e}")
+    # --- (!!!) End of New (!!!) ---
+
+# --- (STEP 4) NEW: Admin Dashboard Functions ---
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gets bot statistics from the counter tables (global_stats / daily_stats / user_stats).
+        User / Transaction table တွေကို COUNT(*) မလုပ်တော့ပါ
+        """
+        today = datetime.now().date()
+        week_start = today - timedelta(days=6)
+        with get_session(read_only=True) as session:
+            total_users, premium_users, total_transactions = session.execute(select(
+                func.coalesce(func.sum(GlobalStats.total_users), 0),
+                func.coalesce(func.sum(GlobalStats.premium_users), 0),
+                func.coalesce(func.sum(GlobalStats.total_transactions), 0)
+            )).one()
+            days = session.execute(select(
+                DailyStats.day, func.sum(DailyStats.active_users), func.sum(DailyStats.new_users),
+                func.sum(DailyStats.transactions), func.sum(DailyStats.premium_grants)
+            ).where(DailyStats.day >= week_start).group_by(DailyStats.day)).all()
+            # WAU: ix_user_stats_last_active_at range (ရက် ၇ ရက်အတွင်း Active ဖြစ်ခဲ့သူတွေပဲ ဖတ်ပါတယ်)
+            wau = session.execute(select(func.count(UserStats.user_id)).where(
+                UserStats.last_active_at >= datetime.combine(week_start, datetime.min.time()))).scalar()
+            blocked_users = session.query(func.count(User.id)).filter(User.blocked_at.isnot(None)).scalar() # ix_user_blocked_at
+
+        by_day = {row[0]: [int(v or 0) for v in row[1:]] for row in days}
+        dau, new_today, tx_today, _ = by_day.get(today, [0, 0, 0, 0])
+        return {
+            'total': int(total_users),
+            'premium': int(premium_users),
+            'blocked': blocked_users,
+            'transactions': int(total_transactions),
+            'dau': dau,
+            'wau': wau,
+            'new_today': new_today,
+            'tx_today': tx_today,
+            'tx_per_day': sum(v[2] for v in by_day.values()) / 7,
+            'grants_7d': sum(v[3] for v in by_day.values()),
+            'conversion': (premium_users / total_users * 100) if total_users else 0.0
+        }
+
+    def get_all_user_ids(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                         exclude_id: Optional[int] = None) -> List[int]:
+        """Gets user IDs for broadcasting in id order (after_id + limit = keyset page, PK index ကို သုံးပါတယ်)."""
+        with read_session() as session:
+            return self._user_id_page(session, after_id, limit, exclude_id)
+
+    def _user_id_page(self, session: Session, after_id: Optional[int], limit: Optional[int],
+                      exclude_id: Optional[int]) -> List[int]:
+        stmt = select(User.id).where(User.blocked_at.is_(None)).order_by(User.id) # ix_user_deliverable_id
+        if after_id is not None:
+            stmt = stmt.where(User.id > after_id)
+        if exclude_id is not None:
+            stmt = stmt.where(User.id != exclude_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return list(session.execute(stmt).scalars())
+
+    def count_broadcast_recipients(self, exclude_id: Optional[int] = None) -> int:
+        with get_session(read_only=True) as session:
+            stmt = select(func.count(User.id)).where(User.blocked_at.is_(None))
+            if exclude_id is not None:
+                stmt = stmt.where(User.id != exclude_id)
+            return session.execute(stmt).scalar() or 0
+
+    # --- (!!!) NEW: Blocked-user Tracking (!!!) ---
+    def mark_users_blocked(self, errors: Dict[int, str]):
+        """Forbidden / Chat not found ဖြစ်ခဲ့တဲ့ User တွေကို Fan-out target တွေကနေ ဖယ်ပါ ({user_id: error})"""
+        if not errors:
+            return
+        now = datetime.now()
         with get_session() as session:
-            user_ids = session.query(User.id).all()
-            return [uid[0] for uid in user_ids] # user_ids is a list of tuples like [(123,), (456,)]
+            session.execute(
+                User.__table__.update()
+                .where(User.__table__.c.id == bindparam('uid'))
+                .values(blocked_at=now, last_delivery_error=bindparam('err')),
+                [{'uid': user_id, 'err': str(error)[:200]} for user_id, error in errors.items()])
+        today = now.date()
+        for user_id in errors:
+            self.activity_touched.invalidate((user_id, today)) # နောက်တစ်ခါ ဝင်လာရင် ချက်ချင်း ပြန်ရှင်းနိုင်ရန်
+        logger.info(f"Marked {len(errors)} users as blocked.")
+
+    # --- (!!!) End of New (!!!) ---
+
+    # --- (!!!) NEW: Resumable Broadcast Jobs (!!!) ---
+    def create_broadcast_job(self, admin_chat_id: int, message: str) -> Dict[str, Any]:
+        """Broadcast ကို DB job အဖြစ် သိမ်းပါ (Admin ကိုယ်တိုင်ကို မပို့ပါ)"""
+        with get_session() as session:
+            job = BroadcastJob(id=str(uuid.uuid4()), admin_chat_id=admin_chat_id, message=message,
+                               total=self.count_broadcast_recipients(exclude_id=admin_chat_id))
+            session.add(job)
+            session.flush()
+            return job.to_dict()
+
+    def get_broadcast_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with get_session(read_only=True) as session:
+            job = session.get(BroadcastJob, coerce_uuid(job_id))
+            return job.to_dict() if job else None
+
+    def set_broadcast_progress_message(self, job_id: str, message_id: int):
+        with get_session() as session:
+            session.query(BroadcastJob).filter_by(id=coerce_uuid(job_id)).update(
+                {BroadcastJob.progress_message_id: message_id}, synchronize_session=False)
+
+    def claim_broadcast_batch(self, job_id: str, limit: int) -> List[int]:
+        """
+        နောက် Recipient page ကို ယူပြီး cursor ကို မပို့ခင် ရှေ့တိုးထားပါ (at-most-once)။
+        Page မကျန်တော့ရင် Job ကို 'done' လုပ်ပြီး [] ပြန်ပေးပါ
+        """
+        with get_session() as session:
+            job = session.query(BroadcastJob).filter_by(id=coerce_uuid(job_id)).with_for_update().first()
+            if not job or job.status != 'running':
+                return []
+            user_ids = self._user_id_page(session, job.cursor_user_id, limit, job.admin_chat_id)
+            if user_ids:
+                job.cursor_user_id = user_ids[-1]
+                job.claimed += len(user_ids)
+            else:
+                job.status = 'done'
+                job.finished_at = datetime.now()
+            return user_ids
+
+    def record_broadcast_results(self, job_id: str, sent: int, failed: int) -> Optional[Dict[str, Any]]:
+        job_id = coerce_uuid(job_id)
+        with get_session() as session:
+            session.query(BroadcastJob).filter_by(id=job_id).update({
+                BroadcastJob.sent: BroadcastJob.sent + sent,
+                BroadcastJob.failed: BroadcastJob.failed + failed,
+            }, synchronize_session=False)
+            job = session.get(BroadcastJob, job_id)
+            return job.to_dict() if job else None
+
+    def resume_broadcast_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Restart အပြီး 'running' job တွေကို ပြန်ပေးပါ။ Restart မတိုင်ခင် claim ပြီး
+        ရလဒ် မမှတ်ရသေးတဲ့ recipient တွေ (ပို့/မပို့ မသေချာ) ကို ပြန်မပို့ဘဲ failed ထဲ ထည့်ပါ
+        """
+        with get_session() as session:
+            jobs = session.query(BroadcastJob).filter_by(status='running').with_for_update().all()
+            for job in jobs:
+                unknown = job.claimed - job.sent - job.failed
+                if unknown > 0:
+                    logger.warning(f"Broadcast {job.id}: {unknown} in-flight recipients lost on restart, not resending.")
+                    job.failed += unknown
+            return [job.to_dict() for job in jobs]
+    # --- (!!!) End of New (!!!) ---
 
     def get_user_details(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Gets detailed info for a single user."""
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             user = session.query(User).filter_by(id=user_id).first()
             if not user:
                 return None
                 
-            tx_count = session.query(func.count(Transaction.id)).filter_by(user_id=user_id).scalar()
+            stats = user.stats # user_stats (Primary key lookup - COUNT မလုပ်တော့ပါ)
             
             is_premium = user.premium_is_premium and (user.premium_end_date > datetime.now())
             
@@ -590,7 +1914,9 @@ class DatabaseManager:
                 'is_premium': is_premium,
                 'end_date': user.premium_end_date.strftime('%Y-%m-%d'),
                 'used_trial': user.premium_used_trial,
-                'tx_count': tx_count
+                'tx_count': stats.tx_count if stats else 0,
+                'last_tx_at': stats.last_tx_at if stats else None,
+                'last_active_at': stats.last_active_at if stats else None
             }
             
     def revoke_premium(self, user_id: int) -> bool:
@@ -598,8 +1924,11 @@ class DatabaseManager:
         with get_session() as session:
             user = session.query(User).filter_by(id=user_id).first()
             if user:
+                if user.premium_is_premium:
+                    self._bump_global_stats(session, user_id, premium_users=-1)
                 user.premium_is_premium = False
                 user.premium_end_date = datetime.min
+                self._invalidate_premium(session, user_id)
                 logger.info(f"Admin revoked premium for user {user_id}")
                 return True
             return False
@@ -610,8 +1939,8 @@ class DatabaseManager:
         Fetches all necessary data for the AI Financial Analyst
         (past 30 days).
         """
-        with get_session() as session:
-            user = self.get_or_create_user(session, user_id)
+        with get_session(read_only=True) as session:
+            user = self._get_user_for_read(session, user_id)
             if not user:
                 return {} # User မရှိရင် data မရှိပါ
 
@@ -619,34 +1948,33 @@ class DatabaseManager:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=30)
 
-            # ၂။ ရက် ၃၀ အတွင်း ဝင်ငွေ/ထွက်ငွေ စုစုပေါင်း
-            total_income = session.query(func.sum(Transaction.amount)).filter(
-                Transaction.user_id == user_id,
-                Transaction.type == 'income',
-                Transaction.date.between(start_date, end_date)
-            ).scalar() or 0
-            
-            total_expense = session.query(func.sum(Transaction.amount)).filter(
-                Transaction.user_id == user_id,
-                Transaction.type == 'expense',
-                Transaction.date.between(start_date, end_date)
-            ).scalar() or 0
-
-            # ၃။ ရက် ၃၀ အတွင်း Category အလိုက် ထွက်ငွေ (Expense Breakdown)
-            expense_breakdown_query = session.query(
-                Transaction.category, 
+            # ၂။ + ၃။ ရက် ၃၀ အတွင်း ဝင်ငွေ/ထွက်ငွေ စုစုပေါင်း နှင့် Category အလိုက် ထွက်ငွေ (Query တစ်ခုတည်း)
+            # (ရက် ၃၀ window က လနဲ့ မကိုက်လို့ monthly_rollup ကို မသုံးနိုင်ပါ၊ ix_transaction_user_date ကို သုံးပါတယ်)
+            window_query = session.query(
+                Transaction.type,
+                Transaction.category_id,
                 func.sum(Transaction.amount)
             ).filter(
                 Transaction.user_id == user_id,
-                Transaction.type == 'expense',
+                Transaction.type.in_(('income', 'expense')),
                 Transaction.date.between(start_date, end_date)
-            ).group_by(Transaction.category).all()
+            ).group_by(Transaction.type, Transaction.category_id).all()
             
-            expense_breakdown = {category: amount for category, amount in expense_breakdown_query}
+            total_income = 0
+            total_expense = 0
+            expense_breakdown = {}
+            budgets_query = session.query(Budget.category_id, Budget.amount).filter_by(user_id=user_id).all()
+            names = self.categories.names_for(session, [row[1] for row in window_query] + [b.category_id for b in budgets_query])
+            for tx_type, category_id, amount in window_query:
+                category = names.get(category_id)
+                if tx_type == 'income':
+                    total_income += amount or 0
+                else:
+                    total_expense += amount or 0
+                    expense_breakdown[category] = expense_breakdown.get(category, 0) + (amount or 0)
 
             # ၄။ သတ်မှတ်ထားသော ဘတ်ဂျက်များ
-            budgets_query = session.query(Budget).filter_by(user_id=user_id).all()
-            budgets = {b.category: b.amount for b in budgets_query}
+            budgets = {names.get(b.category_id): b.amount for b in budgets_query}
             
             return {
                 "total_income": total_income,
@@ -667,147 +1995,420 @@ class DatabaseManager:
         except (ValueError, TypeError):
             return None
 
-    # (!!!) MODIFIED: get_all_data_for_backup (!!!)
-    def get_all_data_for_backup(self, user_id: int) -> Dict[str, List[Dict]]:
-        """Fetches all user data for creating a backup JSON file."""
-        with get_session() as session:
-            # Data တွေကို .to_dict() helper သုံးပြီး dict list တွေအဖြစ် ယူပါ
-            transactions = [tx.to_dict() for tx in session.query(Transaction).filter_by(user_id=user_id).all()]
-            goals = [g.to_dict() for g in session.query(Goal).filter_by(user_id=user_id).all()]
-            recurring_txs = [r.to_dict() for r in session.query(RecurringTx).filter_by(user_id=user_id).all()]
-            
-            # (!!!) NEW (!!!)
-            accounts = [a.to_dict() for a in session.query(Account).filter_by(user_id=user_id).all()]
-            transfers = [t.to_dict() for t in session.query(TransferLog).filter_by(user_id=user_id).all()]
-            
-            # ဒီ model တွေမှာ .to_dict() helper မရှိလို့၊ manual လုပ်ပါ
-            budgets_query = session.query(Budget).filter_by(user_id=user_id).all()
-            budgets = [{"category": b.category, "amount": b.amount} for b in budgets_query]
+    # --- (!!!) NEW: Streaming Backup (gzip NDJSON) (!!!) ---
+    # File ပုံစံ: ပထမစာကြောင်း Header၊ ပြီးရင် {"t": table, "r": row} တစ်ကြောင်းချင်း၊ နောက်ဆုံး {"end": ..., "counts": ...}
+    # Account တွေကို အရင်ရေးပါ (Restore မှာ Transaction / Transfer တွေက Account ID map ကို လိုလို့)
+    BACKUP_FORMAT = "adu-finance-backup"
+    BACKUP_VERSION = 2
+    BACKUP_YIELD_PER = int(os.getenv('BACKUP_YIELD_PER', '1000'))
+    BACKUP_TABLES = [
+        ("accounts", Account, None),
+        ("transactions", Transaction, None),
+        ("budgets", Budget, ["category_id", "amount"]),
+        ("goals", Goal, None),
+        ("custom_categories", CustomCategory, ["type", "name"]),
+        ("recurring_txs", RecurringTx, None),
+        ("transfers", TransferLog, None),
+    ]
+    BACKUP_TABLE_NAMES = {name for name, _, _ in BACKUP_TABLES}
+    BACKUP_REQUIRED_KEYS = ["transactions", "budgets", "goals", "custom_categories", "recurring_txs"] # v1 JSON
+
+    @staticmethod
+    def _backup_json_default(value):
+        # BaseMixin.to_dict() လိုပဲ datetime ကို ISO string အဖြစ် သိမ်းပါ
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def write_backup(self, user_id: int, fileobj) -> Dict[str, int]:
+        """
+        User ရဲ့ Data အားလုံးကို fileobj (binary) ထဲသို့ gzip NDJSON အဖြစ် တစ်ကြောင်းချင်း ရေးပါ။
+        Table တစ်ခုချင်းကို yield_per (PostgreSQL မှာ server-side cursor) နဲ့ ဖတ်လို့ Memory မတက်ပါ။
+        Returns per-table row counts.
+        """
+        counts: Dict[str, int] = {}
+        # Table အားလုံးကို Snapshot တစ်ခုတည်းကနေ ဖတ်ပါ (Server-side cursor က Transaction ထဲမှာပဲ အလုပ်လုပ်ပါတယ်)
+        # Replica သုံးလို့ရရင် Backup scan က Primary ရဲ့ Write တွေနဲ့ မပြိုင်ပါ
+        session = SessionLocal(bind=replica.engine) if replica.usable(user_id) else SessionLocal()
+        try:
+            if session.get_bind().dialect.name == 'postgresql':
+                session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
             
-            custom_cats_query = session.query(CustomCategory).filter_by(user_id=user_id).all()
-            custom_categories = [{"type": c.type, "name": c.name} for c in custom_cats_query]
+            with gzip.open(fileobj, 'wt', encoding='utf-8') as out:
+                header = {"format": self.BACKUP_FORMAT, "version": self.BACKUP_VERSION,
+                          "created_at": datetime.now().isoformat()}
+                out.write(json.dumps(header) + "\n")
+                
+                for name, model, columns in self.BACKUP_TABLES:
+                    table = model.__table__
+                    selected = [table.c[c] for c in columns] if columns else [c for c in table.c if c.name != 'user_id']
+                    stmt = select(*selected)
+                    if 'category_id' in table.c:
+                        # category_id အစား နာမည်ကို သိမ်းပါ (DB တစ်ခုနဲ့ တစ်ခု id မတူလည်း Restore လုပ်နိုင်ရန်)
+                        stmt = select(*(Category.name.label('category') if c.name == 'category_id' else c for c in selected)).select_from(
+                            table.outerjoin(Category, Category.id == table.c.category_id))
+                    stmt = stmt.where(table.c.user_id == user_id).execution_options(yield_per=self.BACKUP_YIELD_PER)
+                    counts[name] = 0
+                    for row in session.execute(stmt):
+                        out.write(json.dumps({"t": name, "r": dict(row._mapping)}, ensure_ascii=False,
+                                             default=self._backup_json_default) + "\n")
+                        counts[name] += 1
+                
+                out.write(json.dumps({"end": True, "counts": counts}) + "\n")
+        finally:
+            session.rollback()
+            session.close()
+        
+        logger.info(f"User {user_id}: Streamed backup ({counts}).")
+        return counts
+
+    def iter_backup_records(self, fileobj):
+        """
+        Backup file ထဲက (table, row) တွေကို တစ်ခုချင်း yield လုပ်ပါ (gzip NDJSON ကို Memory ထဲ အကုန် မတင်ပါ)။
+        JSON file အဟောင်း (v1) ကိုတော့ json.load နဲ့ တစ်ခါတည်း ဖတ်ရပါတယ်။
+        Raises ValueError for malformed, truncated or out-of-order files.
+        """
+        if fileobj.read(2) != b"\x1f\x8b":
+            fileobj.seek(0)
+            legacy = json.load(io.TextIOWrapper(fileobj, encoding='utf-8'))
+            if not isinstance(legacy, dict) or not all(key in legacy for key in self.BACKUP_REQUIRED_KEYS):
+                raise ValueError("Backup file is missing required sections")
+            for name, _, _ in self.BACKUP_TABLES:
+                for row in legacy.get(name) or []:
+                    yield name, row
+            return
+        fileobj.seek(0)
+        
+        counts: Dict[str, int] = {}
+        try:
+            with gzip.open(fileobj, 'rt', encoding='utf-8') as lines:
+                header = json.loads(next(lines, "{}"))
+                if header.get("format") != self.BACKUP_FORMAT:
+                    raise ValueError("Not an ADU Finance backup file")
+                for line_no, line in enumerate(lines, start=2):
+                    record = json.loads(line)
+                    if record.get("end"):
+                        expected = {k: v for k, v in (record.get("counts") or {}).items() if v}
+                        if expected != counts:
+                            raise ValueError(f"Backup trailer counts {expected} do not match rows {counts}")
+                        return
+                    name = record.get("t")
+                    if name not in self.BACKUP_TABLE_NAMES or not isinstance(record.get("r"), dict):
+                        raise ValueError(f"Line {line_no}: unknown backup record")
+                    if name == "accounts" and any(k != "accounts" for k in counts):
+                        raise ValueError(f"Line {line_no}: accounts must come before other tables")
+                    counts[name] = counts.get(name, 0) + 1
+                    yield name, record["r"]
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            # gzip ပျက်နေ / ပြတ်နေ (CRC / Deflate data မမှန်) - ValueError နဲ့ တစ်မျိုးတည်း ကိုင်ပါ
+            raise ValueError(f"Backup file is corrupt: {e}") from e
+        # Trailer မပါရင် file ပြတ်နေပါတယ် (Upload မပြီးတာ စသည်)
+        raise ValueError("Backup file is truncated")
+    # --- (!!!) End of Streaming Backup (!!!) ---
+
+    # --- (!!!) NEW: Bulk Restore (!!!) ---
+    # Row တစ်ခုချင်း session.add() အစား Table တစ်ခုချင်းကို executemany chunk တွေနဲ့ ထည့်ပါ
+    RESTORE_BATCH_SIZE = int(os.getenv('RESTORE_BATCH_SIZE', '1000'))
+    TX_TYPES = ('income', 'expense')
+
+    @staticmethod
+    def _is_int(value) -> bool:
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    def _restore_row(self, user_id: int, name: str, row: Dict[str, Any], account_id_map: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Backup row တစ်ခုကို စစ်ဆေးပြီး INSERT row အဖြစ် ပြောင်းပါ။
+        Raises ValueError for invalid rows; returns None for rows that are skipped.
+        """
+        def need(ok, field):
+            if not ok:
+                raise ValueError(f"Invalid {name} row: bad '{field}' ({row.get(field)!r})")
+
+        def date_field(field):
+            value = row.get(field)
+            parsed = self._parse_iso_date_helper(value)
+            need(value in (None, "") or parsed is not None, field)
+            return parsed
+
+        if name == "accounts":
+            need(isinstance(row.get('name'), str) and row['name'].strip(), 'name')
+            need(self._is_int(row.get('initial_balance', 0)), 'initial_balance')
+            # ID အသစ်ကို Python ဘက်မှာပဲ ထုတ်ပြီး ID အဟောင်း-အသစ်ကို Memory ထဲမှာ ချိတ်ပါ
+            new_id = str(uuid.uuid4())
+            if row.get('id'):
+                account_id_map[row['id']] = new_id
+            return {"id": new_id, "name": row['name'], "initial_balance": row.get('initial_balance', 0), "user_id": user_id}
 
+        if name == "transactions":
+            need(row.get('type') in self.TX_TYPES, 'type')
+            need(self._is_int(row.get('amount')), 'amount')
             return {
-                "transactions": transactions,
-                "budgets": budgets,
-                "goals": goals,
-                "custom_categories": custom_categories,
-                "recurring_txs": recurring_txs,
-                "accounts": accounts, # (!!!) NEW (!!!)
-                "transfers": transfers # (!!!) NEW (!!!)
+                "id": coerce_uuid(row.get('id')) or str(uuid.uuid4()), # id အဟောင်းကို သုံးပါ (UUID မဟုတ်ရင် md5 UUID)
+                "date": date_field('date') or UNDATED_TRANSACTION_DATE, # Primary Key (id, date) ထဲ ပါလို့ NULL မဖြစ်ရပါ
+                "type": row['type'],
+                "amount": row['amount'],
+                "description": row.get('description'),
+                "category": row.get('category'),
+                "user_id": user_id,
+                "account_id": account_id_map.get(row.get('account_id')), # (!!!) Account ID အသစ် (!!!)
+            }
+
+        if name == "budgets":
+            need(isinstance(row.get('category'), str), 'category')
+            need(self._is_int(row.get('amount')), 'amount')
+            return {"category": row['category'], "amount": row['amount'], "user_id": user_id}
+
+        if name == "goals":
+            need(self._is_int(row.get('target_amount')), 'target_amount')
+            return {
+                "id": coerce_uuid(row.get('id')) or str(uuid.uuid4()),
+                "name": row.get('name'),
+                "target_amount": row['target_amount'],
+                "target_date": date_field('target_date'),
+                "start_date": date_field('start_date'),
+                "user_id": user_id,
+            }
+
+        if name == "custom_categories":
+            need(row.get('type') in self.TX_TYPES, 'type')
+            need(isinstance(row.get('name'), str), 'name')
+            return {"type": row['type'], "name": row['name'], "user_id": user_id}
+
+        if name == "recurring_txs":
+            need(row.get('type') in self.TX_TYPES, 'type')
+            need(self._is_int(row.get('amount')), 'amount')
+            frequency = row.get('frequency') or 'monthly' # Backup အဟောင်းတွေမှာ မပါပါ
+            need(frequency in self.RECURRING_FREQUENCIES, 'frequency')
+            if frequency == 'weekly':
+                need(self._is_int(row.get('day')) and 0 <= row['day'] <= 6, 'day')
+            elif frequency != 'daily':
+                need(self._is_int(row.get('day')) and 1 <= row['day'] <= 31, 'day')
+            # Backup ထဲက next_run_at က ဟောင်းနေရင် လွတ်သွားတဲ့ run တွေကို ပြန်မလုပ်စေရန် ယနေ့ကနေ ပြန်စပါ
+            return {
+                "id": coerce_uuid(row.get('id')) or str(uuid.uuid4()),
+                "type": row['type'],
+                "amount": row['amount'],
+                "description": row.get('description'),
+                "category": row.get('category'),
+                "day": row.get('day'),
+                "frequency": frequency,
+                "next_run_at": max(date_field('next_run_at') or datetime.min,
+                                   self._first_recurring_run(frequency, row.get('day'), datetime.now())),
+                "user_id": user_id,
             }
 
+        # transfers (Account ID တွေ မှန်မှ ထည့်ပါ)
+        need(self._is_int(row.get('amount')), 'amount')
+        new_from_id = account_id_map.get(row.get('from_account_id'))
+        new_to_id = account_id_map.get(row.get('to_account_id'))
+        if not (new_from_id and new_to_id):
+            return None
+        return {
+            "id": coerce_uuid(row.get('id')) or str(uuid.uuid4()),
+            "date": date_field('date'),
+            "amount": row['amount'],
+            "description": row.get('description'),
+            "user_id": user_id,
+            "from_account_id": new_from_id,
+            "to_account_id": new_to_id,
+        }
+
+    def _restore_records(self, user_id: int, records) -> Dict[str, Any]:
+        """
+        (table, row) records တွေကို Stream အတိုင်း စစ်ဆေး၊ RESTORE_BATCH_SIZE chunk တွေနဲ့ INSERT လုပ်ပါ။
+        Transaction တစ်ခုတည်းထဲမှာ လုပ်လို့ အမှားတစ်ခုခု (Validation အပါအဝင်) ဖြစ်ရင် Data အဟောင်းပါ အကုန် ပြန်ရပါတယ် (all-or-nothing)။
+        Raises ValueError for invalid backup content; returns None on database errors.
+        """
+        started = time.perf_counter()
+        models = {name: model for name, model, _ in self.BACKUP_TABLES}
+        counts: Dict[str, int] = {name: 0 for name in models}
+        seconds: Dict[str, float] = {name: 0.0 for name in models}
+        
+        try:
+            with get_session() as session:
+                # 1. --- (အရေးကြီး) Data အဟောင်းအားလုံးကို အရင်ဖျက်ပါ ---
+                session.query(TransferLog).filter_by(user_id=user_id).delete() # (!!!) NEW (!!!)
+                session.query(Transaction).filter_by(user_id=user_id).delete()
+                session.query(Account).filter_by(user_id=user_id).delete() # (!!!) NEW (!!!)
+                session.query(Budget).filter_by(user_id=user_id).delete()
+                session.query(Goal).filter_by(user_id=user_id).delete()
+                session.query(CustomCategory).filter_by(user_id=user_id).delete()
+                session.query(RecurringTx).filter_by(user_id=user_id).delete()
+                
+                self._invalidate_premium(session, user_id)
+                _note_user_write(session, user_id) # Bulk delete / insert တွေက ORM event မဖြတ်ပါ
+                seconds["cleanup"] = time.perf_counter() - started
+                logger.info(f"User {user_id}: Cleared old data for restore.")
+
+                # 2. --- Data အသစ်များကို Chunk လိုက် ပြန်ထည့်ပါ (Memory ထဲမှာ Table တစ်ခုလျှင် RESTORE_BATCH_SIZE row ထက် မပိုပါ) ---
+                account_id_map: Dict[str, str] = {}
+                buffers: Dict[str, List[Dict[str, Any]]] = {name: [] for name in models}
+
+                def flush(name):
+                    if buffers[name]:
+                        table_started = time.perf_counter()
+                        if 'category_id' in models[name].__table__.c:
+                            category_ids = self.categories.ids_for(session, [row['category'] for row in buffers[name]])
+                            for row in buffers[name]:
+                                row['category_id'] = category_ids.get(row.pop('category'))
+                        session.execute(models[name].__table__.insert(), buffers[name])
+                        seconds[name] += time.perf_counter() - table_started
+                        counts[name] += len(buffers[name])
+                        buffers[name] = []
+
+                for name, row in records:
+                    if name != "accounts" and buffers["accounts"]:
+                        flush("accounts") # Transaction တွေရဲ့ FK အတွက် Account တွေ အရင် ရောက်နေရပါမယ်
+                    insert_row = self._restore_row(user_id, name, row, account_id_map)
+                    if insert_row is not None:
+                        buffers[name].append(insert_row)
+                        if len(buffers[name]) >= self.RESTORE_BATCH_SIZE:
+                            flush(name)
+                for name in models:
+                    flush(name)
+
+                # Ledger / Rollup ကို Restore လုပ်ထားတဲ့ Data နဲ့ အသစ်ပြန်ဆောက်ပါ
+                ledger_started = time.perf_counter()
+                self._rebuild_balance_ledger(session, user_id)
+                self._rebuild_rollups(session, user_id)
+                self._resync_user_tx_stats(session, user_id)
+                seconds["ledger_rollups"] = time.perf_counter() - ledger_started
+
+                total_seconds = time.perf_counter() - started
+                logger.info(f"User {user_id}: Restored {sum(counts.values())} rows from backup in {total_seconds:.2f}s ({counts}).")
+                return {"counts": counts, "seconds": seconds, "total_seconds": total_seconds}
+        except ValueError as e:
+            # get_session က Rollback လုပ်ပြီး (Unit of work ထဲဆိုရင် Unit ကိုပါ failed မှတ်ပြီး) Data အဟောင်းကို ပြန်ရပါပြီ
+            logger.warning(f"Invalid backup for user {user_id}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error during restore for user {user_id}: {e}")
+            return None
+
     # (!!!) MODIFIED: restore_data_from_backup (!!!)
-    def restore_data_from_backup(self, user_id: int, backup_data: Dict[str, List[Dict]]) -> bool:
+    def restore_data_from_backup(self, user_id: int, backup_data: Dict[str, List[Dict]]) -> Optional[Dict[str, Any]]:
         """
-        Restores user data from a backup dict.
+        Restores user data from a backup dict (v1 JSON layout).
         WARNING: This DELETES all existing data for the user first.
+        Returns a report {"counts": {table: rows}, "seconds": {table: s}, "total_seconds": s}, or None on failure.
         """
-        with get_session() as session:
-            # 1. --- (အရေးကြီး) Data အဟောင်းအားလုံးကို အရင်ဖျက်ပါ ---
-            session.query(TransferLog).filter_by(user_id=user_id).delete() # (!!!) NEW (!!!)
-            session.query(Transaction).filter_by(user_id=user_id).delete()
-            session.query(Account).filter_by(user_id=user_id).delete() # (!!!) NEW (!!!)
-            session.query(Budget).filter_by(user_id=user_id).delete()
-            session.query(Goal).filter_by(user_id=user_id).delete()
-            session.query(CustomCategory).filter_by(user_id=user_id).delete()
-            session.query(RecurringTx).filter_by(user_id=user_id).delete()
-            
-            logger.info(f"User {user_id}: Cleared old data for restore.")
-
-            # 2. --- Data အသစ်များ ပြန်ထည့်ပါ ---
-            try:
-                # (!!!) NEW: Accounts (Transactions တွေ မထည့်ခင် Account တွေ အရင်ထည့်ပါ)
-                account_id_map = {} # Backup file ထဲက ID အဟောင်းနဲ့ DB ထဲက ID အသစ်ကို ချိတ်ဆက်ရန်
-                for acc in backup_data.get("accounts", []):
-                    old_id = acc.get('id')
-                    new_acc = Account(
-                        # id=old_id, # ID အဟောင်းကို မသုံးတော့ပါ၊ UUID အသစ် သုံးပါမယ်
-                        name=acc.get('name'),
-                        initial_balance=acc.get('initial_balance', 0), # Default to 0
-                        user_id=user_id
-                    )
-                    session.add(new_acc)
-                    session.flush() # ID အသစ်ကို ရယူရန်
-                    if old_id:
-                        account_id_map[old_id] = new_acc.id # ID အဟောင်း-အသစ်ကို မှတ်ထားပါ
-                
-                # Transactions
-                for tx in backup_data.get("transactions", []):
-                    old_account_id = tx.get('account_id')
-                    new_account_id = account_id_map.get(old_account_id) # ID အသစ်ကို ရှာပါ
-                    
-                    new_tx = Transaction(
-                        id=tx.get('id', str(uuid.uuid4())), # id အဟောင်းကို သုံးပါ
-                        date=self._parse_iso_date_helper(tx.get('date')),
-                        type=tx.get('type'),
-                        amount=tx.get('amount'),
-                        description=tx.get('description'),
-                        category=tx.get('category'),
-                        user_id=user_id,
-                        account_id=new_account_id # (!!!) Account ID အသစ်ကို ထည့်ပါ (!!!)
-                    )
-                    session.add(new_tx)
-                
-                # Budgets
-                for b in backup_data.get("budgets", []):
-                    new_b = Budget(category=b.get('category'), amount=b.get('amount'), user_id=user_id)
-                    session.add(new_b)
-                    
-                # Goals
-                for g in backup_data.get("goals", []):
-                    new_g = Goal(
-                        id=g.get('id', str(uuid.uuid4())),
-                        name=g.get('name'),
-                        target_amount=g.get('target_amount'),
-                        target_date=self._parse_iso_date_helper(g.get('target_date')),
-                        start_date=self._parse_iso_date_helper(g.get('start_date')),
-                        user_id=user_id
-                    )
-                    session.add(new_g)
-                
-                # Custom Categories
-                for c in backup_data.get("custom_categories", []):
-                    new_c = CustomCategory(type=c.get('type'), name=c.get('name'), user_id=user_id)
-                    session.add(new_c)
-                    
-                # Recurring Txs
-                for r in backup_data.get("recurring_txs", []):
-                    new_r = RecurringTx(
-                        id=r.get('id', str(uuid.uuid4())),
-                        type=r.get('type'),
-                        amount=r.get('amount'),
-                        description=r.get('description'),
-                        category=r.get('category'),
-                        day=r.get('day'),
-                        user_id=user_id
-                    )
-                    session.add(new_r)
-                
-                # (!!!) NEW: Transfers
-                for t in backup_data.get("transfers", []):
-                    old_from_id = t.get('from_account_id')
-                    old_to_id = t.get('to_account_id')
-                    
-                    new_from_id = account_id_map.get(old_from_id)
-                    new_to_id = account_id_map.get(old_to_id)
-                    
-                    if new_from_id and new_to_id: # Account ID တွေ မှန်မှ ထည့်ပါ
-                        new_t = TransferLog(
-                            id=t.get('id', str(uuid.uuid4())),
-                            date=self._parse_iso_date_helper(t.get('date')),
-                            amount=t.get('amount'),
-                            description=t.get('description'),
-                            user_id=user_id,
-                            from_account_id=new_from_id,
-                            to_account_id=new_to_id
-                        )
-                        session.add(new_t)
-
-                logger.info(f"User {user_id}: Successfully restored data from backup.")
-                return True
-                
-            except Exception as e:
-                logger.error(f"Error during restore for user {user_id}: {e}")
-                session.rollback() # (!!!) အမှားရှိရင် အားလုံးကို ပြန်ဖျက်ပါ
-                return False
\ No newline at end of file
+        records = ((name, row) for name, _, _ in self.BACKUP_TABLES for row in backup_data.get(name) or [])
+        return self._restore_records(user_id, records)
+
+    def restore_from_backup_file(self, user_id: int, fileobj) -> Optional[Dict[str, Any]]:
+        """
+        Backup file (gzip NDJSON or legacy JSON) ကို Stream အတိုင်း ဖတ်ပြီး Restore လုပ်ပါ။
+        WARNING: This DELETES all existing data for the user first.
+        Raises ValueError (file ပုံစံ မမှန်) / json.JSONDecodeError; returns None on database errors.
+        """
+        return self._restore_records(user_id, self.iter_backup_records(fileobj))
+    # --- (!!!) End of Bulk Restore (!!!) ---
+
+
+# --- (!!!) NEW: Async Database Layer (!!!) ---
+# DB Query တွေကို Thread Pool ပေါ်မှာ run ပြီး PTB event loop ကို မပိတ်ဆို့စေရန်
+# Worker အရေအတွက်ကို SQLAlchemy pool (default 5 + overflow 10) ထက် မကျော်စေပါနဲ့
+DB_POOL_WORKERS = min(int(os.getenv('DB_POOL_WORKERS', str(DB_POOL_SIZE))), DB_POOL_SIZE) # Worker တိုင်း Connection တစ်ခု ရရမယ်
+DB_CALL_TIMEOUT = float(os.getenv('DB_CALL_TIMEOUT', '20'))
+
+class AsyncDatabaseManager:
+    """
+    Awaitable version of DatabaseManager with the same method surface:
+        await data_manager.get_transactions(user_id, start_date=...)
+    Every call runs on a bounded thread pool with a per-call timeout.
+    The wrapped sync manager is still available as `.sync`.
+    """
+
+    def __init__(self, manager: Optional[DatabaseManager] = None, max_workers: int = DB_POOL_WORKERS, timeout: float = DB_CALL_TIMEOUT):
+        self.sync = manager or DatabaseManager()
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-worker')
+
+    async def run(self, func, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Runs a blocking function on the DB pool and awaits it.
+        Context variables are copied into the worker thread.
+        NOTE: On timeout the caller gets asyncio.TimeoutError, but the worker finishes the query in the background.
+        """
+        try:
+            return await asyncio.wait_for(self._submit(func, *args, **kwargs), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"DB call {getattr(func, '__name__', func)} timed out after {timeout or self.timeout}s")
+            raise
+
+    def run_until_done(self, func, *args, **kwargs) -> asyncio.Future:
+        """
+        Same as run() but without a timeout: the returned future only resolves once the worker is done.
+        Arguments the worker keeps reading (e.g. an uploaded temp file) must stay open until then.
+        """
+        return self._submit(func, *args, **kwargs)
+
+    def _submit(self, func, *args, **kwargs) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return loop.run_in_executor(self._executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        setattr(self, name, call) # နောက်တစ်ခါ ခေါ်ရင် __getattr__ ကို မဖြတ်တော့ပါ
+        return call
+
+    @asynccontextmanager
+    async def unit_of_work(self, read_only: bool = False, user_id: Optional[int] = None):
+        """
+        Per-update unit of work: every awaited call inside shares one session / connection,
+        committed once at the end (read_only: autocommit, no COMMIT at all).
+        """
+        uow = UnitOfWork(read_only, user_id)
+        uow.owner_task = asyncio.current_task()
+        token = _current_uow.set(uow)
+        try:
+            yield uow
+        except Exception:
+            uow.failed = True
+            raise
+        finally:
+            _current_uow.reset(token)
+            # Commit ကို default executor မှာ run ပါ (DB worker တွေ ပြည့်နေရင်တောင် Connection ပြန်လွှတ်နိုင်ရန်)
+            await asyncio.get_running_loop().run_in_executor(None, uow.finish)
+
+    async def commit_unit_of_work(self):
+        """
+        Commits the current handler's unit of work before network I/O (see OutboundCommitRequest).
+        Tasks spawned from the handler inherit the context but never commit its unit.
+        """
+        uow = _current_uow.get()
+        if uow is None or uow.read_only or uow.owner_task is not asyncio.current_task():
+            return
+        await asyncio.get_running_loop().run_in_executor(None, uow.commit)
+
+    async def get_premium_status(self, user_id: int) -> Dict[str, Any]:
+        """Cache hit ဆိုရင် Thread pool ကို မဖြတ်ဘဲ ချက်ချင်း ပြန်ပေးပါ"""
+        cached = self.sync.premium_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+        return await self.run(self.sync._load_premium_status, user_id)
+
+    async def touch_user(self, user_id: int):
+        """Activity (DAU) / blocked flag - User တစ်ယောက်ကို ရက်တစ်ရက် တစ်ကြိမ်သာ DB ကို သွားပါ"""
+        if self.sync.activity_touched.get((user_id, datetime.now().date())):
+            return
+        await self.run(self.sync.record_user_activity, user_id)
+
+    async def get_active_months(self, user_id: int) -> List[Tuple[int, int]]:
+        cached = self.sync.active_months_cache.get(user_id)
+        if cached is not None:
+            return list(cached)
+        return await self.run(self.sync.get_active_months, user_id)
+
+    def shutdown(self):
+        """Stops the worker threads (waits for running queries)."""
+        self._executor.shutdown(wait=True)
+# --- (!!!) End of Async Database Layer (!!!) ---
@@ -79,7 +79,8 @@ class OldDataManager:
 
 # --- DataManager အသစ် (Database) ---
 from sqlalchemy.orm import sessionmaker
-from models import User, Transaction, Budget, Goal, CustomCategory, RecurringTx, engine, Base, SessionLocal
+from models import User, Transaction, Budget, Goal, CustomCategory, RecurringTx, engine, Base, SessionLocal, coerce_uuid
+from database_manager import CategoryCache
 import uuid
 
 def parse_date(date_str):
@@ -115,6 +116,7 @@ def run_migration():
     # 2. Setup new database
     Base.metadata.create_all(engine)
     session = SessionLocal()
+    categories = CategoryCache() # Category နာမည် -> category.id
 
     print(f"Found {len(old_data)} users in old data file.")
     
@@ -154,25 +156,25 @@ def run_migration():
             # --- Transactions ---
             for tx in user_data.get('transactions', []):
                 new_tx = Transaction(
-                    id=tx.get('id', str(uuid.uuid4())),
+                    id=coerce_uuid(tx.get('id')) or str(uuid.uuid4()),
                     date=parse_date(tx.get('date', datetime.now().isoformat())),
                     type=tx.get('type'),
                     amount=tx.get('amount'),
                     description=tx.get('description'),
-                    category=tx.get('category'),
+                    category_id=categories.id_for(session, tx.get('category')),
                     user_id=user_id
                 )
                 session.add(new_tx)
 
             # --- Budgets ---
             for category, amount in user_data.get('budgets', {}).items():
-                new_budget = Budget(category=category, amount=amount, user_id=user_id)
+                new_budget = Budget(category_id=categories.id_for(session, category), amount=amount, user_id=user_id)
                 session.add(new_budget)
 
             # --- Goals ---
             for goal_id, goal in user_data.get('goals', {}).items():
                 new_goal = Goal(
-                    id=goal.get('id', goal_id),
+                    id=coerce_uuid(goal.get('id', goal_id)),
                     name=goal.get('name'),
                     target_amount=goal.get('target_amount'),
                     target_date=parse_date(goal.get('target_date', datetime.now().isoformat())),
@@ -190,11 +192,11 @@ def run_migration():
             # --- Recurring Txs ---
             for rtx in user_data.get('recurring_tx', []):
                 new_rtx = RecurringTx(
-                    id=rtx.get('id', str(uuid.uuid4())),
+                    id=coerce_uuid(rtx.get('id')) or str(uuid.uuid4()),
                     type=rtx.get('type'),
                     amount=rtx.get('amount'),
                     description=rtx.get('description'),
-                    category=rtx.get('category'),
+                    category_id=categories.id_for(session, rtx.get('category')),
                     day=rtx.get('day'),
                     user_id=user_id
                 )
@@ -0,0 +1,54 @@
+# tests/conftest.py
+# models.py က Import လုပ်ချိန်မှာ DATABASE_URL ကို ဖတ်လို့ Bot module တွေ မ Import ခင် Test database ကို သတ်မှတ်ပါ
+#
+# Usage:
+#   python -m pytest -q                                              # SQLite (Temp file)
+#   TEST_DATABASE_URL=postgresql://localhost/adu_test python -m pytest -q
+#   TEST_DATABASE_URL=postgresql://localhost:5432/adu_test TEST_DATABASE_READ_URL=postgresql://localhost:5433/adu_test python -m pytest -q
+#
+# TEST_DATABASE_URL ကို Scratch database ပဲ ပေးပါ - Test တွေက Table အားလုံး ဖျက်ပြီး ပြန်ဆောက်ပါတယ်။
+# PostgreSQL only Test တွေ (Partition / Native uuid / Replica) က PostgreSQL မပေးရင် Skip ဖြစ်ပါတယ်။
+import os
+import tempfile
+
+import pytest
+
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or f"sqlite:///{tempfile.mkdtemp(prefix='adu-test-')}/test.db"
+os.environ.pop('DATABASE_READ_URL', None) # Replica routing ကို test_read_replica က သူ့ Router နဲ့ စစ်ပါတယ်
+os.environ.setdefault('ADMIN_ID', '1')
+
+from sqlalchemy import MetaData, text
+
+from models import engine
+
+
+def reset_database():
+    """Table အားလုံး ဖျက်ပါ (PostgreSQL: public schema တစ်ခုလုံး - Partition / Trigger function အပါ)"""
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text("DROP SCHEMA public CASCADE"))
+            conn.execute(text("CREATE SCHEMA public"))
+        else:
+            existing = MetaData()
+            existing.reflect(conn)
+            existing.drop_all(conn)
+
+
+@pytest.fixture
+def postgresql():
+    if engine.dialect.name != 'postgresql':
+        pytest.skip("needs PostgreSQL (set TEST_DATABASE_URL)")
+    return engine
+
+
+@pytest.fixture
+def empty_database():
+    reset_database()
+    return engine
+
+
+@pytest.fixture
+def manager(empty_database):
+    """setup_database() ပြီးသား (Schema အသစ်) DatabaseManager"""
+    from database_manager import DatabaseManager
+    return DatabaseManager()
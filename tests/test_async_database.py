@@ -0,0 +1,87 @@
+# tests/test_async_database.py
+# AsyncDatabaseManager (DB call တွေ Event loop ကို မပိတ်ဆို့ရ) နဲ့ PerUserUpdateProcessor ရဲ့ Concurrency
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from database_manager import AsyncDatabaseManager
+
+USER_ID = 9_000_000_000
+
+
+async def max_loop_stall(awaitable, tick: float = 0.01) -> float:
+    """awaitable run နေစဉ် Event loop ရဲ့ အကြာဆုံး ရပ်တန့်ချိန် (စက္ကန့်)"""
+    stalls = []
+
+    async def ticker():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            stalls.append(time.perf_counter() - started - tick)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    try:
+        await awaitable
+    finally:
+        task.cancel()
+    return max(stalls)
+
+
+def test_db_calls_run_off_the_event_loop(manager):
+    manager.add_transaction(USER_ID, 'expense', 1000, 'lunch', 'Food')
+
+    def slow_report(user_id):
+        time.sleep(0.3) # ကြာတဲ့ Report query
+        return manager.get_transactions(user_id)
+
+    async def scenario():
+        data_manager = AsyncDatabaseManager(manager, max_workers=2)
+        stall = await max_loop_stall(asyncio.gather(*(data_manager.run(slow_report, USER_ID) for _ in range(4))))
+        rows = await data_manager.get_transactions(USER_ID)
+        return stall, rows
+
+    stall, rows = asyncio.run(scenario())
+    assert stall < 0.15
+    assert [r['description'] for r in rows] == ['lunch']
+
+
+def test_run_times_out():
+    async def scenario():
+        data_manager = AsyncDatabaseManager(SimpleNamespace(), max_workers=1)
+        await data_manager.run(time.sleep, 0.5, timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_per_user_processor_serializes_a_user_without_blocking_others():
+    app = pytest.importorskip("adupaymentrockpro")
+    processor = app.PerUserUpdateProcessor(2)
+    running, peak, finished = [0], [0], []
+
+    async def handle(user_id, n):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.05)
+        running[0] -= 1
+        finished.append((user_id, n, time.perf_counter()))
+
+    def update(user_id):
+        return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+    async def scenario():
+        started = time.perf_counter()
+        jobs = [processor.process_update(update(1), handle(1, n)) for n in range(6)]
+        jobs += [processor.process_update(update(user_id), handle(user_id, 0)) for user_id in (2, 3)]
+        await asyncio.gather(*jobs)
+        return started
+
+    started = asyncio.run(scenario())
+    assert [n for user_id, n, _ in finished if user_id == 1] == list(range(6)) # User တစ်ယောက်ရဲ့ Update တွေ အစဉ်လိုက်
+    assert peak[0] == 2
+    # User 1 ရဲ့ စောင့်နေတဲ့ Update တွေက Slot မယူထားလို့ တခြား User တွေ ချက်ချင်း run ရပါတယ်
+    assert all(at - started < 0.2 for user_id, _, at in finished if user_id != 1)
+    assert not processor._locks
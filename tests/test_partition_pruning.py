@@ -0,0 +1,76 @@
+# tests/test_partition_pruning.py
+# transaction table ရဲ့ လစဉ် Partition pruning ကို DatabaseManager ရဲ့ Query အစစ်တွေနဲ့ စစ်ဆေးပါ (PostgreSQL only)
+#
+# Method တစ်ခုချင်းစီ ထုတ်တဲ့ SQL (Parameter အပါ) ကို Engine event နဲ့ ဖမ်းပြီး EXPLAIN (FORMAT JSON) ပြန် run ပါတယ်။
+# ရက်စွဲ အပိုင်းအခြား ပါတဲ့ Query တွေက Partition အားလုံးကို မဖတ်ရပါ။
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import engine, transaction_partitions
+
+USER_ID = 9_000_000_001
+
+# (shape, call) - ရက်စွဲ အပိုင်းအခြား ပါတဲ့ Query တွေ
+BOUNDED_SHAPES = [
+    ("get_transactions (monthly report)",
+     lambda manager, now: manager.get_transactions(USER_ID, now.replace(day=1, hour=0, minute=0, second=0, microsecond=0))),
+    ("get_transactions_frame (custom range)",
+     lambda manager, now: manager.get_transactions_frame(USER_ID, now - timedelta(days=45), now)),
+    ("get_financial_analysis_data (30 days)",
+     lambda manager, now: manager.get_financial_analysis_data(USER_ID)),
+]
+
+
+def plan_relations(node, found):
+    """EXPLAIN JSON plan ထဲက Scan လုပ်မယ့် Table နာမည်တွေ"""
+    if isinstance(node, dict):
+        if 'Relation Name' in node:
+            found.add(node['Relation Name'])
+        for value in node.values():
+            plan_relations(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            plan_relations(value, found)
+    return found
+
+
+def captured_selects(func):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+
+@pytest.fixture
+def partitioned(postgresql, manager):
+    manager.add_transaction(USER_ID, 'expense', 1000, 'lunch', 'Food')
+    with engine.connect() as conn:
+        partitions = [name for name, _, _ in transaction_partitions(conn)]
+    assert len(partitions) > 1, "transaction is not partitioned"
+    return manager, partitions
+
+
+@pytest.mark.parametrize("label, call", BOUNDED_SHAPES, ids=[label for label, _ in BOUNDED_SHAPES])
+def test_date_bounded_queries_prune_partitions(partitioned, label, call):
+    manager, partitions = partitioned
+    statements = captured_selects(lambda: call(manager, datetime.now()))
+    scanned_any = False
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+            scanned = plan_relations(plan, set()) & set(partitions)
+            if not scanned:
+                continue # transaction ကို မဖတ်တဲ့ Query (user / budget စသည်)
+            scanned_any = True
+            assert len(scanned) < len(partitions), f"{label} scans every partition: {sorted(scanned)}"
+    assert scanned_any, f"{label} did not read transaction"
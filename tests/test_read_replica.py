@@ -0,0 +1,163 @@
+# tests/test_read_replica.py
+# Read replica routing (Read-your-writes နဲ့ Lag fallback)
+#
+# SQLite: Replica ကို File နှစ်ခုနဲ့ Simulate လုပ်ပါတယ် - replicate() ခေါ်မှသာ Primary File ကို Replica File ထဲ Copy ကူးလို့
+# ကြားထဲမှာ Replica က အမြဲ Stale ဖြစ်နေပါတယ် (Primary ကနေ ဖတ်ရမယ့် Read ကို Replica က ဖတ်မိရင် Row မတွေ့ပါ)။
+# PostgreSQL: TEST_DATABASE_READ_URL ကို TEST_DATABASE_URL ရဲ့ Streaming replica ပေးပါ (မပေးရင် Skip)။
+# Local မှာ Replica ဆောက်ပုံ:
+#   pg_basebackup -p 5432 -D /tmp/pg-replica -R -c fast && pg_ctl -D /tmp/pg-replica -o "-p 5433" -l /tmp/pg-replica.log start
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+
+import database_manager
+from database_manager import DatabaseManager, ReplicaRouter, unit_of_work
+from models import engine
+
+USER_ID = 9_100_000_000
+
+
+class Replica:
+    """Test တစ်ခုအတွက် Router + Replica ကို Primary နဲ့ Sync လုပ်ပေးတဲ့ replicate()"""
+
+    def __init__(self, router: ReplicaRouter):
+        self.router = router
+        self.engine = router.engine
+        self.window = router.max_lag + router.check_interval # Read-your-writes window
+
+    def replicate(self, timeout: float = 10):
+        """Primary ရဲ့ Write တွေ Replica ဆီ ရောက်အောင် (SQLite: File copy / PostgreSQL: WAL replay ကို စောင့်)"""
+        if engine.dialect.name == 'sqlite':
+            with closing(sqlite3.connect(engine.url.database)) as source, closing(sqlite3.connect(self.engine.url.database)) as target:
+                source.backup(target)
+        else:
+            with engine.connect() as conn:
+                target = conn.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+            deadline = time.monotonic() + timeout
+            with self.engine.connect() as conn:
+                while not conn.execute(text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"), {"lsn": target}).scalar():
+                    assert time.monotonic() < deadline, "replica did not catch up"
+                    time.sleep(0.05)
+        time.sleep(self.router.check_interval) # Cache ထဲက Lag အဟောင်းကို မသုံးစေရန်
+
+    def wait_for_lag(self, above: bool, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.router.usable()
+            lag = self.router.lag
+            if lag is not None and (lag > self.router.max_lag) == above:
+                return lag
+            time.sleep(self.router.check_interval / 2)
+        pytest.fail(f"replica lag stayed at {self.router.lag}")
+
+    @contextmanager
+    def served_by(self):
+        """Yields a dict that ends up as {'primary': n, 'replica': n} SELECT counts for the block."""
+        counts = {'primary': 0, 'replica': 0}
+        listeners = []
+        for name, target in (('primary', engine), ('replica', self.engine)):
+            def count(conn, cursor, statement, parameters, context, executemany, name=name):
+                if statement.lstrip().upper().startswith('SELECT') and 'pg_is_in_recovery' not in statement:
+                    counts[name] += 1
+            event.listen(target, 'before_cursor_execute', count)
+            listeners.append((target, count))
+        try:
+            yield counts
+        finally:
+            for target, count in listeners:
+                event.remove(target, 'before_cursor_execute', count)
+
+    def read(self, func, *args):
+        """(Result, 'primary' / 'replica')"""
+        with self.served_by() as counts:
+            result = func(*args)
+        return result, 'replica' if counts['replica'] and not counts['primary'] else 'primary'
+
+
+@pytest.fixture
+def routed(empty_database, tmp_path, monkeypatch):
+    if engine.dialect.name == 'sqlite':
+        read_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    elif os.getenv('TEST_DATABASE_READ_URL'):
+        read_engine = create_engine(os.environ['TEST_DATABASE_READ_URL'], pool_pre_ping=True)
+    else:
+        pytest.skip("needs a PostgreSQL replica (set TEST_DATABASE_READ_URL)")
+
+    manager = DatabaseManager()
+    router = ReplicaRouter(read_engine, max_lag=0.5, check_interval=0.1)
+    monkeypatch.setattr(database_manager, 'replica', router)
+    manager.replica = router
+    replica = Replica(router)
+    replica.replicate() # Schema ကို Replica ထဲ ထည့်ပါ
+    replica.wait_for_lag(above=False)
+    yield manager, replica
+    read_engine.dispose()
+
+
+def descriptions(rows):
+    return {row['description'] for row in rows}
+
+
+def test_reads_stay_on_primary_right_after_own_write(routed):
+    manager, replica = routed
+    manager.add_transaction(USER_ID, 'expense', 1000, 'replica-check-1', 'Food')
+
+    rows, source = replica.read(manager.get_transactions, USER_ID)
+    assert source == 'primary' and 'replica-check-1' in descriptions(rows)
+    _, source = replica.read(manager.get_all_user_ids)
+    assert source == 'replica' # တခြား User တွေရဲ့ Read
+
+    time.sleep(replica.window)
+    replica.replicate()
+    rows, source = replica.read(manager.get_transactions, USER_ID)
+    assert source == 'replica' and 'replica-check-1' in descriptions(rows)
+    _, source = replica.read(manager.get_accounts_with_balance, USER_ID)
+    assert source == 'replica'
+
+
+def test_write_unit_pins_reads_until_its_last_write_commits(routed):
+    manager, replica = routed
+    # Handler လို Write unit of work (Commit before Telegram call ပါ) ပြီးမှ Read-only unit of work (/summary)
+    with unit_of_work(user_id=USER_ID) as uow:
+        manager.add_transaction(USER_ID, 'expense', 1000, 'replica-check-uow-1', 'Food')
+        uow.commit() # OutboundCommitRequest
+        time.sleep(replica.window) # Telegram call ကြာတာ - ပထမ Write ရဲ့ Window ကုန်ပါပြီ
+        manager.add_transaction(USER_ID, 'expense', 1000, 'replica-check-uow-2', 'Food')
+    with unit_of_work(read_only=True, user_id=USER_ID):
+        rows, source = replica.read(manager.get_transactions, USER_ID)
+    assert source == 'primary' and 'replica-check-uow-2' in descriptions(rows)
+
+    time.sleep(replica.window)
+    replica.replicate()
+    with unit_of_work(read_only=True, user_id=USER_ID):
+        rows, source = replica.read(manager.get_transactions, USER_ID)
+    assert source == 'replica' and 'replica-check-uow-2' in descriptions(rows)
+
+
+def test_lagging_replica_sends_every_read_to_primary(postgresql, routed):
+    manager, replica = routed
+    try:
+        with replica.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_wal_replay_pause()"))
+    except DBAPIError as e:
+        pytest.skip(f"cannot pause WAL replay on the replica: {e.orig}")
+    try:
+        manager.add_transaction(USER_ID, 'expense', 1000, 'replica-check-2', 'Food')
+        time.sleep(replica.window) # Read-your-writes window ကုန်အောင်
+        replica.wait_for_lag(above=True)
+        rows, source = replica.read(manager.get_transactions, USER_ID)
+        assert source == 'primary' and 'replica-check-2' in descriptions(rows)
+        _, source = replica.read(manager.get_all_user_ids)
+        assert source == 'primary'
+    finally:
+        with replica.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_wal_replay_resume()"))
+
+    replica.wait_for_lag(above=False)
+    rows, source = replica.read(manager.get_transactions, USER_ID)
+    assert source == 'replica' and 'replica-check-2' in descriptions(rows)
@@ -0,0 +1,199 @@
+# tests/test_schema_upgrade.py
+# Baseline (String id, category column, Partition မရှိ) Schema ပေါ်မှာ setup_database() / upgrade_schema() ကို အစစ် run ပြီး စစ်ဆေးပါ
+#
+# 1. Baseline Schema ဆောက်ပြီး Legacy Data (uuid မဟုတ်တဲ့ id, date NULL, category '') ထည့်
+# 2. DatabaseManager() (setup_database + upgrade_schema) run
+# 3. schema_migration / Balance / Legacy id တွေ စစ် (PostgreSQL: Type / Partition / Constraint ပါ)
+# 4. နောက်တစ်ခေါက် ထပ် run ပြီး ဘာမှ မပြောင်းရ (Idempotent)
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table,
+                        UniqueConstraint, inspect, text)
+
+from models import UNDATED_TRANSACTION_DATE, coerce_uuid, engine, setup_database
+
+BASE_USERS = (101, 102)
+TX_PER_USER = 300
+
+
+def baseline_metadata() -> MetaData:
+    """Baseline commit ရဲ့ models.py အတိုင်း (uuid / category_id / Partition မပါသေး)"""
+    meta = MetaData()
+    Table('user', meta,
+          Column('id', BigInteger, primary_key=True, autoincrement=False),
+          Column('premium_is_premium', Boolean), Column('premium_end_date', DateTime),
+          Column('premium_used_trial', Boolean), Column('settings_daily_reminder', Boolean),
+          Column('settings_weekly_day', String), Column('settings_weekly_summary', Boolean))
+    Table('account', meta,
+          Column('id', String, primary_key=True), Column('name', String, nullable=False),
+          Column('initial_balance', Integer, nullable=False),
+          Column('user_id', BigInteger, ForeignKey('user.id'), nullable=False),
+          UniqueConstraint('user_id', 'name', name='_user_account_name_uc'))
+    Table('transaction', meta,
+          Column('id', String, primary_key=True), Column('date', DateTime),
+          Column('type', String(10)), Column('amount', Integer), Column('description', String),
+          Column('category', String), Column('user_id', BigInteger, ForeignKey('user.id')),
+          Column('account_id', String, ForeignKey('account.id')))
+    Table('transfer_log', meta,
+          Column('id', String, primary_key=True), Column('date', DateTime),
+          Column('amount', Integer, nullable=False), Column('description', String),
+          Column('user_id', BigInteger, ForeignKey('user.id'), nullable=False),
+          Column('from_account_id', String, ForeignKey('account.id'), nullable=False),
+          Column('to_account_id', String, ForeignKey('account.id'), nullable=False))
+    Table('budget', meta,
+          Column('id', Integer, primary_key=True), Column('category', String), Column('amount', Integer),
+          Column('user_id', BigInteger, ForeignKey('user.id')),
+          UniqueConstraint('user_id', 'category', name='_user_category_uc'))
+    Table('goal', meta,
+          Column('id', String, primary_key=True), Column('name', String), Column('target_amount', Integer),
+          Column('target_date', DateTime), Column('start_date', DateTime),
+          Column('user_id', BigInteger, ForeignKey('user.id')))
+    Table('recurring_tx', meta,
+          Column('id', String, primary_key=True), Column('type', String(10)), Column('amount', Integer),
+          Column('description', String), Column('category', String), Column('day', Integer),
+          Column('user_id', BigInteger, ForeignKey('user.id')))
+    Table('custom_category', meta,
+          Column('id', Integer, primary_key=True), Column('type', String(10)), Column('name', String),
+          Column('user_id', BigInteger, ForeignKey('user.id')))
+    return meta
+
+
+def seed_baseline() -> dict:
+    """Baseline Schema ဆောက်ပြီး Data ထည့်ပါ။ Upgrade ပြီးရင် ပြန်တိုက်စစ်ဖို့ Balance တွေကို ပြန်ပေးပါတယ်။"""
+    meta = baseline_metadata()
+    meta.create_all(engine)
+    t = meta.tables
+    start = datetime.now().replace(day=1, hour=12, minute=0, second=0, microsecond=0) - timedelta(days=540)
+    expected = {"balances": {}, "tx_count": 0}
+    with engine.begin() as conn:
+        for user_id in BASE_USERS:
+            conn.execute(t['user'].insert(), {"id": user_id, "premium_is_premium": False, "premium_used_trial": False,
+                                              "settings_daily_reminder": True, "settings_weekly_summary": True})
+            accounts = ['legacy-acc' if user_id == BASE_USERS[0] else str(uuid.uuid4()), str(uuid.uuid4())]
+            for i, acc_id in enumerate(accounts):
+                conn.execute(t['account'].insert(), {"id": acc_id, "name": f"Wallet {i}", "initial_balance": 10000 * (i + 1),
+                                                     "user_id": user_id})
+                expected["balances"][(user_id, coerce_uuid(acc_id))] = 10000 * (i + 1)
+            rows = []
+            for n in range(TX_PER_USER):
+                acc_id = accounts[n % 3] if n % 3 < 2 else None
+                tx_type = 'income' if n % 5 == 0 else 'expense'
+                rows.append({"id": str(uuid.uuid4()), "date": start + timedelta(days=n * 540 // TX_PER_USER),
+                             "type": tx_type, "amount": 500 + n, "description": f"tx {n}",
+                             "category": 'Salary' if tx_type == 'income' else ('Food', 'Transport')[n % 2],
+                             "user_id": user_id, "account_id": acc_id})
+            if user_id == BASE_USERS[0]:
+                rows.append({"id": 'legacy-tx-1', "date": start, "type": 'expense', "amount": 700, "description": 'empty category',
+                             "category": '', "user_id": user_id, "account_id": 'legacy-acc'})
+                rows.append({"id": 'legacy-tx-2', "date": None, "type": 'income', "amount": 900, "description": 'no date',
+                             "category": 'Salary', "user_id": user_id, "account_id": None})
+            conn.execute(t['transaction'].insert(), rows)
+            expected["tx_count"] += len(rows)
+            for row in rows:
+                key = (user_id, coerce_uuid(row['account_id']) if row['account_id'] else None)
+                signed = row['amount'] if row['type'] == 'income' else -row['amount']
+                expected["balances"][key] = expected["balances"].get(key, 0) + signed
+            conn.execute(t['transfer_log'].insert(), {"id": str(uuid.uuid4()), "date": start, "amount": 2500, "description": 'move',
+                                                      "user_id": user_id, "from_account_id": accounts[0], "to_account_id": accounts[1]})
+            expected["balances"][(user_id, coerce_uuid(accounts[0]))] -= 2500
+            expected["balances"][(user_id, coerce_uuid(accounts[1]))] += 2500
+            conn.execute(t['budget'].insert(), {"category": 'Food', "amount": 50000, "user_id": user_id})
+            conn.execute(t['goal'].insert(), {"id": 'goal-old' if user_id == BASE_USERS[0] else str(uuid.uuid4()),
+                                              "name": 'Phone', "target_amount": 300000, "start_date": start,
+                                              "target_date": start + timedelta(days=720), "user_id": user_id})
+            conn.execute(t['recurring_tx'].insert(), {"id": str(uuid.uuid4()), "type": 'expense', "amount": 15000,
+                                                      "description": 'rent', "category": 'Rent', "day": 1, "user_id": user_id})
+            conn.execute(t['custom_category'].insert(), {"type": 'expense', "name": 'Rent', "user_id": user_id})
+    return expected
+
+
+@pytest.fixture
+def upgraded(empty_database):
+    from database_manager import DatabaseManager
+
+    expected = seed_baseline()
+    manager = DatabaseManager() # setup_database() -> upgrade_schema()
+    return manager, expected
+
+
+def assert_schema():
+    with engine.connect() as conn:
+        steps = conn.execute(text("SELECT step, status FROM schema_migration ORDER BY step")).all()
+        assert steps and all(status == 'done' for _, status in steps), steps
+        assert 'category' not in {c['name'] for c in inspect(conn).get_columns('budget')}
+
+
+def assert_data(manager, expected):
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM "transaction"')).scalar() == expected["tx_count"]
+
+    legacy = manager.get_transaction_by_id(BASE_USERS[0], 'legacy-tx-1') # Legacy id က coerce_uuid နဲ့ ရှာလို့ ရရပါမယ်
+    assert legacy is not None and str(legacy['id']) == str(coerce_uuid('legacy-tx-1'))
+    assert not legacy['category'] # '' -> Uncategorized
+    undated = manager.get_transaction_by_id(BASE_USERS[0], 'legacy-tx-2')
+    assert undated is not None and undated['date'] == UNDATED_TRANSACTION_DATE.isoformat()
+
+    for user_id in BASE_USERS:
+        overview = manager.get_balance_overview(user_id)
+        got = {(user_id, coerce_uuid(str(a['id']))): a['balance'] for a in overview['accounts']}
+        got[(user_id, None)] = overview['unassigned']
+        assert got == {k: v for k, v in expected["balances"].items() if k[0] == user_id}
+    assert manager.verify_account_balances()['drift_count'] == 0
+    assert manager.get_budgets(BASE_USERS[0]) == {'Food': 50000} # category -> category_id
+    assert any(str(g['id']) == str(coerce_uuid('goal-old')) for g in manager.get_all_goals(BASE_USERS[0]))
+    recurring = manager.get_recurring_txs(BASE_USERS[0])
+    assert len(recurring) == 1 and recurring[0]['category'] == 'Rent'
+
+
+def test_upgrade_keeps_baseline_data(upgraded):
+    manager, expected = upgraded
+    assert_schema()
+    assert_data(manager, expected)
+
+
+def test_legacy_account_id_still_writes(upgraded):
+    manager, expected = upgraded
+    manager.add_transaction(BASE_USERS[0], 'expense', 100, 'after upgrade', 'Food', account_id='legacy-acc')
+    accounts = {str(a['id']): a['balance'] for a in manager.get_accounts_with_balance(BASE_USERS[0])}
+    assert accounts[str(coerce_uuid('legacy-acc'))] == expected["balances"][(BASE_USERS[0], coerce_uuid('legacy-acc'))] - 100
+
+
+def test_upgrade_is_idempotent(upgraded):
+    manager, expected = upgraded
+    setup_database()
+    assert_schema()
+    assert_data(manager, expected)
+
+
+def test_postgresql_schema_after_upgrade(postgresql, upgraded):
+    with engine.connect() as conn:
+        not_uuid = conn.execute(text("""
+            SELECT c.table_name || '.' || c.column_name FROM information_schema.columns c
+            JOIN information_schema.tables t ON t.table_name = c.table_name AND t.table_schema = c.table_schema
+            WHERE c.table_schema = 'public' AND t.table_type = 'BASE TABLE'
+              AND (c.column_name = 'id' OR c.column_name LIKE '%account_id' OR c.column_name IN ('goal_id', 'recurring_id'))
+              AND c.table_name IN ('account', 'transaction', 'transfer_log', 'goal', 'recurring_tx', 'broadcast_job')
+              AND c.data_type <> 'uuid'
+        """)).scalars().all()
+        assert not not_uuid
+        assert conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'transaction'")).scalar() == 'p'
+        pk = conn.execute(text("""
+            SELECT array_agg(a.attname ORDER BY a.attnum) FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = '"transaction"'::regclass AND i.indisprimary
+        """)).scalar()
+        assert sorted(pk) == ['date', 'id']
+        assert not conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE NOT convalidated AND connamespace = 'public'::regnamespace"
+        )).scalars().all()
+        assert not conn.execute(text(
+            "SELECT indexrelid::regclass::text FROM pg_index WHERE NOT indisvalid OR NOT indisready"
+        )).scalars().all()
+        # Expand / contract ရဲ့ Shadow column နဲ့ Trigger function တွေ မကျန်ရ
+        assert not conn.execute(text("""
+            SELECT table_name || '.' || column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND column_name LIKE '%\\_\\_uuid'
+            UNION ALL SELECT proname FROM pg_proc WHERE pronamespace = 'public'::regnamespace
+        """)).scalars().all()